@@ -11,6 +11,7 @@ from subsystems.swerve import Swerve
 from subsystems.swerve_constants import DriveConstants as dc
 import math
 from subsystems.vision import Vision
+from misc.telemetry import telemetry
 
 class AutoAimSwerve(commands2.CommandBase):
     # LHACK, probably outmoded by CJH auto_aim_swerve, corrects both fwd/back and strafe based on vision
@@ -41,6 +42,8 @@ class AutoAimSwerve(commands2.CommandBase):
         self.decay_rate = 10 #  20 transitions in about 0.25s, 10 is about 0.5 s to transition from high to low
         self.transition_time_center = 0.8  # center time of our transition, in seconds
         self.start_pose = Pose2d()
+        self.strafe_error_publisher = telemetry.publisher('_strafe_target_error')
+        self.forback_error_publisher = telemetry.publisher('_forback_target_error')
 
     def initialize(self) -> None:
         """Called just before this Command runs the first time."""
@@ -81,8 +84,8 @@ class AutoAimSwerve(commands2.CommandBase):
         if math.fabs(forback_target_vel) > debugging_speed_limit:
             forback_target_vel = debugging_speed_limit * math.copysign(1, forback_target_vel)
 
-        SmartDashboard.putNumber('_strafe_target_error', current_strafe)
-        SmartDashboard.putNumber('_forback_target_error', current_forback)
+        self.strafe_error_publisher.set(current_strafe)
+        self.forback_error_publisher.set(current_forback)
 
 
         # remember to scale the velocity for the drive function - divide input by max
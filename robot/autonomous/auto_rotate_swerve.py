@@ -7,6 +7,7 @@ from wpimath.geometry import Rotation2d
 from subsystems.swerve import Swerve
 from subsystems.swerve_constants import DriveConstants as dc
 import math
+from misc.telemetry import telemetry
 
 class AutoRotateSwerve(commands2.CommandBase):
 
@@ -34,15 +35,16 @@ class AutoRotateSwerve(commands2.CommandBase):
         self.transition_time_center = 0.3  # center time of our transition, in seconds
 
         self.delta_heading = 0  # enable skipping if delta angle is less than some amount
+        self.target_vel_publisher = telemetry.publisher('_target_vel')
 
     def initialize(self) -> None:
         """Called just before this Command runs the first time."""
         self.rotate_start_time = wpilib.Timer.getFPGATimestamp()
 
         if self.find_closest_heading:
-            self.heading = 0 if abs(self.drive.get_yaw()) < 90 else 180
+            self.heading = 0 if abs(self.drive.snapshot.yaw) < 90 else 180
 
-        self.delta_heading = abs(self.drive.get_yaw() - self.heading)
+        self.delta_heading = abs(self.drive.snapshot.yaw - self.heading)
 
         self.print_start_message()
         # setting initial speed to angle so that when we hold button it doesn't rapidly switch between 0 and proper speed
@@ -53,11 +55,11 @@ class AutoRotateSwerve(commands2.CommandBase):
 
         current_time = wpilib.Timer.getFPGATimestamp() - self.rotate_start_time
         max_allowed_velocity = self.calculate_maximum_velocity(current_time) if self.auto else self.slow_velocity
-        pid_output = self.heading_controller.calculate(self.drive.get_raw_angle(), setpoint=self.heading)
+        pid_output = self.heading_controller.calculate(self.drive.snapshot.raw_angle, setpoint=self.heading)
         pid_output = pid_output if abs(pid_output) <= 1 else 1 * math.copysign(1, pid_output)  # clamp at +/- 1
         pid_output = pid_output if abs(pid_output) >= 0.1 else 0.1 * math.copysign(1, pid_output)  # too slow and you get stuck waiting to move
         target_vel = pid_output * max_allowed_velocity  # meters per second
-        SmartDashboard.putNumber('_target_vel', target_vel)  # actual m/s target
+        self.target_vel_publisher.set(target_vel)  # actual m/s target
 
         # remember to scale the velocity for the drive function - divide input by max
         self.drive.drive(xSpeed=0, ySpeed=0, rot=target_vel/dc.kMaxAngularSpeed, fieldRelative=False, rate_limited=False)
@@ -28,6 +28,8 @@ class AutoSetupScore(commands2.SequentialCommandGroup):  # change the name for y
                          vision=self.container.vision, target_type='tag', auto=True).withTimeout(3))
 
         # set elevator to correct height - decide based on turret position
+        # (not a SuperstructureMove - these pick their setpoints from the turret angle when they start, and the turret
+        # doesn't move here, so there is nothing for the planner to run in parallel that isn't already)
         self.addCommands(ElevatorMove(container=self.container, elevator=self.container.elevator, wait_to_finish=True,
                                       decide_by_turret=True))
 
@@ -8,6 +8,7 @@ from subsystems.swerve import Swerve
 from subsystems.swerve_constants import DriveConstants as dc
 import math
 from subsystems.vision import Vision
+from misc.telemetry import telemetry
 
 class AutoStrafeSwerve(commands2.CommandBase):
 
@@ -37,6 +38,10 @@ class AutoStrafeSwerve(commands2.CommandBase):
 
         self.start_pose = Pose2d()
 
+        # made once so posting in execute is just a set()
+        self.target_vel_publisher = telemetry.publisher('_s_target_vel')
+        self.pid_publisher = telemetry.publisher('_s_pid')
+
     def initialize(self) -> None:
         """Called just before this Command runs the first time."""
         self.strafe_start_time = wpilib.Timer.getFPGATimestamp()
@@ -48,12 +53,13 @@ class AutoStrafeSwerve(commands2.CommandBase):
             sim_pose = wpilib.SmartDashboard.getNumberArray('drive_pose', [0, 0, 0])
             self.start_pose = Pose2d(sim_pose[0], sim_pose[1], Rotation2d(sim_pose[2]) )
 
-        if self.target_type == 'tag':
-            self.target_detected = self.vision.target_available(target='tags')
-            self.target_distance = self.vision.get_tag_strafe()
-        elif self.target_type == 'green':
-            self.target_detected = self.vision.target_available(target='green')
-            self.target_distance = self.vision.get_green_strafe()
+        # this loop's vision snapshot - a stale reading counts as no target so we don't chase an old frame
+        if self.target_type in ['tag', 'green']:
+            reading = self.vision.get_reading('tags' if self.target_type == 'tag' else 'green')
+            self.target_detected = reading.targets > 0 and not reading.stale
+            self.target_distance = reading.strafe if self.target_detected else 0
+            if reading.targets > 0 and reading.stale:
+                print(f'Ignoring {self.target_type} reading that is {reading.age:.1f}s old')
         else:
             print(f'Invalid target_type: {self.target_type}')
             pass  # will use the initialized number
@@ -104,8 +110,8 @@ class AutoStrafeSwerve(commands2.CommandBase):
         pid_output = pid_output if abs(pid_output) > minimum_pid_output else minimum_pid_output * math.copysign(1, pid_output)  # clamp at min +/- 0.3
         target_vel = pid_output * max_allowed_velocity + math.copysign(1, pid_output) * minimum_velocity # meters per second
         # SmartDashboard.putNumber('_s_dist_travelled', self.start_pose.Y() - sim_pose[1])
-        SmartDashboard.putNumber('_s_target_vel', target_vel)
-        SmartDashboard.putNumber('_s_pid', pid_output)
+        self.target_vel_publisher.set(target_vel)
+        self.pid_publisher.set(pid_output)
         # SmartDashboard.putNumber('_s_sim_y', sim_pose[1])
         # SmartDashboard.putNumber('_s_error', self.strafe_controller.getPositionError())
         # SmartDashboard.putBoolean('_s_atsp', self.strafe_controller.atSetpoint())
@@ -7,6 +7,7 @@ from wpimath.geometry import Rotation2d
 from subsystems.swerve import Swerve
 from subsystems.swerve_constants import DriveConstants as dc
 import math
+from misc.telemetry import telemetry
 
 class ChargeStationBalance(commands2.CommandBase):
 
@@ -29,6 +30,7 @@ class ChargeStationBalance(commands2.CommandBase):
         self.min_velocity = 0.4
         self.decay_rate = 10 #  20 transitions in about 0.25s, 10 is about 0.5 s to transition from high to low
         self.transition_time_center = 0.9  # center time of our transition, in seconds
+        self.target_vel_publisher = telemetry.publisher('_target_vel')
 
     def initialize(self) -> None:
         """Called just before this Command runs the first time."""
@@ -42,9 +44,9 @@ class ChargeStationBalance(commands2.CommandBase):
 
         current_time = wpilib.Timer.getFPGATimestamp() - self.climb_start_time
         max_allowed_velocity = self.calculate_maximum_velocity(current_time) if self.auto else self.min_velocity
-        pid_output = self.pitch_controller.calculate(self.drive.get_pitch(), setpoint=0)
+        pid_output = self.pitch_controller.calculate(self.drive.snapshot.pitch, setpoint=0)
         target_vel = pid_output * max_allowed_velocity  # meters per second
-        SmartDashboard.putNumber('_target_vel', target_vel)  # actual m/s target
+        self.target_vel_publisher.set(target_vel)  # actual m/s target
 
         debugging_speed_limit = 1.49   # allow us to set a temporary test limit in m/s
         if math.fabs(target_vel) > debugging_speed_limit:
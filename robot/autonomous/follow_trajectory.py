@@ -0,0 +1,85 @@
+import math
+import commands2
+from wpilib import SmartDashboard
+from wpimath.controller import PIDController
+from wpimath.geometry import Pose2d, Rotation2d
+from wpimath.kinematics import ChassisSpeeds
+from subsystems.swerve_constants import DriveConstants as dc, AutoConstants as ac
+from misc.playback_clock import PlaybackClock
+from misc.telemetry import telemetry
+
+
+class FollowTrajectory(commands2.CommandBase):
+    """Drive one of the cached PathWeaver trajectories - see misc/trajectory_cache.py
+    Field-relative feedforward from the trajectory's velocity along its heading, plus P on the pose error.
+    Swerve doesn't have to face where it's going, so the robot holds heading (degrees) the whole way - or, if
+    heading is None, whatever heading it had when the command started.  reset_pose puts odometry at the
+    trajectory's start, for the first path of an auto.
+    """
+
+    def __init__(self, container, trajectory_name, heading=None, reset_pose=False) -> None:
+        super().__init__()
+        self.setName(f'FollowTrajectory {trajectory_name}')
+        self.container = container
+        self.drive = container.drive
+        self.trajectory_name = trajectory_name
+        self.heading = heading
+        self.reset_pose = reset_pose
+        self.trajectory = None  # looked up from the cache the first time we run
+
+        self.x_pid = PIDController(ac.kPXController, 0, 0)
+        self.y_pid = PIDController(ac.kPYController, 0, 0)
+        self.theta_pid = PIDController(ac.kPThetaController, 0, 0)
+        self.theta_pid.enableContinuousInput(-math.pi, math.pi)
+        self.error_publisher = telemetry.publisher('_trajectory_error')  # meters off the path
+
+        self.addRequirements(self.drive)
+
+    def initialize(self) -> None:
+        """Called just before this Command runs the first time."""
+        if self.trajectory is None:
+            self.trajectory = self.container.trajectories.get(self.trajectory_name)
+        self.clock = PlaybackClock(self.trajectory, report=False)
+
+        trajectory = self.trajectory
+        if self.reset_pose:
+            start_heading = self.drive.get_pose().rotation() if self.heading is None else Rotation2d.fromDegrees(self.heading)
+            self.drive.resetOdometry(Pose2d(trajectory['x'][0], trajectory['y'][0], start_heading))
+        self.target_heading = self.drive.get_pose().rotation().radians() if self.heading is None else math.radians(self.heading)
+        self.clock.start()
+
+        self.start_time = round(self.container.get_enabled_time(), 2)
+        print("\n" + f"** Started {self.getName()} at {self.start_time} s **", flush=True)
+        SmartDashboard.putString("alert",
+                                 f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
+
+    def execute(self) -> None:
+        clock, trajectory = self.clock, self.trajectory
+        clock.update()
+        pose = self.drive.get_pose()
+        x, y = clock.sample(trajectory['x']), clock.sample(trajectory['y'])
+        velocity, direction = clock.sample(trajectory['velocity']), trajectory['heading'][clock.index]
+
+        # field relative m/s and rad/s
+        vx = velocity * math.cos(direction) + self.x_pid.calculate(pose.X(), x)
+        vy = velocity * math.sin(direction) + self.y_pid.calculate(pose.Y(), y)
+        omega = self.theta_pid.calculate(pose.rotation().radians(), self.target_heading)
+        self.error_publisher.set(math.hypot(x - pose.X(), y - pose.Y()))
+
+        # rotate into the robot frame with the estimator's heading - the same frame as the path and the errors.  drive()'s
+        # field relative uses the raw gyro, which drifts away from the estimator after resetOdometry or a tag update
+        speeds = ChassisSpeeds.fromFieldRelativeSpeeds(vx, vy, omega, pose.rotation())
+        # drive() wants fractions of max speed
+        self.drive.drive(speeds.vx / dc.kMaxSpeedMetersPerSecond, speeds.vy / dc.kMaxSpeedMetersPerSecond, speeds.omega / dc.kMaxAngularSpeed,
+                         fieldRelative=False, rate_limited=False, keep_angle=False)
+
+    def isFinished(self) -> bool:
+        return self.clock.is_finished()
+
+    def end(self, interrupted: bool) -> None:
+        self.drive.drive(0, 0, 0, fieldRelative=True, rate_limited=False, keep_angle=True)
+        end_time = self.container.get_enabled_time()
+        message = 'Interrupted' if interrupted else 'Ended'
+        print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
+        SmartDashboard.putString(f"alert",
+                                 f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
@@ -1,11 +1,11 @@
-import json
-import math
-from typing import Tuple
+import os
 import commands2
 import commands2.cmd as cmd
 from wpilib import SmartDashboard
 import constants
-from subsystems.swerve_constants import DriveConstants
+from misc.input_log import InputLog, BUTTON_MASKS
+from misc.playback_clock import PlaybackClock
+from misc.drive_log import DriveLog
 
 from subsystems.led import Led
 
@@ -34,14 +34,16 @@ from autonomous.playback_swerve import PlaybackSwerve
 class PlaybackAuto(commands2.CommandBase):
     # this is basically another robotcontainer, but I don't think there's a better way to do this.
 
-    def __init__(self, container, input_log_path: str) -> None:
+    def __init__(self, container, input_log_path: str, drive_log_path: str = None) -> None:
         super().__init__()
 
         self.setName('Playback Auto')
         self.container = container
         self.input_log_path = input_log_path
+        self.drive_log_path = drive_log_path  # if RecordAuto saved the drive state too, PlaybackSwerve follows the path closed-loop
 
         self.subsystem_list = ['turret', 'elevator', 'wrist', 'arm']
+        self.subsystem_masks = [(subsystem, BUTTON_MASKS[key]) for subsystem, key in zip(self.subsystem_list, ['A', 'B', 'X', 'Y'])]
 
         self.command_dict = {
             'UP': {
@@ -76,158 +78,147 @@ class PlaybackAuto(commands2.CommandBase):
         # create an attribute so we don't construct a new object each time
         self.manipulator_auto_grab = ManipulatorAutoGrab(container=self.container, pneumatics=self.container.pneumatics)
 
-    def initialize(self) -> None:
-        """Called just before this Command runs the first time."""
-
-        with open(self.input_log_path, 'r') as input_json:
-            self.input_log = json.load(input_json)
-
-        self.container.drive.setDefaultCommand(PlaybackSwerve(self.container, self.input_log_path, field_oriented=constants.k_field_centric, rate_limited=constants.k_rate_limited))
-
-        self.line_count = 1
-
-        self.start_time = round(self.container.get_enabled_time(), 2)
-        print("\n" + f"** Started {self.getName()} at {self.start_time} s **", flush=True)
-        SmartDashboard.putString("alert",
-                                 f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
-
-    def execute(self) -> None:
-
-        current_inputs = self.input_log[self.line_count]
-        previous_inputs = self.input_log[self.line_count-1]
-
-        # --------------- SWERVE ---------------
-
-        if current_inputs['driver_controller']['button']['LB']:
-            slowmode_multiplier = constants.k_slowmode_multiplier
-        elif current_inputs['driver_controller']['axis']['axis2']:
-            slowmode_multiplier = 1.5 * constants.k_slowmode_multiplier
-        else: 
-            slowmode_multiplier = 1
-
-        self.container.drive.drive(-self.input_transform(slowmode_multiplier*current_inputs['driver_controller']['axis']['axis1']),
-                                   self.input_transform(slowmode_multiplier*current_inputs['driver_controller']['axis']['axis0']),
-                                   -self.input_transform(slowmode_multiplier*current_inputs['driver_controller']['axis']['axis4']),
-                                   fieldRelative=True, rate_limited=False, keep_angle=True)
-        
+        # everything the old per-frame checks looked for, in the same order they ran
+        # each binding is (column, test on the column value, on_press action, while_held -> list of commands to hold)
+        schedule = commands2.CommandScheduler.getInstance().schedule
+        self.bindings = []
 
         # --------------- DRIVER CONTROLLER ---------------
-
-        if current_inputs['driver_controller']['button']['A'] and not previous_inputs['driver_controller']['button']['A']:
-            commands2.CommandScheduler.getInstance().schedule(AutoSetupScore(container=self.container))
-
-        if current_inputs['driver_controller']['button']['B'] and not previous_inputs['driver_controller']['button']['B']:
-            commands2.CommandScheduler.getInstance().schedule(GyroReset(container=self.container, swerve=self.container.drive))
-
-        if current_inputs['driver_controller']['button']['X'] and not previous_inputs['driver_controller']['button']['X']:
-            commands2.CommandScheduler.getInstance().schedule(AutoStrafeSwerve(container=self.container, drive=self.container.drive, vision=self.container.vision,
-                                                           target_type='tag', auto=True).withTimeout(5))
-
-        if current_inputs['driver_controller']['button']['Y'] and not previous_inputs['driver_controller']['button']['Y']:
-            commands2.CommandScheduler.getInstance().schedule(AutoRotateSwerve(container=self.container, drive=self.container.drive,).withTimeout(2))
-
-        if current_inputs['driver_controller']['button']['RB'] and not previous_inputs['driver_controller']['button']['RB']:
-            commands2.CommandScheduler.getInstance().schedule(cmd.runOnce(action=lambda: self.container.wrist.set_driver_flag(state=True)).andThen(
-                                                            ReleaseAndStow(container=self.container).withTimeout(4)).andThen(
-                                                            cmd.runOnce(action=lambda: self.container.wrist.set_driver_flag(state=False))))
-            
-        if current_inputs['driver_controller']['button']['Back'] and not previous_inputs['driver_controller']['button']['Back']:
-            commands2.CommandScheduler.getInstance().schedule(CompressorToggle(container=self.container, pneumatics=self.container.pneumatics,
-                                                                               force='stop'))
-
-        if current_inputs['driver_controller']['button']['Start'] and not previous_inputs['driver_controller']['button']['Start']:
-            commands2.CommandScheduler.getInstance().schedule(CompressorToggle(container=self.container, pneumatics=self.container.pneumatics,
-                                                                               force='start'))
-
-        if current_inputs['driver_controller']['button']['POV'] == 0 and not previous_inputs['driver_controller']['button']['POV'] == 0:
-            commands2.CommandScheduler.getInstance().schedule(self.container.led.set_indicator_with_timeout(Led.Indicator.RAINBOW, 5))
-
-        if current_inputs['driver_controller']['button']['POV'] == 180 and not previous_inputs['driver_controller']['button']['POV'] == 180:
-                    commands2.CommandScheduler.getInstance().schedule(ManipulatorToggle(container=self.container, pneumatics=self.container.pneumatics))
-
-        if current_inputs['driver_controller']['button']['POV'] == 270 and not previous_inputs['driver_controller']['button']['POV'] == 270:
-                    commands2.CommandScheduler.getInstance().schedule(self.container.led.set_indicator_with_timeout(Led.Indicator.RSL, 5))
-
+        self.bind('driver_buttons', self.button('A'), on_press=lambda: schedule(AutoSetupScore(container=self.container)))
+        self.bind('driver_buttons', self.button('B'), on_press=lambda: schedule(GyroReset(container=self.container, swerve=self.container.drive)))
+        self.bind('driver_buttons', self.button('X'), on_press=lambda: schedule(AutoStrafeSwerve(container=self.container, drive=self.container.drive, vision=self.container.vision,
+                                                                                                 target_type='tag', auto=True).withTimeout(5)))
+        self.bind('driver_buttons', self.button('Y'), on_press=lambda: schedule(AutoRotateSwerve(container=self.container, drive=self.container.drive,).withTimeout(2)))
+        self.bind('driver_buttons', self.button('RB'), on_press=lambda: schedule(cmd.runOnce(action=lambda: self.container.wrist.set_driver_flag(state=True)).andThen(
+                                                                                 ReleaseAndStow(container=self.container).withTimeout(4)).andThen(
+                                                                                 cmd.runOnce(action=lambda: self.container.wrist.set_driver_flag(state=False)))))
+        self.bind('driver_buttons', self.button('Back'), on_press=lambda: schedule(CompressorToggle(container=self.container, pneumatics=self.container.pneumatics, force='stop')))
+        self.bind('driver_buttons', self.button('Start'), on_press=lambda: schedule(CompressorToggle(container=self.container, pneumatics=self.container.pneumatics, force='start')))
+        self.bind('driver_pov', self.pov(0), on_press=lambda: schedule(self.container.led.set_indicator_with_timeout(Led.Indicator.RAINBOW, 5)))
+        self.bind('driver_pov', self.pov(180), on_press=lambda: schedule(ManipulatorToggle(container=self.container, pneumatics=self.container.pneumatics)))
+        self.bind('driver_pov', self.pov(270), on_press=lambda: schedule(self.container.led.set_indicator_with_timeout(Led.Indicator.RSL, 5)))
 
         # --------------- OPERATOR CONTROLLER ---------------
+        self.bind('co_driver_pov', self.pov(0), while_held=lambda: [self.command_dict['UP_DRIVE'][subsystem] for subsystem in self.selected_subsystems()])
+        self.bind('co_driver_pov', self.pov(90), on_press=lambda: [schedule(self.command_dict['UP'][subsystem]) for subsystem in self.selected_subsystems()])
+        self.bind('co_driver_pov', self.pov(180), while_held=lambda: [self.command_dict['DOWN_DRIVE'][subsystem] for subsystem in self.selected_subsystems()])
+        self.bind('co_driver_pov', self.pov(270), on_press=lambda: [schedule(self.command_dict['DOWN'][subsystem]) for subsystem in self.selected_subsystems()])
+        self.bind('co_driver_buttons', self.button('LB'), on_press=lambda: schedule(ToggleHighPickup(container=self.container, turret=self.container.turret, elevator=self.container.elevator,
+                                                                                                    wrist=self.container.wrist, pneumatics=self.container.pneumatics, vision=self.container.vision)))
+        self.bind('co_driver_buttons', self.button('RB'), while_held=lambda: [self.manipulator_auto_grab])
+        self.bind('co_driver_buttons', self.button('Back'), on_press=lambda: schedule(CoStow(container=self.container)))
+        self.bind('co_driver_buttons', self.button('Start'), on_press=lambda: schedule(TurretReset(container=self.container, turret=self.container.turret)))
+        self.bind('co_driver_buttons', self.button('LS'), on_press=lambda: schedule(TurretToggle(container=self.container, turret=self.container.turret, wait_to_finish=False)))
+        self.bind('co_driver_axis2', self.trigger(0.2), on_press=lambda: schedule(TurretToggle(container=self.container, turret=self.container.turret, wait_to_finish=False)))
+        self.bind('co_driver_axis3', self.trigger(0.2), on_press=lambda: schedule(TurretToggle(container=self.container, turret=self.container.turret, wait_to_finish=False)))
+
+    def bind(self, column, test, on_press=None, while_held=None) -> None:
+        self.bindings.append((column, test, on_press, while_held))
+
+    # tests for the binding columns - defaults freeze the values so the lambdas don't share them
+    @staticmethod
+    def button(name):
+        return lambda value, mask=BUTTON_MASKS[name]: bool(value & mask)
+
+    @staticmethod
+    def pov(angle):
+        return lambda value, angle=angle: value == angle
+
+    @staticmethod
+    def trigger(threshold):
+        return lambda value, threshold=threshold: value > threshold
+
+    def compile_timeline(self) -> list:
+        """Turn the log into a sorted list of (frame, binding index, pressed) - one entry per edge"""
+        timeline = []
+        for index, (column, test, _, _) in enumerate(self.bindings):
+            states = [test(value) for value in self.input_log[column]]
+            # start at frame 1 like the old loop did - something held at frame 0 has no edge
+            timeline.extend((frame, index, states[frame]) for frame in range(1, len(states)) if states[frame] != states[frame - 1])
+        timeline.sort()
+        return timeline
+
+    def selected_subsystems(self) -> list:
+        # co-driver A/B/X/Y pick turret/elevator/wrist/arm - latched when the dpad goes down
+        buttons = self.co_buttons[self.event_frame]
+        return [subsystem for subsystem, mask in self.subsystem_masks if buttons & mask]
 
+    def initialize(self) -> None:
+        """Called just before this Command runs the first time."""
 
-        subsystem_keys = [self.subsystem_list[i] for i, key in enumerate(['A', 'B', 'X', 'Y']) if current_inputs['co_driver_controller']['button'][key]]
-
-        if current_inputs['co_driver_controller']['button']['POV'] == 0 or previous_inputs['co_driver_controller']['button']['POV'] == 0:
-            for subsystem in subsystem_keys: self.run_while_held(('co_driver_controller', 'button', 'POV'), command=self.command_dict['UP_DRIVE'][subsystem], pov_value=0)
-
-        if current_inputs['co_driver_controller']['button']['POV'] == 90 and not previous_inputs['co_driver_controller']['button']['POV'] == 90:
-            for subsystem in subsystem_keys: commands2.CommandScheduler.getInstance().schedule(self.command_dict['UP'][subsystem]) 
-
-        if current_inputs['co_driver_controller']['button']['POV'] == 180 or previous_inputs['co_driver_controller']['button']['POV'] == 180:
-            for subsystem in subsystem_keys: self.run_while_held(('co_driver_controller', 'button', 'POV'), command=self.command_dict['DOWN_DRIVE'][subsystem], pov_value=180)
-
-        if current_inputs['co_driver_controller']['button']['POV'] == 270 and not previous_inputs['co_driver_controller']['button']['POV'] == 270:
-            for subsystem in subsystem_keys: commands2.CommandScheduler.getInstance().schedule(self.command_dict['DOWN'][subsystem]) 
-
-        if current_inputs['co_driver_controller']['button']['LB'] and not previous_inputs['co_driver_controller']['button']['LB']:
-            commands2.CommandScheduler.getInstance().schedule(ToggleHighPickup(container=self.container, turret=self.container.turret, elevator=self.container.elevator,
-                                                                              wrist=self.container.wrist, pneumatics=self.container.pneumatics, vision=self.container.vision))
-
-        self.run_while_held(('co_driver_controller', 'button', 'RB'), command=self.manipulator_auto_grab)
-
-        if current_inputs['co_driver_controller']['button']['Back'] and not previous_inputs['co_driver_controller']['button']['Back']:
-            commands2.CommandScheduler.getInstance().schedule(CoStow(container=self.container))
+        self.input_log = InputLog(self.input_log_path)
+        self.timeline = self.compile_timeline()
+        self.next_event = 0
+        self.event_frame = 0  # frame of the edge we are handling - a late loop can handle a few at once
+        self.held = {}  # binding index -> (loop it was pressed on, commands we are running while held)
+        self.clock = PlaybackClock(self.input_log)  # shared with PlaybackSwerve so we both read the same frame
 
-        if current_inputs['co_driver_controller']['button']['Start'] and not previous_inputs['co_driver_controller']['button']['Start']:
-            commands2.CommandScheduler.getInstance().schedule(TurretReset(container=self.container, turret=self.container.turret))
+        self.co_buttons = self.input_log['co_driver_buttons']
 
-        if current_inputs['co_driver_controller']['button']['LS'] and not previous_inputs['co_driver_controller']['button']['LS']:
-            commands2.CommandScheduler.getInstance().schedule(TurretToggle(container=self, turret=self.container.turret, wait_to_finish=False))
+        drive_log = None
+        if self.drive_log_path is not None and os.path.exists(self.drive_log_path):
+            drive_log = DriveLog(self.drive_log_path)
+        elif self.drive_log_path is not None:
+            print(f'No drive log at {self.drive_log_path} - playing back the sticks open-loop')
 
-        if current_inputs['co_driver_controller']['axis']['axis2'] > 0.2 and not previous_inputs['co_driver_controller']['axis']['axis2'] > 0.2:
-            commands2.CommandScheduler.getInstance().schedule(TurretToggle(container=self, turret=self.container.turret, wait_to_finish=False))
+        # the swerve's default command does all the driving - hand it the log we already loaded so it doesn't read the file a second time
+        self.container.drive.setDefaultCommand(PlaybackSwerve(self.container, self.input_log_path, field_oriented=constants.k_field_centric,
+                                                              rate_limited=constants.k_rate_limited, input_log=self.input_log, clock=self.clock,
+                                                              drive_log=drive_log))
+        self.clock.start()
 
-        if current_inputs['co_driver_controller']['axis']['axis3'] > 0.2 and not previous_inputs['co_driver_controller']['axis']['axis3'] > 0.2:
-            commands2.CommandScheduler.getInstance().schedule(TurretToggle(container=self, turret=self.container.turret, wait_to_finish=False))
+        self.start_time = round(self.container.get_enabled_time(), 2)
+        print("\n" + f"** Started {self.getName()} at {self.start_time} s with {len(self.timeline)} events **", flush=True)
+        SmartDashboard.putString("alert",
+                                 f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
 
-        self.line_count += 1
+    def execute(self) -> None:
 
+        # we run before the drive's default command, so the clock is updated before PlaybackSwerve reads it
+        # (the driving all happens over there)
+        clock = self.clock
+        clock.update()
+        current = clock.index
+
+        # --------------- BUTTONS ---------------
+
+        # every edge up to this frame - if a long loop skipped frames we still catch up on their presses
+        timeline = self.timeline
+        while self.next_event < len(timeline) and timeline[self.next_event][0] <= current:
+            self.event_frame, index, pressed = timeline[self.next_event]
+            self.next_event += 1
+            _, _, on_press, while_held = self.bindings[index]
+            if pressed:
+                if on_press is not None:
+                    on_press()
+                if while_held is not None:
+                    held_commands = while_held()
+                    for command in held_commands:
+                        command.initialize()
+                    self.held[index] = (clock.loops, held_commands)
+            elif index in self.held:
+                for command in self.held.pop(index)[1]:
+                    command.end(interrupted=True)
+
+        # anything still held from an earlier loop gets its execute
+        for pressed_loop, held_commands in self.held.values():
+            if pressed_loop < clock.loops:
+                for command in held_commands:
+                    command.execute()
 
     def isFinished(self) -> bool:
-        return self.line_count >= len(self.input_log)
+        return self.clock.is_finished()
 
     def end(self, interrupted: bool) -> None:
+        # let go of anything the log was still holding down when it ran out
+        for _, held_commands in self.held.values():
+            for command in held_commands:
+                command.end(interrupted=True)
+        self.held.clear()
         self.container.drive.setDefaultCommand(DriveByJoystickSwerve(self.container, self.container.drive, field_oriented=constants.k_field_centric, rate_limited=constants.k_rate_limited))
         end_time = self.container.get_enabled_time()
         message = 'Interrupted' if interrupted else 'Ended'
-        print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
+        print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s - "
+              f"drift {self.clock.drift:.3f} s, {self.clock.missed_frames} frames skipped **")
         SmartDashboard.putString(f"alert",
                                  f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
-
-    # stuff from drive_by_joystick_swerve- might it be better and DRYer to have it in the subsystem?
-
-    def apply_deadband(self, value, db_low=DriveConstants.k_inner_deadband, db_high=DriveConstants.k_outer_deadband):
-        if abs(value) < db_low:
-            return 0
-        elif abs(value) > db_high:
-            return 1 * math.copysign(1, value)
-        else:
-            return value
-
-    def input_transform(self, value, a=0.9, b=0.1):
-        db_value = self.apply_deadband(value)
-        return a * db_value**3 + b * db_value
-
-    def run_while_held(self, button_keys: Tuple[str, ...], command: commands2.Command, pov_value=None):
-        if pov_value != None:
-            current_val = self.input_log[self.line_count][button_keys[0]][button_keys[1]][button_keys[2]] == pov_value
-            prev_val = self.input_log[self.line_count-1][button_keys[0]][button_keys[1]][button_keys[2]] == pov_value
-
-        else: 
-            current_val = self.input_log[self.line_count][button_keys[0]][button_keys[1]][button_keys[2]]
-            prev_val = self.input_log[self.line_count-1][button_keys[0]][button_keys[1]][button_keys[2]]
-
-        if current_val and not prev_val:
-            command.initialize()
-        elif current_val and prev_val:
-            command.execute()
-        elif prev_val and not current_val:
-            command.end(interrupted=True)
-
@@ -1,28 +1,54 @@
 import math
-import json
 import commands2
 from wpilib import SmartDashboard
-import constants
-from subsystems.swerve_constants import DriveConstants
+from wpimath.controller import PIDController
+from wpimath.geometry import Pose2d, Rotation2d
+from wpimath.kinematics import ChassisSpeeds
+from subsystems.swerve_constants import DriveConstants as dc, AutoConstants as ac
+from misc.input_log import InputLog
+from misc.drive_log import DriveLog
+from misc.playback_clock import PlaybackClock
+from misc.input_transform import pretransform_log
 
 
 class PlaybackSwerve(commands2.CommandBase):  # change the name for your command
 
-    def __init__(self, container, input_log_path: str, field_oriented=True, rate_limited=False) -> None:
+    def __init__(self, container, input_log_path: str, field_oriented=True, rate_limited=False, input_log: InputLog = None,
+                 clock: PlaybackClock = None, drive_log: DriveLog = None) -> None:
         super().__init__()
         self.setName('Playback Swerve')  # change this to something appropriate for this command
         self.container = container
         self.field_oriented = field_oriented
         self.rate_limited = rate_limited
         self.input_log_path = input_log_path
-        
+        self.preloaded_log = input_log  # PlaybackAuto passes in the log it already mapped
+        self.clock = clock  # and the clock it updates every loop - otherwise we run our own
+        self.owns_clock = clock is None
+
+        # with a drive log we track the recorded pose instead of replaying the sticks
+        self.drive_log = drive_log
+        self.drive_clock = None
+        self.x_pid = PIDController(ac.kPXController, 0, 0)
+        self.y_pid = PIDController(ac.kPYController, 0, 0)
+        self.theta_pid = PIDController(ac.kPThetaController, 0, 0)
+        self.theta_pid.enableContinuousInput(-math.pi, math.pi)
+
         self.addRequirements(self.container.drive)
 
     def initialize(self) -> None:
-        with open(self.input_log_path, 'r') as input_json:
-            self.input_log = json.load(input_json)
+        self.input_log = self.preloaded_log if self.preloaded_log is not None else InputLog(self.input_log_path)
+        if self.clock is None:  # only once - as a default command we get rescheduled after the log runs out
+            self.clock = PlaybackClock(self.input_log)
+            self.clock.start()
+        pretransform_log(self.input_log)  # no-op if PlaybackAuto already did it
+        self.fwd, self.strafe, self.rot = self.input_log['drive_fwd'], self.input_log['drive_strafe'], self.input_log['drive_rot']
 
-        self.line_count=1
+        if self.drive_log is not None and self.drive_clock is None and len(self.drive_log) > 0:
+            # run the drive log off the same start time, and start odometry where the recording did
+            self.drive_clock = PlaybackClock(self.drive_log, report=False)
+            self.drive_clock.start(self.clock.start_time)
+            log = self.drive_log
+            self.container.drive.resetOdometry(Pose2d(log['x'][0], log['y'][0], Rotation2d.fromDegrees(log['heading'][0])))
 
         """Called just before this Command runs the first time."""
         self.start_time = round(self.container.get_enabled_time(), 2)
@@ -31,28 +57,39 @@ class PlaybackSwerve(commands2.CommandBase):  # change the name for your command
                                  f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
 
     def execute(self) -> None:
-        self.line_count = round((self.container.get_enabled_time()) * 50)
-        if self.line_count > 749: 
+        clock = self.clock
+        if self.owns_clock:
+            clock.update()
+        if clock.is_finished():
             self.container.drive.drive(0, 0, 0, fieldRelative=True, rate_limited=False, keep_angle=True)
             return
 
-        current_inputs = self.input_log[self.line_count]
-        previous_inputs = self.input_log[self.line_count-1]
-
-        if current_inputs['driver_controller']['button']['LB'] and not previous_inputs['driver_controller']['button']['LB']:
-            slowmode_multiplier = constants.k_slowmode_multiplier
-        elif current_inputs['driver_controller']['axis']['axis2'] and not previous_inputs['driver_controller']['axis']['axis2']:
-            slowmode_multiplier = 1.5 * constants.k_slowmode_multiplier
-        else: 
-            slowmode_multiplier = 1
+        if self.drive_clock is not None:
+            self.follow_recorded_pose()
+            return
 
-        self.container.drive.drive(-self.input_transform(slowmode_multiplier*current_inputs['driver_controller']['axis']['axis1']),
-                                   self.input_transform(slowmode_multiplier*current_inputs['driver_controller']['axis']['axis0']),
-                                   -self.input_transform(slowmode_multiplier*current_inputs['driver_controller']['axis']['axis4']),
+        # sticks were shaped for the whole log at init - just interpolate them at the playback time
+        self.container.drive.drive(clock.sample(self.fwd), clock.sample(self.strafe), clock.sample(self.rot),
                                    fieldRelative=True, rate_limited=False, keep_angle=True)
 
+    def follow_recorded_pose(self) -> None:
+        # feedforward from how fast the recording was moving plus P on the pose error - field relative, in m/s and rad/s
+        clock, log = self.drive_clock, self.drive_log
+        clock.update()
+        pose = self.container.drive.get_pose()
+        target_heading = math.radians(clock.sample(log['heading']))
+        vx = clock.slope(log['x']) + self.x_pid.calculate(pose.X(), clock.sample(log['x']))
+        vy = clock.slope(log['y']) + self.y_pid.calculate(pose.Y(), clock.sample(log['y']))
+        omega = math.radians(clock.slope(log['heading'])) + self.theta_pid.calculate(pose.rotation().radians(), target_heading)
+
+        # rotate into the robot frame with the estimator's heading, not the raw gyro drive() would use - see FollowTrajectory
+        speeds = ChassisSpeeds.fromFieldRelativeSpeeds(vx, vy, omega, pose.rotation())
+        # drive() wants fractions of max speed
+        self.container.drive.drive(speeds.vx / dc.kMaxSpeedMetersPerSecond, speeds.vy / dc.kMaxSpeedMetersPerSecond,
+                                   speeds.omega / dc.kMaxAngularSpeed, fieldRelative=False, rate_limited=False, keep_angle=False)
+
     def isFinished(self) -> bool:
-        return self.line_count >= len(self.input_log)
+        return self.clock.is_finished()
 
     def end(self, interrupted: bool) -> None:
         end_time = self.container.get_enabled_time()
@@ -60,16 +97,3 @@ class PlaybackSwerve(commands2.CommandBase):  # change the name for your command
         print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
         SmartDashboard.putString(f"alert",
                                  f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
-
-    def apply_deadband(self, value, db_low=DriveConstants.k_inner_deadband, db_high=DriveConstants.k_outer_deadband):
-        if abs(value) < db_low:
-            return 0
-        elif abs(value) > db_high:
-            return 1 * math.copysign(1, value)
-        else:
-            return value
-
-    def input_transform(self, value, a=0.9, b=0.1):
-        db_value = self.apply_deadband(value)
-        return a * db_value**3 + b * db_value
-
@@ -2,11 +2,10 @@ import commands2
 
 import constants
 from autonomous.drive_wait import DriveWait
-from commands.elevator_move import ElevatorMove
-from commands.turret_move import TurretMove
 from commands.manipulator_toggle import ManipulatorToggle
 from commands.arm_move import ArmMove
 from commands.wrist_move import WristMove
+from commands.superstructure_move import SuperstructureMove
 from subsystems.wrist import Wrist
 
 class ScoreHiConeFromStow(commands2.SequentialCommandGroup):  # change the name for your command
@@ -16,22 +15,10 @@ class ScoreHiConeFromStow(commands2.SequentialCommandGroup):  # change the name
         self.setName('ScoreHiConeFromStow')  # change this to something appropriate for this command
         self.container = container
 
-        # Step 1.a
-        # raise the elevator , don't wait to end - can go concurrently with other moves
-        self.addCommands(ElevatorMove(container=self.container, elevator=self.container.elevator,
-                                      setpoint=self.container.elevator.max_height, wait_to_finish=False))
-        # Step 2.a
-        # lower / raise wrist to upper scoring position 45°
-        self.addCommands(WristMove(container=self.container, wrist=self.container.wrist, setpoint=Wrist.positions['score'], wait_to_finish=False))
-
-        # Step 2.b
-        # extend the arm fully
-        self.addCommands(ArmMove(container=self.container, arm=self.container.arm,
-                                 setpoint=self.container.arm.max_extension, wait_to_finish=False).withTimeout(5))
-
-        # Step 1.b
-        # Get turret into position - this will take 1.25s to get there but we move to next step anyway
-        self.addCommands(TurretMove(container=self.container, turret=self.container.turret, setpoint=182, wait_to_finish=True))
+        # Steps 1 and 2 - elevator up, wrist to the upper scoring position 45°, arm out and turret to the pole, all
+        # at once - the turret waits for the elevator to clear on its own.  see misc/superstructure.py
+        self.addCommands(SuperstructureMove(container=self.container, turret=182, elevator=self.container.elevator.max_height,
+                                            arm=self.container.arm.max_extension, wrist=Wrist.positions['score']).withTimeout(5))
 
         # Optional - center turret on post
 
@@ -49,20 +36,13 @@ class ScoreHiConeFromStow(commands2.SequentialCommandGroup):  # change the name
         # Step 6 bring the wrist back up
         # Drop the wrist to level
         # self.addCommands(WristMove(container=self.container, wrist=self.container.wrist, setpoint=Wrist.positions['score'], wait_to_finish=False).withTimeout(2))
-        self.addCommands(WristMove(container=self.container, wrist=self.container.wrist, setpoint=Wrist.positions['stow'], wait_to_finish=True).withTimeout(0.5))
+        # start the arm in once the wrist is nearly up - it finishes on its own
+        self.addCommands(WristMove(container=self.container, wrist=self.container.wrist, setpoint=Wrist.positions['stow'],
+                                   wait_to_finish=True, finish_early=0.15).withTimeout(0.5))
 
-        # step 7 - arm goes back in
+        # step 7 - arm goes back in, and the elevator and turret can go once it's nearly there
         self.addCommands(ArmMove(container=self.container, arm=self.container.arm,
-                                 setpoint=self.container.arm.min_extension, wait_to_finish=True).withTimeout(0.75))
-
-        # Step 1.b
-        # Get turret into position - this will take 1.25s to get there but we move to next step anyway
-        # self.addCommands(TurretMove(container=self.container, turret=self.container.turret, setpoint=0, wait_to_finish=False).withTimeout(1))
-
-
-         # Step 1.a
-        # raise the elevator , don't wait to end - can go concurrently with other moves
-        self.addCommands(ElevatorMove(container=self.container, elevator=self.container.elevator,
-                                      setpoint=300, wait_to_finish=False))
+                                 setpoint=self.container.arm.min_extension, wait_to_finish=True, finish_early=0.2).withTimeout(0.75))
 
-        self.addCommands(TurretMove(container=self.container, turret=self.container.turret, setpoint=0, wait_to_finish=True))
\ No newline at end of file
+        # back to stow height and turret forward together
+        self.addCommands(SuperstructureMove(container=self.container, turret=0, elevator=300).withTimeout(3))
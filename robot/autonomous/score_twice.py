@@ -11,6 +11,7 @@ from commands.wrist_move import WristMove
 from commands.elevator_move import ElevatorMove
 from commands.arm_move import ArmMove
 from commands.turret_move import TurretMove
+from commands.superstructure_move import SuperstructureMove
 
 class ScoreTwice(commands2.SequentialCommandGroup):
     # LHACK, scores twice. Commented out everything after backing up from grid bc I don't want to tip bot hueneme-style
@@ -19,16 +20,10 @@ class ScoreTwice(commands2.SequentialCommandGroup):
         self.setName('Score Twice')
         self.container = container
 
-        # Drop first cone
-        self.addCommands(ElevatorMove(container=self.container, elevator=self.container.elevator,
-                                      setpoint=self.container.elevator.max_height, wait_to_finish=False))
-
-        self.addCommands(WristMove(container=self.container, wrist=self.container.wrist, setpoint=Wrist.positions['score'], wait_to_finish=False))
-
-        self.addCommands(ArmMove(container=self.container, arm=self.container.arm,
-                                 setpoint=self.container.arm.max_extension, wait_to_finish=False).withTimeout(5))
-
-        self.addCommands(TurretMove(container=self.container, turret=self.container.turret, setpoint=182, wait_to_finish=True))
+        # Drop first cone - elevator, wrist, arm and turret all at once, the turret waits for the elevator to clear
+        # on its own.  see misc/superstructure.py
+        self.addCommands(SuperstructureMove(container=self.container, turret=182, elevator=self.container.elevator.max_height,
+                                            arm=self.container.arm.max_extension, wrist=Wrist.positions['score']).withTimeout(5))
 
         self.addCommands(WristMove(container=self.container, wrist=self.container.wrist, setpoint=Wrist.positions['flat'], wait_to_finish=True).withTimeout(1))
 
@@ -1,5 +1,6 @@
 import commands2
 from wpilib import SmartDashboard
+from misc.sensor_cache import sensors
 
 
 class TurretInitialize(commands2.CommandBase):
@@ -30,7 +31,7 @@ class TurretInitialize(commands2.CommandBase):
         SmartDashboard.putBoolean('turret_initialized', False)
 
     def execute(self) -> None:
-        self.data[self.counter % self.samples] = self.turret.analog_abs_encoder.getDistance()
+        self.data[self.counter % self.samples] = sensors.value('turret_abs_encoder')  # read once per loop by the cache
         self.counter += 1
 
     def isFinished(self) -> bool:
@@ -1,10 +1,11 @@
 import commands2
 from wpilib import SmartDashboard
 from subsystems.arm import Arm
+from misc.smartmotion import predicted_arrival
 
 class ArmMove(commands2.CommandBase):
 
-    def __init__(self, container, arm:Arm, setpoint=None, direction=None, wait_to_finish=True, decide_by_turret=False) -> None:
+    def __init__(self, container, arm:Arm, setpoint=None, direction=None, wait_to_finish=True, decide_by_turret=False, finish_early=0) -> None:
         super().__init__()
         self.setName('Arm Move')
         self.container = container
@@ -12,8 +13,10 @@ class ArmMove(commands2.CommandBase):
         self.setpoint = setpoint
         self.direction = direction
         self.wait_to_finish = wait_to_finish  # determine how long we wait to end
+        self.finish_early = finish_early  # seconds - end when the profile says we are this close, so a group can move on
         self.decide_by_turret = decide_by_turret
         self.tolerance = 10  # mm tolerance in choosing next cycle position
+        self.slot = 0
 
         self.addRequirements(self.arm)  # commandsv2 version of requirements
 
@@ -54,6 +57,7 @@ class ArmMove(commands2.CommandBase):
                 slot = 1
             self.arm.set_arm_extension(distance=self.setpoint, mode='smartmotion', slot=slot)
             print(f'Setting arm from {position:.0f} to {self.setpoint}')
+        self.slot = slot  # retracting uses its own smartmotion limits
         self.arm.is_moving = True
 
     def execute(self) -> None:  # nothing to do, the sparkmax is doing all the work
@@ -61,10 +65,19 @@ class ArmMove(commands2.CommandBase):
 
     def isFinished(self) -> bool:
         if self.wait_to_finish:  # wait for the arm to get within x mm
+            if self.finish_early > 0 and self.arriving_within(self.finish_early):
+                return True  # the sparkmax finishes the move on its own
             return abs(self.arm.get_extension() - self.setpoint) < self.tolerance
         else:
             return True
 
+    def time_to_arrival(self) -> float:
+        """Seconds left in the smartmotion profile from where we are and how fast we are going - see misc/smartmotion.py"""
+        return predicted_arrival('arm', self.arm.get_extension(), self.arm.sparkmax_encoder.getVelocity(), self.arm.setpoint, self.slot)
+
+    def arriving_within(self, seconds) -> bool:
+        return self.time_to_arrival() < seconds
+
     def end(self, interrupted: bool) -> None:
         end_time = self.container.get_enabled_time()
         message = 'Interrupted' if interrupted else 'Ended'
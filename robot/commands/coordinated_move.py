@@ -0,0 +1,69 @@
+import commands2
+from wpilib import SmartDashboard
+from misc.smartmotion import limits, synchronize, k_seconds_per_minute
+from misc.superstructure import AXES, TOLERANCES
+
+
+class CoordinatedMove(commands2.CommandBase):
+    """SmartMotion moves on several axes that all arrive at the same time - see misc/smartmotion.py
+    Each axis's profile normally runs flat out on its own SM_MaxVel, so in a combined move one axis finishes early
+    and the end effector takes a different path every time.  Here the slowest axis still goes flat out, and the
+    others get their cruise velocity turned down so they finish with it - or stagger[axis] seconds after it.
+    The slowed down limits are written to the sparkmaxes before the references go out, and put back at the end.
+    No interlocks here - use SuperstructureMove when the moves have to wait on each other.
+    """
+
+    def __init__(self, container, turret=None, elevator=None, arm=None, wrist=None, stagger=None) -> None:
+        super().__init__()
+        self.setName('Coordinated Move')
+        self.container = container
+        self.targets = {'turret': turret, 'elevator': elevator, 'arm': arm, 'wrist': wrist}
+        self.stagger = stagger  # axis -> seconds late, e.g. {'wrist': 0.2} to land the wrist after the arm
+
+        self.subsystems = {'turret': container.turret, 'elevator': container.elevator, 'arm': container.arm, 'wrist': container.wrist}
+        self.getters = {'turret': container.turret.get_angle, 'elevator': container.elevator.get_height,
+                        'arm': container.arm.get_extension, 'wrist': container.wrist.get_angle}
+        self.setters = {'turret': lambda angle, slot: container.turret.set_turret_angle(angle=angle, mode='smartmotion'),
+                        'elevator': lambda height, slot: container.elevator.set_elevator_height(height=height, mode='smartmotion'),
+                        'arm': lambda distance, slot: container.arm.set_arm_extension(distance=distance, mode='smartmotion', slot=slot),
+                        'wrist': lambda angle, slot: container.wrist.set_wrist_angle(angle=angle, mode='smartmotion')}
+
+        self.addRequirements(*[self.subsystems[axis] for axis in AXES if self.targets[axis] is not None])
+
+    def initialize(self) -> None:
+        self.print_start_message()
+        positions = {axis: self.getters[axis]() for axis in AXES}
+        self.moving = {axis: target for axis, target in self.targets.items()
+                       if target is not None and abs(target - positions[axis]) > TOLERANCES[axis]}
+        self.slots = {axis: 1 if axis == 'arm' and target < positions[axis] else 0 for axis, target in self.moving.items()}
+
+        moves = {axis: (target - positions[axis], *limits(axis, self.slots[axis])) for axis, target in self.moving.items()}
+        plan = synchronize(moves, self.stagger)
+        for axis, (velocity, duration) in plan.items():
+            # per second back to the sparkmax's per minute
+            self.subsystems[axis].pid_controller.setSmartMotionMaxVelocity(velocity * k_seconds_per_minute, self.slots[axis])
+            self.subsystems[axis].pid_controller.invalidate()  # new limits - make sure the reference goes out even if it is the same
+            self.setters[axis](self.moving[axis], self.slots[axis])
+        print('  Coordinated: ' + ', '.join(f'{axis} {positions[axis]:.0f}->{self.moving[axis]:.0f} in {duration:.2f}s'
+                                             for axis, (_, duration) in plan.items()), flush=True)
+
+    def execute(self) -> None:  # nothing to do, the sparkmaxes are doing all the work
+        pass
+
+    def isFinished(self) -> bool:
+        return all(abs(self.getters[axis]() - target) < TOLERANCES[axis] for axis, target in self.moving.items())
+
+    def end(self, interrupted: bool) -> None:
+        # back to the configured limits so the single axis moves are flat out again
+        for axis in self.moving:
+            max_velocity, _ = limits(axis, self.slots[axis])
+            self.subsystems[axis].pid_controller.setSmartMotionMaxVelocity(max_velocity * k_seconds_per_minute, self.slots[axis])
+        end_time = self.container.get_enabled_time()
+        message = 'Interrupted' if interrupted else 'Ended'
+        print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
+        SmartDashboard.putString(f"alert", f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
+
+    def print_start_message(self):
+        self.start_time = round(self.container.get_enabled_time(), 2)
+        print("\n" + f"** Started {self.getName()} at {self.start_time} s **", flush=True)
+        SmartDashboard.putString("alert", f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
@@ -1,14 +1,12 @@
 #  copying 1706's default swerve drive control
 
-import math
 import typing
 import commands2
 from subsystems.swerve import Swerve  # allows us to access the definitions
 from wpilib import SmartDashboard
 from wpimath.geometry import Translation2d
 from wpimath.filter import Debouncer
-import constants
-from subsystems.swerve_constants import DriveConstants as dc
+from misc.input_transform import slowmode_multiplier, drive_sticks, k_slowmode_debounce
 
 class DriveByJoystickSwerve(commands2.CommandBase):
     def __init__(
@@ -22,7 +20,7 @@ class DriveByJoystickSwerve(commands2.CommandBase):
         self.rate_limited = rate_limited
         # probably some better way to do this
         # chose 5 because that'll cause it to return true after 0.1 seconds like in robotcontainer
-        self.debouncer = Debouncer(0.1, Debouncer.DebounceType.kBoth)
+        self.debouncer = Debouncer(k_slowmode_debounce, Debouncer.DebounceType.kBoth)  # playback does the same - see misc/input_transform.py
 
         self.addRequirements([self.swerve])
 
@@ -36,24 +34,16 @@ class DriveByJoystickSwerve(commands2.CommandBase):
 
         # setting a slow mode here - not sure if it's the best way - may want a debouncer on it
 
-        if self.debouncer.calculate(self.container.driver_controller.getRawButton(5)):
-            slowmode_multiplier = constants.k_slowmode_multiplier
-
-        elif self.container.driver_controller.getRawAxis(2) > 0.5:
-            slowmode_multiplier = 1.5 * constants.k_slowmode_multiplier
-
-        else: slowmode_multiplier = 1.0
-
-        # slowmode_multiplier = constants.k_slowmode_multiplier if self.container.driver_controller.getRawButton(5) else 1.0
-        max_linear = 1 * slowmode_multiplier  # stick values  - actual rates are in the constants files
-        max_angular = 1 * slowmode_multiplier
+        controller = self.container.driver_controller
+        multiplier = slowmode_multiplier(self.debouncer.calculate(controller.getRawButton(5)), controller.getRawAxis(2))
+        max_linear = 1 * multiplier  # stick values  - actual rates are in the constants files
         # note that x is up/down on the left stick.  Don't want to invert x?
         # according to the templates, these are all multiplied by -1
         # SO IF IT DOES NOT DRIVE CORRECTLY THAT WAY, CHECK KINEMATICS, THEN INVERSION OF DRIVE/ TURNING MOTORS
         # not all swerves are the same - some require inversion of drive and or turn motors
-        desired_fwd = -self.input_transform(1.0*self.container.driver_controller.getRawAxis(1)) * max_linear
-        desired_strafe = self.input_transform(1.0 * self.container.driver_controller.getRawAxis(0)) * max_linear
-        desired_rot = -self.input_transform(1.0 * self.container.driver_controller.getRawAxis(4)) * max_angular
+        # deadband, cubic and slow mode all live in misc/input_transform.py so playback drives the same way
+        desired_fwd, desired_strafe, desired_rot = drive_sticks(controller.getRawAxis(1), controller.getRawAxis(0),
+                                                                controller.getRawAxis(4), multiplier)
 
         correct_like_1706 = False  # this is what 1706 does, but Rev put all that in the swerve module's drive
         if correct_like_1706:
@@ -75,15 +65,3 @@ class DriveByJoystickSwerve(commands2.CommandBase):
         message = 'Interrupted' if interrupted else 'Ended'
         print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **", flush=True)
         SmartDashboard.putString(f"alert", f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
-
-    def apply_deadband(self, value, db_low=dc.k_inner_deadband, db_high=dc.k_outer_deadband):
-        if abs(value) < db_low:
-            return 0
-        elif abs(value) > db_high:
-            return 1 * math.copysign(1, value)
-        else:
-            return value
-
-    def input_transform(self, value, a=0.9, b=0.1):
-        db_value = self.apply_deadband(value)
-        return a * db_value**3 + b * db_value
\ No newline at end of file
@@ -1,12 +1,13 @@
 import commands2
 from wpilib import SmartDashboard
 from subsystems.elevator import Elevator
+from misc.smartmotion import predicted_arrival
 from wpilib import DoubleSolenoid
 
 class ElevatorMove(commands2.CommandBase):
 
     def __init__(self, container, elevator:Elevator, setpoint=None, direction=None, wait_to_finish=True,
-                 drive_controls=False, enable_skip=False, decide_by_turret=False) -> None:
+                 drive_controls=False, enable_skip=False, decide_by_turret=False, finish_early=0) -> None:
         super().__init__()
         self.setName('Elevator Move')
         self.container = container
@@ -15,6 +16,7 @@ class ElevatorMove(commands2.CommandBase):
         self.direction = direction
         self.tolerance = 10
         self.wait_to_finish = wait_to_finish  # determine how long we wait to end
+        self.finish_early = finish_early  # seconds - end when the profile says we are this close, so a group can move on
         self.drive_controls = drive_controls
         self.enable_skip = enable_skip
         self.decide_by_turret = decide_by_turret
@@ -70,10 +72,19 @@ class ElevatorMove(commands2.CommandBase):
 
     def isFinished(self) -> bool:
         if self.wait_to_finish:  # wait for the elevator to get within x mm
+            if self.finish_early > 0 and self.arriving_within(self.finish_early):
+                return True  # the sparkmax finishes the move on its own
             return abs(self.elevator.get_height() - self.setpoint) < self.tolerance
         else:
             return True
 
+    def time_to_arrival(self) -> float:
+        """Seconds left in the smartmotion profile from where we are and how fast we are going - see misc/smartmotion.py"""
+        return predicted_arrival('elevator', self.elevator.get_height(), self.elevator.sparkmax_encoder.getVelocity(), self.elevator.setpoint, 0)
+
+    def arriving_within(self, seconds) -> bool:
+        return self.time_to_arrival() < seconds
+
     def end(self, interrupted: bool) -> None:
         end_time = self.container.get_enabled_time()
         message = 'Interrupted' if interrupted else 'Ended'
@@ -28,7 +28,7 @@ class ManipulatorAutoGrab(commands2.CommandBase):
                                  f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
 
     def execute(self) -> None:
-        target_distance = self.pneumatics.get_target_distance()
+        target_distance = self.pneumatics.get_target_reading().value  # this loop's ToF read - see misc/sensor_cache.py
         grab_distance = 200 # mm
 
         if not self.has_game_piece and target_distance <= grab_distance and target_distance >= 50:
@@ -1,15 +1,27 @@
 import commands2
-import json
+import wpilib
 from wpilib import SmartDashboard
+from misc.input_log import InputLogWriter, AXIS_COUNT, BUTTONS
+from misc.drive_log import drive_log_writer, pack_drive_state, COLUMNS as DRIVE_COLUMNS
 
 
 class RecordAuto(commands2.CommandBase):  # change the name for your command
 
-    def __init__(self, container, input_log_path: str) -> None:
+    def __init__(self, container, input_log_path: str, duration=15, drive_log_path: str = None) -> None:
         super().__init__()
         self.setName('Record Auto')
         self.container = container
         self.input_log_path = input_log_path
+        self.duration = duration  # seconds to record - None records until the command is interrupted
+        self.drive_log_path = drive_log_path  # optional - pose, gyro and module positions for closed-loop playback
+        self.writer = None
+        self.drive_writer = None
+
+        # reuse these every frame - the log record is a timestamp, 12 axes, two button bitfields, two POVs
+        self.controllers = [self.container.driver_controller, self.container.co_driver_controller]
+        self.frame = [0.0] + [0.0] * (2 * AXIS_COUNT) + [0, 0, -1, -1]
+        self.button_ids = list(BUTTONS.values())
+        self.drive_frame = [0.0] * len(DRIVE_COLUMNS)
 
     def initialize(self) -> None:
         """Called just before this Command runs the first time."""
@@ -18,75 +30,45 @@ class RecordAuto(commands2.CommandBase):  # change the name for your command
         SmartDashboard.putString("alert",
                                  f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
 
-        self.counter = 0
-        self.input_log = []
+        # if the last recording is still flushing to these files, the new ones go to .part files and take over
+        # when it's done - never wait on the disk here
+        self.writer = InputLogWriter(self.input_log_path, after=self.writer)
+        if self.drive_log_path is not None:
+            self.drive_writer = drive_log_writer(self.drive_log_path, after=self.drive_writer)
+        self.record_start_time = wpilib.Timer.getFPGATimestamp()  # playback lines frames up against these timestamps
 
     def execute(self) -> None:
-
-        self.input_data = {
-            'driver_controller': {
-                'axis': {},
-                'button': {}
-            },
-            'co_driver_controller': {
-                'axis': {},
-                'button': {}
-            }
-        }
-
-        # Get driver inputs
-        for axis in range(0, 6):
-            self.input_data['driver_controller']['axis'][f'axis{axis}'] = self.container.driver_controller.getRawAxis(axis)
-
-        self.input_data['driver_controller']['button']['A'] = self.container.driver_controller.getRawButton(1)
-        self.input_data['driver_controller']['button']['B'] = self.container.driver_controller.getRawButton(2)
-        self.input_data['driver_controller']['button']['X'] = self.container.driver_controller.getRawButton(3)
-        self.input_data['driver_controller']['button']['Y'] = self.container.driver_controller.getRawButton(4)
-        self.input_data['driver_controller']['button']['LB'] = self.container.driver_controller.getRawButton(5)
-        self.input_data['driver_controller']['button']['RB'] = self.container.driver_controller.getRawButton(6)
-        self.input_data['driver_controller']['button']['Back'] = self.container.driver_controller.getRawButton(7)
-        self.input_data['driver_controller']['button']['Start'] = self.container.driver_controller.getRawButton(8)
-        # We don't use these buttons
-        # self.input_data['driver_controller']['button']['LS'] = self.container.driver_controller.getRawButton(9)
-        # self.input_data['driver_controller']['button']['RS'] = self.container.driver_controller.getRawButton(10)
-
-        self.input_data['driver_controller']['button']['POV'] = self.container.driver_controller.getPOV()
-
-
-        # Get operator inputs
-        for axis in range(0, 6):
-            self.input_data['co_driver_controller']['axis'][f'axis{axis}'] = self.container.co_driver_controller.getRawAxis(axis)
-
-        self.input_data['co_driver_controller']['button']['A'] = self.container.co_driver_controller.getRawButton(1)
-        self.input_data['co_driver_controller']['button']['B'] = self.container.co_driver_controller.getRawButton(2)
-        self.input_data['co_driver_controller']['button']['X'] = self.container.co_driver_controller.getRawButton(3)
-        self.input_data['co_driver_controller']['button']['Y'] = self.container.co_driver_controller.getRawButton(4)
-        self.input_data['co_driver_controller']['button']['LB'] = self.container.co_driver_controller.getRawButton(5)
-        self.input_data['co_driver_controller']['button']['RB'] = self.container.co_driver_controller.getRawButton(6)
-        self.input_data['co_driver_controller']['button']['Back'] = self.container.co_driver_controller.getRawButton(7)
-        self.input_data['co_driver_controller']['button']['Start'] = self.container.co_driver_controller.getRawButton(8)
-        self.input_data['co_driver_controller']['button']['LS'] = self.container.co_driver_controller.getRawButton(9)
-        #  self.input_data['co_driver_controller']['button']['RS'] = self.container.co_driver_controller.getRawButton(10)
-
-        self.input_data['co_driver_controller']['button']['POV'] = self.container.co_driver_controller.getPOV()
-
-        # Add captured inputs to the list
-        self.input_log.append(self.input_data)
-        self.counter += 1
-
+        # fill the frame in place and let the writer pack it into its chunk buffer (see misc/input_log.py)
+        frame = self.frame
+        frame[0] = wpilib.Timer.getFPGATimestamp() - self.record_start_time
+        for idx, controller in enumerate(self.controllers):
+            for axis in range(AXIS_COUNT):
+                frame[1 + idx * AXIS_COUNT + axis] = controller.getRawAxis(axis)
+            buttons = 0
+            for button_id in self.button_ids:
+                if controller.getRawButton(button_id):
+                    buttons |= 1 << (button_id - 1)
+            frame[1 + 2 * AXIS_COUNT + idx] = buttons
+            frame[1 + 2 * AXIS_COUNT + 2 + idx] = controller.getPOV()
+
+        self.writer.write_frame(*frame)
+        if self.drive_writer is not None:  # same timestamp so the two logs line up
+            self.drive_writer.write_frame(*pack_drive_state(frame[0], self.drive_frame, self.container.drive))
 
     def isFinished(self) -> bool:
-        return self.counter >= 750
+        return self.duration is not None and self.container.get_enabled_time() - self.start_time >= self.duration
     
     def runsWhenDisabled(self) -> bool:
         return True
 
     def end(self, interrupted: bool) -> None:
-        with open(self.input_log_path, 'w') as input_json:
-            json.dump(self.input_log, input_json, indent=1)
+        self.writer.close()  # the writer thread finishes the file and the footer on its own
+        if self.drive_writer is not None:
+            self.drive_writer.close()
 
         end_time = self.container.get_enabled_time()
         message = 'Interrupted' if interrupted else 'Ended'
-        print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
+        print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s "
+              f"with {self.writer.frame_count} frames ({self.writer.dropped_frames} dropped) **")
         SmartDashboard.putString(f"alert",
                                  f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
@@ -0,0 +1,99 @@
+import commands2
+import wpilib
+from wpilib import SmartDashboard
+from misc.smartmotion import limits, trapezoid_time
+from misc.superstructure import plan_moves, describe, AXES, TOLERANCES
+
+# a started leg that hasn't arrived in this long gives up - its smartmotion profile time, stretched by a scale and a margin
+k_leg_time_scale = 1.5
+k_leg_time_margin = 0.5  # seconds
+
+
+class SuperstructureMove(commands2.CommandBase):
+    """Move any of turret, elevator, arm and wrist to a target at once - see misc/superstructure.py
+    Leave an axis as None to leave it where it is.  Every axis starts as soon as its interlocks allow,
+    and the command ends when they have all arrived (or nothing can move - which would be a bad target).
+    A leg that starts but doesn't arrive in time (a bind, a soft limit short of the target) ends the command too.
+    """
+
+    def __init__(self, container, turret=None, elevator=None, arm=None, wrist=None) -> None:
+        super().__init__()
+        self.setName('Superstructure Move')
+        self.container = container
+        self.targets = {'turret': turret, 'elevator': elevator, 'arm': arm, 'wrist': wrist}
+
+        # axis -> (getter, setter) on the subsystems, so the planner only deals in numbers
+        self.getters = {'turret': container.turret.get_angle, 'elevator': container.elevator.get_height,
+                        'arm': container.arm.get_extension, 'wrist': container.wrist.get_angle}
+        self.setters = {'turret': lambda angle: container.turret.set_turret_angle(angle=angle, mode='smartmotion'),
+                        'elevator': lambda height: container.elevator.set_elevator_height(height=height, mode='smartmotion'),
+                        'arm': self.set_arm, 'wrist': lambda angle: container.wrist.set_wrist_angle(angle=angle, mode='smartmotion')}
+
+        # the planner may need to move an axis we didn't ask for out of the way, so we need all of them
+        self.addRequirements(container.turret, container.elevator, container.arm, container.wrist)
+
+    def set_arm(self, distance) -> None:
+        slot = 1 if distance < self.container.arm.get_extension() else 0  # slot 1 is for retracting - see ArmMove
+        self.container.arm.set_arm_extension(distance=distance, mode='smartmotion', slot=slot)
+        self.container.arm.is_moving = True
+
+    def initialize(self) -> None:
+        self.print_start_message()
+        positions = {axis: self.getters[axis]() for axis in AXES}
+        self.legs = plan_moves(positions, self.targets)
+        self.stalled = False
+        self.timed_out = None  # the axis whose leg ran out of time
+        # the interlocks get us there safely, but there is no point going if where we end up is not safe - see misc/cspace.py
+        final = tuple(positions[axis] if self.targets[axis] is None else self.targets[axis] for axis in AXES)
+        if not self.container.cspace.is_safe(final):
+            print(f'  Superstructure target {final} is not in safe space - not moving', flush=True)
+            self.legs = {axis: [] for axis in AXES}
+            return
+        print(f'  Superstructure plan: {describe(self.legs)}', flush=True)
+
+    def execute(self) -> None:
+        positions = {axis: self.getters[axis]() for axis in AXES}
+        done = {axis for axis in AXES if not self.legs[axis]}
+        moving = False
+        for axis in AXES:
+            legs = self.legs[axis]
+            if not legs:
+                continue
+            leg = legs[0]
+            if leg.started and abs(positions[axis] - leg.target) < TOLERANCES[axis]:
+                legs.pop(0)  # arrived - the next leg (if any) gets its chance next loop
+                if not legs:
+                    done.add(axis)
+                moving = True  # counts as progress - someone may have been waiting on it
+                continue
+            if not leg.started and leg.ready(positions, done):
+                self.setters[axis](leg.target)
+                leg.started = True
+                slot = 1 if axis == 'arm' and leg.target < positions[axis] else 0  # same as set_arm
+                profile_time = trapezoid_time(leg.target - positions[axis], *limits(axis, slot))
+                leg.deadline = wpilib.Timer.getFPGATimestamp() + k_leg_time_scale * profile_time + k_leg_time_margin
+            elif leg.started and wpilib.Timer.getFPGATimestamp() > leg.deadline:
+                self.timed_out = axis
+            moving |= leg.started
+        # everything left is waiting on something that isn't moving - don't sit here forever
+        self.stalled = not moving and any(self.legs.values())
+
+    def isFinished(self) -> bool:
+        return self.stalled or self.timed_out is not None or not any(self.legs.values())
+
+    def end(self, interrupted: bool) -> None:
+        end_time = self.container.get_enabled_time()
+        message = 'Interrupted' if interrupted else ('Stalled' if self.stalled else 'Ended')
+        if self.stalled:
+            print(f'  Superstructure stalled with {describe(self.legs)} left', flush=True)
+        if self.timed_out is not None:  # as good as interrupted - we never got there
+            message = f'Interrupted ({self.timed_out} timed out at {self.getters[self.timed_out]():.0f})'
+            print(f'  Superstructure {self.timed_out} did not reach {self.legs[self.timed_out][0].target:.0f} in time '
+                  f'with {describe(self.legs)} left', flush=True)
+        print(f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
+        SmartDashboard.putString(f"alert", f"** {message} {self.getName()} at {end_time:.1f} s after {end_time - self.start_time:.1f} s **")
+
+    def print_start_message(self):
+        self.start_time = round(self.container.get_enabled_time(), 2)
+        print("\n" + f"** Started {self.getName()} at {self.start_time} s **", flush=True)
+        SmartDashboard.putString("alert", f"** Started {self.getName()} at {self.start_time - self.container.get_enabled_time():2.2f} s **")
@@ -19,7 +19,6 @@ class ToggleGroundPickup(commands2.CommandBase):
             'cube': wrist.positions['floor'],
         }
 
-        self.distance_sensor = pneumatics.target_distance_sensor
         self.median_filter = MedianFilter(5)
         self.target_distance = target_distance
 
@@ -45,7 +44,7 @@ class ToggleGroundPickup(commands2.CommandBase):
 
 
     def execute(self) -> None: #50 times a second
-        distance = self.median_filter.calculate(self.distance_sensor.getRange())
+        distance = self.median_filter.calculate(self.pneumatics.get_target_distance())  # cached once per loop
 
         if  distance <= self.target_distance:
             self.counter += 1
@@ -5,6 +5,7 @@ import constants
 from commands.elevator_move import ElevatorMove
 from commands.wrist_move import WristMove
 from commands.turret_move import TurretMove
+from commands.superstructure_move import SuperstructureMove
 from commands.manipulator_toggle import ManipulatorToggle
 from autonomous.turret_move_by_vision import TurretMoveByVision
 
@@ -22,9 +23,9 @@ class ToggleHighPickup(commands2.SequentialCommandGroup):
 
         # ToDo: all timeouts need tweaking
 
-        #move elevator
-        self.addCommands(WristMove(container=container, wrist=wrist, setpoint=wrist.positions['stow'], wait_to_finish=False))
-        self.addCommands(ElevatorMove(container=container, elevator=elevator, setpoint=elevator.positions['upper_pickup'], wait_to_finish=True))
+        #move elevator - and the wrist up at the same time, the elevator waits for it if it was on the floor
+        self.addCommands(SuperstructureMove(container=container, elevator=elevator.positions['upper_pickup'],
+                                            wrist=wrist.positions['stow']).withTimeout(3))
 
         #open wrist
         self.addCommands(ManipulatorToggle(container=container, pneumatics=pneumatics, force='open'))
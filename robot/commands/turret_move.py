@@ -2,10 +2,12 @@ import commands2
 from wpilib import SmartDashboard
 from subsystems.turret import Turret
 from subsystems.elevator import Elevator
+from misc.smartmotion import predicted_arrival
+from misc.cspace import current_configuration
 
 class TurretMove(commands2.CommandBase):
 
-    def __init__(self, container, turret:Turret, setpoint=None, direction=None, relative=False, wait_to_finish=True) -> None:
+    def __init__(self, container, turret:Turret, setpoint=None, direction=None, relative=False, wait_to_finish=True, finish_early=0) -> None:
         super().__init__()
         self.setName('TurretMove')
         self.container = container
@@ -14,9 +16,9 @@ class TurretMove(commands2.CommandBase):
         self.setpoint = setpoint
         self.direction = direction
         self.relative = relative
-        self.elevator_safety_limit = 280  # don't swing if the elevator is lower than this
         self.tolerance = 3  # for stepping to the next preset location
         self.wait_to_finish = wait_to_finish  # determine how long we wait to end
+        self.finish_early = finish_early  # seconds - end when the profile says we are this close, so a group can move on
 
         self.addRequirements(self.turret)  # commandsv2 version of requirements
 
@@ -24,40 +26,53 @@ class TurretMove(commands2.CommandBase):
         self.print_start_message()
         # tell the turret to go to position
         position = self.turret.get_angle()
-        # tell the turret to go to position
 
         if self.setpoint is None:  # step through the presets
-            if self.elevator.get_height() < self.elevator_safety_limit:  # added 3/27/2023 for safety
-                # do nothing
-                print('Turret move called with elevator too low')
-                return
-            elif self.direction == 'up':
+            if self.direction == 'up':
                 allowed_positions = [x for x in sorted(self.turret.positions.values()) if x > position + self.tolerance]
                 # print(allowed_positions)
                 temp_setpoint = sorted(allowed_positions)[0] if len(allowed_positions) > 0 else position
             else:
                 allowed_positions = [x for x in sorted(self.turret.positions.values()) if x < position - self.tolerance]
                 temp_setpoint = sorted(allowed_positions)[-1] if len(allowed_positions) > 0 else position
+        elif self.relative:  # make a relative movement from where we are now
+            temp_setpoint = self.setpoint + position
+        else:  # make an absolute movement
+            temp_setpoint = self.setpoint
 
-            self.turret.set_turret_angle(angle=temp_setpoint, mode='smartmotion')
-            print(f'Setting turret from {position:.0f} to {temp_setpoint}')
-        else:  # go to the value passed to the function
-            if self.relative:  # make a relative movement from where we are now
-                temp_setpoint = self.setpoint + position
-                self.turret.set_turret_angle(angle=temp_setpoint, mode='smartmotion')
-            else:  # make an absolute movement
-                self.turret.set_turret_angle(angle=self.setpoint, mode='smartmotion')
-            print(f'Setting turret from {position:.0f} to {self.setpoint}')
+        # added 3/27/2023 for safety - now the whole swing gets checked against the interlocks in misc/cspace.py,
+        # whether it's a preset or a setpoint we were given
+        start = current_configuration(self.container)
+        blocker = self.container.cspace.path_blocker(start, (temp_setpoint,) + start[1:])
+        self.target = None if blocker is not None else temp_setpoint
+        if blocker is not None:
+            # do nothing
+            print(f'Turret move from {position:.0f} to {temp_setpoint:.0f} blocked by interlock: {blocker}')
+            SmartDashboard.putString('alert', f'Turret move to {temp_setpoint:.0f} blocked: {blocker}')
+            return
+        self.turret.set_turret_angle(angle=temp_setpoint, mode='smartmotion')
+        print(f'Setting turret from {position:.0f} to {temp_setpoint:.0f}')
 
     def execute(self) -> None:  # nothing to do, the sparkmax is doing all the work
         pass
 
     def isFinished(self) -> bool:
+        if self.target is None:  # blocked - we never went
+            return True
         if self.wait_to_finish:  # wait for the turret to get within x degrees
-            return abs(self.turret.get_angle() - self.setpoint) < self.tolerance
+            if self.finish_early > 0 and self.arriving_within(self.finish_early):
+                return True  # the sparkmax finishes the move on its own
+            return abs(self.turret.get_angle() - self.target) < self.tolerance
         else:
             return True
 
+    def time_to_arrival(self) -> float:
+        """Seconds left in the smartmotion profile from where we are and how fast we are going - see misc/smartmotion.py"""
+        return predicted_arrival('turret', self.turret.get_angle(), self.turret.sparkmax_encoder.getVelocity(), self.turret.setpoint, 0)
+
+    def arriving_within(self, seconds) -> bool:
+        return self.time_to_arrival() < seconds
+
     def end(self, interrupted: bool) -> None:
         end_time = self.container.get_enabled_time()
         message = 'Interrupted' if interrupted else 'Ended'
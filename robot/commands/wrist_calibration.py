@@ -2,6 +2,7 @@ import commands2
 from wpilib import SmartDashboard
 import rev
 from subsystems.wrist import Wrist
+from misc.sensor_cache import sensors
 
 
 class WristCalibration(commands2.CommandBase):
@@ -18,7 +19,7 @@ class WristCalibration(commands2.CommandBase):
     
     def initialize(self) -> None:
         self.print_start_message()
-        absolute_angle = self.wrist.abs_encoder.getPosition()
+        absolute_angle = sensors.refresh('wrist_abs_encoder').value  # fresh read, not up to 100ms old
         self.wrist.set_encoder_position(angle=absolute_angle)  # now we have a new maximum
 
     def execute(self) -> None:  # nothing to do, the sparkmax is doing all the work
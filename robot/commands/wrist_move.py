@@ -1,10 +1,11 @@
 import commands2
 from wpilib import SmartDashboard
 from subsystems.wrist import Wrist
+from misc.smartmotion import predicted_arrival
 
 class WristMove(commands2.CommandBase):
 
-    def __init__(self, container, wrist:Wrist, setpoint=None, direction=None, wait_to_finish=True) -> None:
+    def __init__(self, container, wrist:Wrist, setpoint=None, direction=None, wait_to_finish=True, finish_early=0) -> None:
         super().__init__()
         self.setName('Wrist Move')
         self.container = container
@@ -13,6 +14,7 @@ class WristMove(commands2.CommandBase):
         self.direction = direction
         self.tolerance = 3
         self.wait_to_finish = wait_to_finish  # determine how long we wait to end
+        self.finish_early = finish_early  # seconds - end when the profile says we are this close, so a group can move on
 
         self.addRequirements(self.wrist)  # commandsv2 version of requirements
 
@@ -21,7 +23,7 @@ class WristMove(commands2.CommandBase):
         position = self.wrist.get_angle()
 
         elevator_height = self.container.elevator.get_height()
-        ground_thresh = 200
+        ground_thresh = Wrist.ground_elevator_limit
         wrist_positions = list(self.wrist.positions.values())
 
         if elevator_height > ground_thresh:
@@ -59,10 +61,19 @@ class WristMove(commands2.CommandBase):
 
     def isFinished(self) -> bool:
         if self.wait_to_finish:  # wait for the wrist to get within x degrees
+            if self.finish_early > 0 and self.arriving_within(self.finish_early):
+                return True  # the sparkmax finishes the move on its own
             return abs(self.wrist.get_angle() - self.setpoint) < self.tolerance
         else:
             return True
 
+    def time_to_arrival(self) -> float:
+        """Seconds left in the smartmotion profile from where we are and how fast we are going - see misc/smartmotion.py"""
+        return predicted_arrival('wrist', self.wrist.get_angle(), self.wrist.sparkmax_encoder.getVelocity(), self.wrist.setpoint, 0)
+
+    def arriving_within(self, seconds) -> bool:
+        return self.time_to_arrival() < seconds
+
     def end(self, interrupted: bool) -> None:
         end_time = self.container.get_enabled_time()
         message = 'Interrupted' if interrupted else 'Ended'
@@ -11,10 +11,23 @@ k_use_swerve = True
 k_field_centric = True
 k_competition_mode = True  # use for compressor and some joystick settings
 k_burn_flash = False # if we want to burn the settings to the sparkmaxes
+k_restore_factory_defaults = False  # wipe the sparkmaxes at boot - normally we just fix whatever differs, see misc/configure_controllers.py
+k_config_workers = 8  # sparkmax groups configured at the same time at boot
 k_enable_soft_limits = True
 k_volt_compensation = 12.6
 k_rate_limited = True  # on swerve, use slew limiters to keep acceleration from being too abrupt
+k_use_setpoint_generator = True  # on swerve, limit module acceleration and steer rate - see subsystems/swerve_setpoint.py
+k_swerve_onboard_turning = False  # run the module turning PID on the sparkmax, not the rio - see SwerveModule.configure_onboard_turning
 k_debugging_messages = False  # turn these off for competition
+k_use_odometry_thread = True  # sample swerve odometry on a Notifier instead of once per loop - see misc/odometry_sampler.py
+k_odometry_period_ms = 10  # swerve drive status 2 (position) period, and so how often there is anything new to sample - see misc/can_status.py
+k_odometry_rate = 1000 // k_odometry_period_ms  # Hz for that sampler - faster would only re-read stale positions
+k_profile_loop = False  # time every periodic / execute and post p50/p99/max to the dashboard - see misc/loop_profiler.py
+k_sim_mechanisms = True  # in sim, move the turret / elevator / arm / wrist with physics.py instead of jumping to the setpoint
+k_setpoint_epsilon = 1e-3  # sparkmax setpoints closer than this to the last one sent are not re-sent - see misc/setpoint_cache.py
+k_setpoint_keepalive = 0.1  # but re-send anyway after this many seconds
+k_trajectory_cache = 'trajectories.bin'  # in the deploy directory - see misc/trajectory_cache.py
+k_cspace_table = 'cspace.bin'  # in the deploy directory - see misc/cspace.py
 
 # --------------  OI  ---------------
 # ID for the driver's TANK joystick (template)
@@ -119,6 +132,24 @@ k_manipulator_open_port = 0  # Double solenoid port 1 of two
 k_manipulator_closed_port = 1  #
 k_manipulator_timeofflight = 14
 
+# --------------  VISION  ---------------
+k_vision_stale_time = 0.5  # seconds without hearing from a camera before we stop trusting it - see Vision.update_readings
+# seconds from the BottomCam grabbing a frame to the values showing up on NT - an estimate until it's measured:
+#   the camera publishes tags/frames (+1 per frame) and tags/latency (grab to publish, in s) and flushes NT after each
+#   frame.  With the robot on, tag_frame on the dashboard should count up and tag_age should stay under a frame time.
+#   Put the typical tag_latency plus a couple of ms of network here, then turn on k_use_tag_fusion.  While the camera
+#   sends tags/latency, TagLocalizer uses that for each frame instead of this
+k_tag_latency = 0.05
+k_tag_match_distance = 1.0  # m - a tag reading has to land this close to a real tag or we ignore it
+k_use_tag_fusion = False  # correct the swerve pose estimate with tag readings - see misc/tag_localizer.py.  off until k_tag_latency is measured
+# pose estimator trust: x (m), y (m), heading (rad).  smaller is more trusted.  heading comes from the gyro, not tags
+k_state_std_devs = (0.1, 0.1, 0.01)
+k_vision_std_devs = (0.5, 0.5, 999)
+# 2023 field tag locations in m (x, y) - from the game manual drawings, in inches.  1-4 red side, 5-8 blue side
+k_tag_positions = {tag_id: (x * 0.0254, y * 0.0254) for tag_id, (x, y) in
+                   {1: (610.77, 42.19), 2: (610.77, 108.19), 3: (610.77, 174.19), 4: (636.96, 265.74),
+                    5: (14.25, 265.74), 6: (40.45, 174.19), 7: (40.45, 108.19), 8: (40.45, 42.19)}.items()}
+
 # ------------------- LED -------------------
 k_led_pwm_port = 3
 k_led_count = 36
@@ -0,0 +1,86 @@
+"""
+SparkMax status frame profiles and a CAN bus monitor
+Every SparkMax streams seven periodic status frames whether we read them or not - at the defaults that is
+about 160 frames a second per controller, most of it analog / alternate encoder / duty cycle data nobody uses.
+Each controller gets a profile for its role instead, applied with the rest of its configuration at boot:
+    0: applied output, faults (followers listen to their leader's)   1: velocity, temperature, voltage, current
+    2: position   3: analog sensor   4: alternate encoder   5: duty cycle absolute position   6: duty cycle velocity
+Periods are in ms.  Slow frames are not turned off, just slowed to k_idle_period, so nothing ever reads as stale-forever.
+
+The monitor publishes what the bus is actually doing next to what the profiles say it should be doing:
+    _can_status:  [utilization %, tx full count, bus off count, receive errors, transmit errors]
+    _can_budget:  [status frames per second we expect, utilization % that should cost]
+"""
+
+import rev
+import wpilib
+
+import constants
+
+from misc.telemetry import telemetry, Rate
+
+k_idle_period = 500  # ms for frames we don't read
+k_bits_per_frame = 130  # 8 data bytes plus CAN overhead and stuffing, roughly
+k_bus_bits_per_second = 1e6
+
+FRAMES = [rev.CANSparkMax.PeriodicFrame.kStatus0, rev.CANSparkMax.PeriodicFrame.kStatus1, rev.CANSparkMax.PeriodicFrame.kStatus2,
+          rev.CANSparkMax.PeriodicFrame.kStatus3, rev.CANSparkMax.PeriodicFrame.kStatus4, rev.CANSparkMax.PeriodicFrame.kStatus5,
+          rev.CANSparkMax.PeriodicFrame.kStatus6]
+
+# role -> period in ms for status frames 0-6
+PROFILES = {
+    # velocity for the snapshot every loop, position as often as the odometry thread samples it
+    'swerve_drive': [10, 20, constants.k_odometry_period_ms, k_idle_period, k_idle_period, k_idle_period, k_idle_period],
+    # the rio PID reads the analog encoder on the rio, so the sparkmax's own encoder is only for resync and the dash
+    'swerve_turn': [20, 100, 50, k_idle_period, k_idle_period, k_idle_period, k_idle_period],
+    # position and velocity for the commands every loop, the wrist's absolute encoder at the default rate
+    'mechanism': [20, 20, 20, k_idle_period, k_idle_period, 200, k_idle_period],
+    # nobody reads a follower - its leader's status 0 is what it follows
+    'follower': [100, k_idle_period, k_idle_period, k_idle_period, k_idle_period, k_idle_period, k_idle_period],
+}
+
+
+class StatusBudget:
+    # controllers per role that have had a profile applied, so the monitor knows what to expect
+    counts = {role: 0 for role in PROFILES}
+
+
+def frames_per_second(role) -> float:
+    return sum(1000 / period for period in PROFILES[role])
+
+
+def expected_frames() -> float:
+    return sum(count * frames_per_second(role) for role, count in StatusBudget.counts.items())
+
+
+def apply_status_frames(sparkmax: rev.CANSparkMax, role, can_id=0) -> list:
+    """Set the status frame periods for role - returns the responses, and complains about any errors"""
+    responses = [sparkmax.setPeriodicFramePeriod(frame, period) for frame, period in zip(FRAMES, PROFILES[role])]
+    StatusBudget.counts[role] += 1
+    errors = [idx for idx, response in enumerate(responses) if response != rev.REVLibError.kOk]
+    if errors:
+        print(f' *SparkMax {can_id} status frames {errors} for {role}: {[responses[idx] for idx in errors]}', flush=True)
+    return responses
+
+
+def report_budget() -> None:
+    """One line per role at boot - the config manager calls this when it is done"""
+    for role, count in StatusBudget.counts.items():
+        if count > 0:
+            print(f' *CAN {role}: {count} x {frames_per_second(role):.0f} frames/s', flush=True)
+    frames = expected_frames()
+    print(f' *CAN status frames expected: {frames:.0f}/s, {100 * frames * k_bits_per_frame / k_bus_bits_per_second:.1f}% of the bus', flush=True)
+
+
+def can_status() -> list:
+    status = wpilib.RobotController.getCANStatus()
+    return [100 * status.percentBusUtilization, status.txFullCount, status.busOffCount, status.receiveErrorCount, status.transmitErrorCount]
+
+
+def can_budget() -> list:
+    frames = expected_frames()
+    return [frames, 100 * frames * k_bits_per_frame / k_bus_bits_per_second]
+
+
+telemetry.register('_can_status', can_status, Rate.SLOW, kind='double_array')
+telemetry.register('_can_budget', can_budget, Rate.SLOW, kind='double_array')
@@ -1,37 +1,161 @@
+"""
+SparkMax configuration that only writes what is actually different
+Every parameter write is a CAN round trip, and we used to restore factory defaults and blindly re-send everything
+to all 13 controllers one after the other.  Now each parameter gets read back first and only written if it is off,
+so after the first boot (or a brownout mid-match) most controllers just read.  The slow part runs after the
+container is built: subsystems hand their configuration to config_manager, robot.py calls config_manager.run()
+in robotInit, and independent controllers get configured concurrently - the rev calls release the GIL while they
+wait on the bus.  run() prints how long it took and what it had to change.
+
+    config_manager.add('turret', lambda: configure_sparkmax(...))
+    config_manager.on_complete(self.reset_after_configure)  # anything that needs the settings in place first
+"""
+
 import time
+from concurrent.futures import ThreadPoolExecutor
 import rev
 
+import constants
+
+# name -> (getter, setter) for the motor-level parameters we check - they take the sparkmax and its encoder
+SETTINGS = {
+    'inverted': (lambda sm, enc: sm.getInverted(), lambda sm, enc, value: sm.setInverted(value)),
+    'idle_mode': (lambda sm, enc: sm.getIdleMode(), lambda sm, enc, value: sm.setIdleMode(value)),
+    'voltage_compensation': (lambda sm, enc: sm.getVoltageCompensationNominalVoltage(),
+                             lambda sm, enc, value: sm.enableVoltageCompensation(value)),
+    'position_factor': (lambda sm, enc: enc.getPositionConversionFactor(),
+                        lambda sm, enc, value: enc.setPositionConversionFactor(value)),
+    'velocity_factor': (lambda sm, enc: enc.getVelocityConversionFactor(),
+                        lambda sm, enc, value: enc.setVelocityConversionFactor(value)),
+    'current_limit': (None, lambda sm, enc, value: sm.setSmartCurrentLimit(value)),  # no getter - always sent
+}
+
+# keys of the pid dicts in constants - see configure_sparkmax
+PID_SETTINGS = {
+    'kP': (lambda pid, slot: pid.getP(slot), lambda pid, slot, value: pid.setP(value, slot)),
+    'kI': (lambda pid, slot: pid.getI(slot), lambda pid, slot, value: pid.setI(value, slot)),
+    'kD': (lambda pid, slot: pid.getD(slot), lambda pid, slot, value: pid.setD(value, slot)),
+    'kFF': (lambda pid, slot: pid.getFF(slot), lambda pid, slot, value: pid.setFF(value, slot)),
+    'kIz': (lambda pid, slot: pid.getIZone(slot), lambda pid, slot, value: pid.setIZone(value, slot)),
+    'kMinOutput': (lambda pid, slot: pid.getOutputMin(slot), lambda pid, slot, value: pid.setOutputRange(value, pid.getOutputMax(slot), slot)),
+    'kMaxOutput': (lambda pid, slot: pid.getOutputMax(slot), lambda pid, slot, value: pid.setOutputRange(pid.getOutputMin(slot), value, slot)),
+    'SM_MaxVel': (lambda pid, slot: pid.getSmartMotionMaxVelocity(slot), lambda pid, slot, value: pid.setSmartMotionMaxVelocity(value, slot)),
+    'SM_MaxAccel': (lambda pid, slot: pid.getSmartMotionMaxAccel(slot), lambda pid, slot, value: pid.setSmartMotionMaxAccel(value, slot)),
+}
+
+
+def matches(current, desired) -> bool:
+    # the sparkmax stores floats as float32, so allow for the rounding
+    if isinstance(desired, float) or isinstance(current, float):
+        return abs(current - desired) <= 1e-9 + 1e-5 * abs(desired)
+    return current == desired
+
+
+def verify_and_set(name, getter, setter, desired, results) -> bool:
+    """Write desired only if getter disagrees.  Records 'ok' or the write's response in results, returns True if we wrote."""
+    if getter is None:  # nothing to read back, so send it - but it doesn't count as a change worth burning flash for
+        response = setter(desired)
+        results[name] = 'sent' if response == rev.REVLibError.kOk else response
+        return False
+    if matches(getter(), desired):
+        results[name] = 'ok'
+        return False
+    results[name] = setter(desired)
+    return True
+
+
+def configure_settings(sparkmax: rev.CANSparkMax, settings: dict, can_id=0, encoder=None) -> dict:
+    """Motor-level settings by SETTINGS name, e.g. {'inverted': True, 'current_limit': 20, 'position_factor': 0.78}"""
+    encoder = sparkmax.getEncoder() if encoder is None else encoder
+    results = {}
+    for name, desired in settings.items():
+        getter, setter = SETTINGS[name]
+        verify_and_set(f'{name}_ID{can_id}', None if getter is None else lambda: getter(sparkmax, encoder),
+                       lambda value: setter(sparkmax, encoder, value), desired, results)
+    report(can_id, 'settings', results)
+    return results
+
+
 def configure_sparkmax(sparkmax: rev.CANSparkMax, pid_controller : rev.SparkMaxPIDController, pid_dict : dict,
                        can_id=0, slot=0, pid_only=False, burn_flash=False):
     """Set the PIDs, etc for the controllers, slot 0 is often position and slot 1 is often velocity
     Expects a sparkmax and a pid controller, as well as a dictionary with values - looks like this:
     pid_dict = {'kP': 0.002, 'kI': 0.004, 'kD': 0, 'kIz': 0.002, 'kFF': 0.0075, 'kArbFF': 0,
                            'kMaxOutput': 0.99, 'kMinOutput': -0.99, 'SM_MaxVel':5000, 'SM_MaxAccel':5000}
+    Each value is read back first and only written if it differs - the flash only gets burned if something changed.
     """
     error_dict = {}
-    error_dict.update({f'kP_ID{can_id}_S{slot}': pid_controller.setP(pid_dict['kP'], slot)})
-    error_dict.update({f'kI_ID{can_id}_S{slot}': pid_controller.setI(pid_dict['kI'], slot)})
-    error_dict.update({f'kD_ID{can_id}_S{slot}': pid_controller.setD(pid_dict['kD'], slot)})
-    error_dict.update({f'kFF_ID{can_id}_S{slot}': pid_controller.setFF(pid_dict['kFF'], slot)})
-    error_dict.update({f'kIZ_ID{can_id}_S{slot}': pid_controller.setIZone(pid_dict['kIz'], slot)})
-    error_dict.update({f'MinMax_ID{can_id}_S{slot}': pid_controller.setOutputRange(pid_dict['kMinOutput'], pid_dict['kMaxOutput'], slot)})
-    error_dict.update({f'Accel_ID{can_id}_S{slot}': pid_controller.setSmartMotionMaxVelocity(pid_dict['SM_MaxVel'], slot)})
-    error_dict.update({f'Vel_ID{can_id}_S{slot}': pid_controller.setSmartMotionMaxAccel(pid_dict['SM_MaxAccel'], slot)})
+    changed = False
+    for key, (getter, setter) in PID_SETTINGS.items():
+        if key not in pid_dict:  # leave anything the dict doesn't mention alone
+            continue
+        changed |= verify_and_set(f'{key}_ID{can_id}_S{slot}', lambda: getter(pid_controller, slot),
+                                  lambda value: setter(pid_controller, slot, value), pid_dict[key], error_dict)
 
     if not pid_only:
-        error_dict.update({'VoltComp_' + str(can_id): sparkmax.enableVoltageCompensation(12)})
+        changed |= verify_and_set(f'VoltComp_{can_id}', sparkmax.getVoltageCompensationNominalVoltage,
+                                  sparkmax.enableVoltageCompensation, 12, error_dict)
 
-    if len(set(error_dict)) > 1:
-        print('', f'*Sparkmax ID {can_id} setting*     *Response*')
-        for key in sorted(error_dict.keys()):
-            print(f'     {key:19} \t {error_dict[key]}', flush=True)
-    else:
-        print(f'\n *All SparkMax on id {can_id} report {list(set(error_dict))[0]}')
+    report(can_id, f'slot {slot}', error_dict)
 
-    if burn_flash:
+    if burn_flash and changed:
         start_time = time.time()
         can_error = sparkmax.burnFlash()
         time.sleep(0.05)
         print(f'Burn flash on controller {can_id}: {can_error} {int(1000 * (time.time() - start_time)):2d}ms after starting')
 
     return error_dict
+
+
+def written(results) -> list:
+    """Names of the parameters that had to be written - the rest came back 'ok' (or were 'sent' with no way to check)"""
+    return [key for key, response in results.items() if not isinstance(response, str)]
+
+
+def report(can_id, label, results) -> None:
+    # one line per controller unless something came back with an error
+    changed = written(results)
+    errors = [f'{key}: {results[key]}' for key in changed if results[key] != rev.REVLibError.kOk]
+    print(f' *SparkMax {can_id} {label}: {len(results) - len(changed)} ok, {len(changed)} written', flush=True)
+    for error in errors:
+        print(f'     {error}', flush=True)
+
+
+class ConfigurationManager:
+    """Collects every subsystem's controller configuration and runs it all at once at the end of robotInit"""
+
+    def __init__(self, workers=constants.k_config_workers) -> None:
+        self.workers = workers
+        self.tasks = []  # (name, function)
+        self.callbacks = []  # run in order once every task is done
+        self.times = {}  # name -> seconds that task took
+        self.total_time = 0
+
+    def add(self, name, task) -> None:
+        """Tasks for different controllers run at the same time - keep everything for one controller in one task"""
+        self.tasks.append((name, task))
+
+    def on_complete(self, callback) -> None:
+        self.callbacks.append(callback)
+
+    def timed(self, name, task) -> None:
+        start = time.perf_counter()
+        task()
+        self.times[name] = time.perf_counter() - start
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.timed, name, task) for name, task in self.tasks]
+            for future in futures:
+                future.result()  # re-raises anything that went wrong in a task
+        for callback in self.callbacks:
+            callback()
+        self.total_time = time.perf_counter() - start
+        slowest = max(self.times, key=self.times.get) if self.times else 'nothing'
+        print(f'\n *Configured {len(self.tasks)} controller groups in {1000 * self.total_time:.0f}ms '
+              f'(slowest: {slowest} {1000 * self.times.get(slowest, 0):.0f}ms)', flush=True)
+        self.tasks, self.callbacks = [], []
+
+
+config_manager = ConfigurationManager()
@@ -0,0 +1,185 @@
+"""
+Configuration space table - which (turret, elevator, arm, wrist) combinations are safe, precomputed as a bitmap
+The safety rules used to be if statements at the start of a few commands (e.g. TurretMove wouldn't step the turret
+with the elevator low), so they only got checked when a command started and only by the commands that knew about
+them.  Here the rules are the forbidden boxes of the interlocks in misc/superstructure.py, and the 4D space is
+cut into cells at every limit of every box, one bit per cell:
+    python -m misc.cspace deploy/cspace.bin   (from the robot directory)
+
+Because the cell edges are the box limits, every cell is either all inside a box or all outside, so the table is
+exact - e.g. the elevator at 285 is above the 280 turret limit, not in a cell that straddles it.  A configuration
+exactly on an edge is in neither cell and counts as safe if either side is (the boxes are open).
+Looking up a configuration is a bisect on each axis's few edges and one bit test, so a command can check a target -
+or a whole straight line path with path_is_safe - every loop if it wants to.
+
+The generated file is committed in deploy/ - regenerate it whenever the interlocks change, and check it before a
+deploy (exits 1 if it's missing or stale):
+    python -m misc.cspace --check deploy/cspace.bin
+It has a checksum of the rules, and if it's missing or doesn't match the ones in the code anyway the robot reports
+it to the driver station and the dashboard and builds the table from the code instead (it's tiny) - a lookup table
+should never be what keeps the robot from booting.
+
+File layout (little endian):
+    header:  magic (4s), version (H), axis count (H), checksum (I)
+    axes:    per axis - name (8s), edge count (I), then the edges (d each)
+    bitmap:  one bit per cell, turret slowest and wrist fastest, 1 = blocked
+"""
+
+import bisect
+import itertools
+import math
+import os
+import struct
+import sys
+import zlib
+
+from wpilib import DriverStation, SmartDashboard
+
+from misc.superstructure import AXES, INTERLOCKS
+
+MAGIC = b'C429'
+VERSION = 2
+HEADER = struct.Struct('<4sHHI')  # magic, version, axis count, checksum
+AXIS = struct.Struct('<8sI')  # name, edge count
+EDGE = struct.Struct('<d')
+
+# name, {axis: (low, high)} - a configuration strictly inside every range of a box is forbidden.  These come from
+# the interlocks in misc/superstructure.py, one box per combination of their ranges, so the rules live in one place
+FORBIDDEN = [(lock.name, dict(zip(lock.box, ranges))) for lock in INTERLOCKS for ranges in itertools.product(*lock.box.values())]
+
+
+def axis_edges(axis, forbidden=FORBIDDEN) -> list:
+    """Every finite box limit on an axis, sorted - cell i is between edges i-1 and i"""
+    return sorted({limit for _, box in forbidden if axis in box for limit in box[axis] if math.isfinite(limit)})
+
+
+def cell_middle(edges, cell) -> float:
+    # any point strictly inside the cell will do, since the whole cell is in or out of each box
+    if not edges:
+        return 0.0
+    if cell == 0:
+        return edges[0] - 1
+    if cell == len(edges):
+        return edges[-1] + 1
+    return (edges[cell - 1] + edges[cell]) / 2
+
+
+def checksum(forbidden=FORBIDDEN) -> int:
+    # anything that changes the table changes this, so a stale file gets noticed at boot
+    return zlib.crc32(repr((AXES, forbidden)).encode('utf-8'))
+
+
+def build_table(forbidden=FORBIDDEN) -> tuple:
+    """(edges per axis, bitmap) - test the middle of every cell against the boxes"""
+    edges = [axis_edges(axis, forbidden) for axis in AXES]
+    cells = [range(len(axis_edges) + 1) for axis_edges in edges]
+    bitmap = bytearray((math.prod(len(axis_cells) for axis_cells in cells) + 7) // 8)
+    for idx, cell in enumerate(itertools.product(*cells)):  # turret slowest, wrist fastest
+        point = dict(zip(AXES, [cell_middle(axis_edges, axis_cell) for axis_edges, axis_cell in zip(edges, cell)]))
+        if any(all(low < point[axis] < high for axis, (low, high) in box.items()) for _, box in forbidden):
+            bitmap[idx >> 3] |= 1 << (idx & 7)
+    return edges, bitmap
+
+
+def write_cspace(path, forbidden=FORBIDDEN) -> None:
+    edges, bitmap = build_table(forbidden)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(AXES), checksum(forbidden)))
+        for axis, axis_edges in zip(AXES, edges):
+            f.write(AXIS.pack(axis.encode('utf-8'), len(axis_edges)))
+            f.write(b''.join(EDGE.pack(edge) for edge in axis_edges))
+        f.write(bitmap)
+
+
+def read_cspace(path, expected_checksum):
+    """(edges per axis, bitmap) from the file, or None if it isn't there or doesn't match the current rules"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, axis_count, stored_checksum = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or stored_checksum != expected_checksum:
+        return None
+    edges, offset = [], HEADER.size
+    for _ in range(axis_count):
+        _, count = AXIS.unpack_from(data, offset)
+        offset += AXIS.size
+        edges.append([EDGE.unpack_from(data, offset + idx * EDGE.size)[0] for idx in range(count)])
+        offset += count * EDGE.size
+    return edges, data[offset:]
+
+
+def current_configuration(container) -> tuple:
+    """(turret, elevator, arm, wrist) right now"""
+    return (container.turret.get_angle(), container.elevator.get_height(),
+            container.arm.get_extension(), container.wrist.get_angle())
+
+
+class ConfigurationSpace:
+    """Load the table from the deploy directory - or build it from the interlocks if the file is missing or stale"""
+
+    def __init__(self, path) -> None:
+        self.path = path
+        loaded = read_cspace(path, checksum())
+        self.stale = loaded is None
+        if self.stale:
+            message = (f'{path} is missing or does not match the interlocks in misc/superstructure.py - using a table '
+                       f'built from the code.  Regenerate it with python -m misc.cspace deploy/cspace.bin and commit it')
+            DriverStation.reportError(message, False)
+            SmartDashboard.putString('alert', message)
+            loaded = build_table()
+        self.edges, self.bitmap = loaded
+        counts = [len(axis_edges) + 1 for axis_edges in self.edges]
+        self.strides = [counts[1] * counts[2] * counts[3], counts[2] * counts[3], counts[3], 1]
+
+    def blocked(self, idx) -> bool:
+        return bool((self.bitmap[idx >> 3] >> (idx & 7)) & 1)
+
+    def is_safe(self, configuration) -> bool:
+        """configuration is (turret, elevator, arm, wrist)"""
+        candidates = []
+        for value, axis_edges, stride in zip(configuration, self.edges, self.strides):
+            cell = bisect.bisect_left(axis_edges, value)
+            on_edge = cell < len(axis_edges) and axis_edges[cell] == value
+            candidates.append([cell * stride, (cell + 1) * stride] if on_edge else [cell * stride])
+        return any(not self.blocked(sum(offsets)) for offsets in itertools.product(*candidates))
+
+    def path_is_safe(self, start, end) -> bool:
+        """The straight line from start to end - every point where it crosses an edge, and every stretch in between"""
+        return self.path_blocker(start, end) is None
+
+    def path_blocker(self, start, end):
+        """Name of the interlock the straight line from start to end runs into first, or None if it's safe"""
+        fractions = {0.0, 1.0}
+        for a, b, axis_edges in zip(start, end, self.edges):
+            fractions.update((edge - a) / (b - a) for edge in axis_edges if min(a, b) < edge < max(a, b))
+        fractions = sorted(fractions)
+        samples = sorted(fractions + [(f0 + f1) / 2 for f0, f1 in zip(fractions, fractions[1:])])
+        for fraction in samples:
+            configuration = [a + fraction * (b - a) for a, b in zip(start, end)]
+            if not self.is_safe(configuration):
+                return blocker(configuration)
+        return None
+
+
+def blocker(configuration, forbidden=FORBIDDEN) -> str:
+    """Which forbidden box a configuration is in - the table only says that it is in one"""
+    point = dict(zip(AXES, configuration))
+    for name, box in forbidden:
+        if all(low < point[axis] < high for axis, (low, high) in box.items()):
+            return name
+    return 'the table'  # only on an edge between two boxes that touch
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == '--check':
+        if read_cspace(sys.argv[2], checksum()) is None:
+            print(f'{sys.argv[2]} is missing or stale - regenerate it with python -m misc.cspace {sys.argv[2]}')
+            sys.exit(1)
+        print(f'{sys.argv[2]} matches the interlocks')
+        sys.exit(0)
+    if len(sys.argv) != 2:
+        print(f'usage: python -m misc.cspace [--check] deploy/cspace.bin')
+        sys.exit(1)
+    write_cspace(sys.argv[1])
+    edges, bitmap = build_table()
+    print(f'Wrote {" x ".join(str(len(axis_edges) + 1) for axis_edges in edges)} cells ({len(bitmap)} bytes) to {sys.argv[1]}')
@@ -0,0 +1,56 @@
+"""
+Drivetrain state log - recorded next to the input log by RecordAuto so playback can follow the path closed-loop
+Same header / streaming writer / footer as misc/input_log.py, different magic and record:
+    timestamp as float64 - same clock as the input log
+    pose x, y (m) and heading (degrees) from Swerve.get_pose(), gyro yaw (degrees)
+    4 modules (lf, rf, lb, rb) of drive distance (m) and turning angle (radians) from Swerve.get_module_positions()
+all float32 after the timestamp, so a frame is 56 bytes.
+"""
+
+import array
+import struct
+
+from misc.input_log import InputLogWriter, map_records
+
+MAGIC = b'D429'
+VERSION = 1
+RECORDS = {1: struct.Struct('<d12f')}
+RECORD = RECORDS[VERSION]
+
+MODULES = ['lf', 'rf', 'lb', 'rb']
+MODULE_COLUMNS = [f'{module}_{field}' for module in MODULES for field in ['distance', 'angle']]
+COLUMNS = ['timestamp', 'x', 'y', 'heading', 'yaw'] + MODULE_COLUMNS
+TYPECODES = ['d'] + ['f'] * (len(COLUMNS) - 1)
+
+
+def drive_log_writer(path, after=None) -> InputLogWriter:
+    return InputLogWriter(path, record=RECORD, magic=MAGIC, version=VERSION, after=after)
+
+
+def pack_drive_state(timestamp, frame, drive) -> list:
+    """Fill a preallocated RECORD-ordered list from the swerve - pose, yaw and this loop's module positions"""
+    pose = drive.get_pose()
+    frame[0], frame[1], frame[2], frame[3], frame[4] = timestamp, pose.X(), pose.Y(), pose.rotation().degrees(), drive.snapshot.yaw
+    for idx, position in enumerate(drive.snapshot.positions):
+        frame[5 + 2 * idx] = position.distance
+        frame[6 + 2 * idx] = position.angle.radians()
+    return frame
+
+
+class DriveLog:
+    """Memory-mapped drive state log - same access pattern as InputLog"""
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.version, self.frame_count, self.complete, columns = map_records(path, MAGIC, RECORDS)
+        self.columns = {name: array.array(code, column) for name, code, column in zip(COLUMNS, TYPECODES, columns)}
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, column) -> array.array:
+        return self.columns[column]
+
+    @property
+    def timestamps(self) -> array.array:
+        return self.columns['timestamp']
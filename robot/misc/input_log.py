@@ -0,0 +1,250 @@
+"""
+Binary input log for RecordAuto / PlaybackAuto
+Replaces the json dump of nested dicts - that was several hundred KB to parse on the rio at the start of auto.
+
+File layout (little endian):
+    header:  magic (4s), version (H), record size (H), frame count (I)  - count is 0 if the log was streamed
+    records: one fixed-size record per 20ms frame
+        timestamp as float64 - FPGA seconds since the recording started (version 2 - version 1 logs have none)
+        12 axes as float32 (driver axis0-5, then co-driver axis0-5)
+        button bitfields as uint16 (driver, co-driver)  - bit n-1 is raw button n
+        POV as int16 (driver, co-driver)  - -1 when nothing is pressed
+    footer:  magic (4s), frame count (I)  - only there if the recording was closed cleanly
+
+InputLogWriter streams records to disk from a background thread as the robot runs, so a brownout only
+costs us the last chunk - a log without a footer still plays back up to the last complete record.
+The writer and map_records() take the magic / record layout as arguments, so misc/drive_log.py reuses them.
+
+Playback memory-maps the file and pulls each field out as a typed array (one per column), so looking
+up a frame is just an index.  Version 1 logs still load - they get a made-up timestamp every 20ms.
+See misc/playback_clock.py for how playback walks the timestamps.  Convert old json logs with:
+    python misc/input_log.py input_log.json input_log.bin
+"""
+
+import array
+import itertools
+import json
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+
+MAGIC = b'2429'
+VERSION = 2
+HEADER = struct.Struct('<4sHHI')  # magic, version, record size, frame count
+RECORDS = {1: struct.Struct('<12f2H2h'), 2: struct.Struct('<d12f2H2h')}
+RECORD = RECORDS[VERSION]
+FOOTER = struct.Struct('<4sI')  # magic, frame count
+CHUNK_FRAMES = 50  # the writer thread gets one second of frames at a time
+QUEUE_CHUNKS = 4  # chunks allowed to wait on the disk before we start dropping frames
+FRAME_PERIOD = 0.02  # nominal seconds per frame - only used to make up timestamps for version 1 logs
+
+CONTROLLERS = ['driver', 'co_driver']
+AXIS_COUNT = 6
+AXIS_COLUMNS = [f'{controller}_axis{axis}' for controller in CONTROLLERS for axis in range(AXIS_COUNT)]
+COLUMNS = ['timestamp'] + AXIS_COLUMNS + ['driver_buttons', 'co_driver_buttons', 'driver_pov', 'co_driver_pov']
+TYPECODES = ['d'] + ['f'] * len(AXIS_COLUMNS) + ['H', 'H', 'h', 'h']  # has to match RECORD
+
+# raw button ids on the xbox controllers - same numbers we use for the JoystickButtons in the container
+BUTTONS = {'A': 1, 'B': 2, 'X': 3, 'Y': 4, 'LB': 5, 'RB': 6, 'Back': 7, 'Start': 8, 'LS': 9, 'RS': 10}
+BUTTON_MASKS = {name: 1 << (button_id - 1) for name, button_id in BUTTONS.items()}
+
+
+def pack_frame(timestamp, driver, co_driver) -> tuple:
+    """Flatten the timestamp and (axes, buttons, pov) for both controllers into a RECORD-ordered tuple"""
+    return (timestamp, *driver[0], *co_driver[0], driver[1], co_driver[1], driver[2], co_driver[2])
+
+
+def write_input_log(path, frames) -> None:
+    """Write a list of RECORD-ordered tuples (see pack_frame) to path"""
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(frames)))
+        f.write(b''.join(RECORD.pack(*frame) for frame in frames))
+        f.write(FOOTER.pack(MAGIC, len(frames)))
+
+
+class InputLogWriter:
+    """
+    Streams frames to disk without blocking the scheduler loop
+    write_frame() packs into a preallocated chunk buffer, and full chunks go through a bounded queue to a
+    writer thread that appends them to the file and fsyncs.  close() hands off the last partial chunk and the
+    thread finishes up with the footer.  If the disk ever falls behind by more than QUEUE_CHUNKS we drop
+    the chunk instead of stalling the loop, and count it in dropped_frames.
+    If after is a writer that is still finishing the same path (e.g. we start recording again right away), we
+    stream to a .part file instead and our thread renames it over path once that writer is done.
+    """
+    part_numbers = itertools.count()  # so back to back writers for the same path don't share a .part file
+
+    def __init__(self, path, chunk_frames=CHUNK_FRAMES, queue_chunks=QUEUE_CHUNKS, record=RECORD, magic=MAGIC, version=VERSION,
+                 after=None) -> None:
+        self.path = path
+        self.after = after if after is not None and after.is_alive() else None
+        self.file_path = path if self.after is None else f'{path}.part{next(self.part_numbers)}'
+        self.record = record
+        self.magic = magic
+        self.chunk_frames = chunk_frames
+        self.frame_count = 0  # frames handed to us
+        self.frames_written = 0  # frames the thread actually got onto the disk
+        self.dropped_frames = 0
+
+        # one spare buffer per queue slot, plus the one we are filling - so the queue can never be full when we get a spare
+        self.free_chunks = queue.SimpleQueue()
+        for _ in range(queue_chunks):
+            self.free_chunks.put(bytearray(chunk_frames * record.size))
+        self.full_chunks = queue.Queue(maxsize=queue_chunks)
+        self.chunk = bytearray(chunk_frames * record.size)
+        self.chunk_offset = 0
+        self.stopping = threading.Event()  # set by close() - the thread finishes what's queued and writes the footer
+
+        self.file = open(self.file_path, 'wb')
+        self.file.write(HEADER.pack(magic, version, record.size, 0))
+        self.thread = threading.Thread(target=self._run, name=f'LogWriter {os.path.basename(path)}', daemon=True)
+        self.thread.start()
+
+    def write_frame(self, *values) -> None:
+        """Values in record order - see pack_frame"""
+        self.record.pack_into(self.chunk, self.chunk_offset, *values)
+        self.chunk_offset += self.record.size
+        self.frame_count += 1
+        if self.chunk_offset == len(self.chunk):
+            self._submit()
+
+    def _submit(self) -> None:
+        try:
+            next_chunk = self.free_chunks.get_nowait()
+        except queue.Empty:  # the thread still has all the buffers - reuse ours and lose this chunk
+            self.dropped_frames += self.chunk_offset // self.record.size
+            self.chunk_offset = 0
+            return
+        self.full_chunks.put_nowait((self.chunk, self.chunk_offset))  # can't be full if we got a free buffer
+        self.chunk, self.chunk_offset = next_chunk, 0
+
+    def close(self, wait=False) -> None:
+        """Flush the partial chunk and let the thread write the footer - only blocks if wait is True"""
+        if self.chunk_offset > 0:
+            self._submit()
+        self.stopping.set()
+        try:
+            self.full_chunks.put_nowait(None)  # wakes the thread right away if there is room
+        except queue.Full:  # the disk is behind - the thread sees stopping once it has drained the queue
+            pass
+        if wait:
+            self.thread.join()
+
+    def is_alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self.full_chunks.get(timeout=0.1)
+            except queue.Empty:
+                if self.stopping.is_set():  # close() was called and everything it queued is written
+                    break
+                continue
+            if item is None:
+                break
+            chunk, length = item
+            with memoryview(chunk) as view:
+                self.file.write(view[:length])
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.frames_written += length // self.record.size
+            self.free_chunks.put(chunk)
+
+        self.file.write(FOOTER.pack(self.magic, self.frames_written))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if self.after is not None:  # the last writer for this path has to be done before we take its place
+            self.after.thread.join()
+            self.after = None
+            os.replace(self.file_path, self.path)
+
+
+def map_records(path, magic, records) -> tuple:
+    """
+    Memory-map a log and unpack it column by column
+    records maps version -> struct.Struct.  Returns (version, frame count, complete, list of columns)
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        file_magic, version, record_size, frame_count = HEADER.unpack_from(mm, 0)
+        record = records.get(version)
+        if file_magic != magic or record is None or record_size != record.size:
+            raise ValueError(f'{path} is not a {magic} log we can read (magic {file_magic}, version {version}, record size {record_size})')
+        # don't trust the header past the end of the file - a streamed log has 0 there and maybe no footer
+        available = (len(mm) - HEADER.size) // record.size
+        footer_magic, footer_count = FOOTER.unpack_from(mm, len(mm) - FOOTER.size) if available > 0 else (b'', 0)
+        complete = footer_magic == magic
+        if complete:
+            frame_count = footer_count
+        frame_count = min(frame_count, available) if frame_count > 0 else available
+        with memoryview(mm) as view, view[HEADER.size:HEADER.size + frame_count * record.size] as data:
+            columns = list(zip(*record.iter_unpack(data))) or [()] * len(record.unpack(bytes(record.size)))
+    return version, frame_count, complete, columns
+
+
+class InputLog:
+    """Memory-mapped input log - each column is an array.array indexed by frame number"""
+
+    def __init__(self, path) -> None:
+        self.path = path
+        version, frame_count, self.complete, columns = map_records(path, MAGIC, RECORDS)
+
+        if version == 1:  # no timestamps - assume the loop never slipped
+            columns.insert(0, [frame * FRAME_PERIOD for frame in range(frame_count)])
+
+        self.version = version
+        self.frame_count = frame_count
+        self.columns = {name: array.array(code, column) for name, code, column in zip(COLUMNS, TYPECODES, columns)}
+
+    def __len__(self) -> int:
+        return self.frame_count
+
+    def __getitem__(self, column) -> array.array:
+        return self.columns[column]
+
+    @property
+    def timestamps(self) -> array.array:
+        return self.columns['timestamp']
+
+    def axis(self, controller, axis) -> array.array:
+        return self.columns[f'{controller}_axis{axis}']
+
+    def pressed(self, controller, button, frame) -> bool:
+        return bool(self.columns[f'{controller}_buttons'][frame] & BUTTON_MASKS[button])
+
+    def pov(self, controller, frame) -> int:
+        return self.columns[f'{controller}_pov'][frame]
+
+
+def convert_json_log(json_path, bin_path) -> int:
+    """Convert an old RecordAuto json log to the binary format.  Returns the number of frames converted."""
+    with open(json_path, 'r') as input_json:
+        json_log = json.load(input_json)
+
+    frames = []
+    for idx, frame in enumerate(json_log):
+        unpacked = [idx * FRAME_PERIOD]  # the json logs were one frame per loop with no timestamps
+        for controller in CONTROLLERS:
+            inputs = frame[f'{controller}_controller']
+            axes = [inputs['axis'].get(f'axis{axis}', 0) for axis in range(AXIS_COUNT)]
+            buttons = 0
+            for name, mask in BUTTON_MASKS.items():
+                if inputs['button'].get(name, False):
+                    buttons |= mask
+            unpacked.append((axes, buttons, inputs['button'].get('POV', -1)))
+        frames.append(pack_frame(*unpacked))
+
+    write_input_log(bin_path, frames)
+    return len(frames)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(f'usage: python {sys.argv[0]} input_log.json input_log.bin')
+        sys.exit(1)
+    count = convert_json_log(sys.argv[1], sys.argv[2])
+    print(f'Converted {count} frames from {sys.argv[1]} to {sys.argv[2]}')
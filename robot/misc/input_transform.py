@@ -0,0 +1,93 @@
+"""
+Stick shaping for the swerve - shared by DriveByJoystickSwerve, PlaybackSwerve and PlaybackAuto
+These used to be copy-pasted into all three commands and had drifted apart (playback applied slow mode before
+the cubic and only on the frame the button went down), so playback did not drive like teleop did.
+
+drive_sticks() does one loop's worth for teleop.  pretransform_log() runs the same math over a whole recorded
+input log once at playback init and stores the results as extra columns, so playback just looks them up.
+Teleop debounces the slow mode bumper with a wpimath Debouncer - debounce() does the same thing on the log's
+timestamps, so a quick tap of LB is ignored in playback just like it was while recording.
+"""
+
+import array
+import math
+
+import constants
+from misc.input_log import BUTTON_MASKS
+from subsystems.swerve_constants import DriveConstants as dc
+
+# the cubic we put on the sticks:  a * x^3 + b * x
+k_cubic_a = 0.9
+k_cubic_b = 0.1
+k_slowmode_trigger_threshold = 0.5  # left trigger past this is the in-between slow mode
+k_slowmode_debounce = 0.1  # seconds LB has to stay pressed (or released) before slow mode follows it
+
+DRIVE_COLUMNS = ['drive_fwd', 'drive_strafe', 'drive_rot']  # added to an InputLog by pretransform_log
+
+
+def apply_deadband(value, db_low=dc.k_inner_deadband, db_high=dc.k_outer_deadband):
+    if abs(value) < db_low:
+        return 0
+    elif abs(value) > db_high:
+        return 1 * math.copysign(1, value)
+    else:
+        return value
+
+
+def input_transform(value, a=k_cubic_a, b=k_cubic_b):
+    db_value = apply_deadband(value)
+    return a * db_value**3 + b * db_value
+
+
+def slowmode_multiplier(slow_button, slow_trigger) -> float:
+    """Left bumper is slow mode, left trigger is a little less slow"""
+    if slow_button:
+        return constants.k_slowmode_multiplier
+    elif slow_trigger > k_slowmode_trigger_threshold:
+        return 1.5 * constants.k_slowmode_multiplier
+    return 1.0
+
+
+def debounce(values, timestamps, debounce_time=k_slowmode_debounce) -> list:
+    """What a Debouncer(debounce_time, kBoth) called once per frame returns, using the recorded timestamps"""
+    out = []
+    baseline, since = False, timestamps[0] if len(timestamps) else 0
+    for value, timestamp in zip(values, timestamps):
+        value = bool(value)
+        if value == baseline:
+            since = timestamp
+        if timestamp - since >= debounce_time:  # held long enough - follow it
+            baseline, since = value, timestamp
+        out.append(baseline)
+    return out
+
+
+def drive_sticks(thrust, strafe, twist, multiplier=1.0) -> tuple:
+    """Raw driver axes 1, 0, 4 to (fwd, strafe, rot) for Swerve.drive - signs are the ones teleop has always used"""
+    return (-input_transform(thrust) * multiplier, input_transform(strafe) * multiplier, -input_transform(twist) * multiplier)
+
+
+def pretransform_log(input_log) -> None:
+    """Shape every frame of a recorded log at once and add the results as DRIVE_COLUMNS - only does the work once per log"""
+    if DRIVE_COLUMNS[0] in input_log.columns:
+        return
+
+    # the DS sends axes as 8 bits, so a recording only has a couple hundred distinct values - cache the cubic
+    cache = {}
+
+    def shaped(values):
+        out = []
+        for value in values:
+            if value not in cache:
+                cache[value] = input_transform(value)
+            out.append(cache[value])
+        return out
+
+    slow_mask = BUTTON_MASKS['LB']
+    slow_buttons = debounce([buttons & slow_mask for buttons in input_log['driver_buttons']], input_log.timestamps)
+    multipliers = [slowmode_multiplier(slow_button, trigger)
+                   for slow_button, trigger in zip(slow_buttons, input_log.axis('driver', 2))]
+    thrust, strafe, twist = (shaped(input_log.axis('driver', axis)) for axis in (1, 0, 4))
+    input_log.columns['drive_fwd'] = array.array('f', [-value * m for value, m in zip(thrust, multipliers)])
+    input_log.columns['drive_strafe'] = array.array('f', [value * m for value, m in zip(strafe, multipliers)])
+    input_log.columns['drive_rot'] = array.array('f', [-value * m for value, m in zip(twist, multipliers)])
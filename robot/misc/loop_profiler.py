@@ -0,0 +1,86 @@
+"""
+Loop timing profiler - where does the 20ms go when we get "Loop time of 0.02s overrun"?
+Turn it on with constants.k_profile_loop.  robot.py wraps every subsystem's periodic(), the scheduler run itself,
+and (through the scheduler's onCommandInitialize) the execute() of every command that gets scheduled, timing each
+call with perf_counter_ns into a preallocated ring buffer per component.  Once a second it publishes
+[p50, p99, max] in ms for each one to SmartDashboard as _loop_<name>.
+
+The per-call cost is two perf_counter_ns calls and an array store - the sorting only happens at publish time.
+"""
+
+import array
+import time
+
+from wpilib import SmartDashboard
+
+k_samples = 128  # about 2.5 s of loops per component
+k_publish_period = 50  # loops between publishes - 1 Hz
+
+
+class RingBuffer:
+    __slots__ = ['samples', 'index', 'count']
+
+    def __init__(self, size) -> None:
+        self.samples = array.array('q', bytes(8 * size))  # int64 nanoseconds
+        self.index = 0
+        self.count = 0
+
+
+class LoopProfiler:
+
+    def __init__(self, samples=k_samples, publish_period=k_publish_period) -> None:
+        self.size = samples
+        self.publish_period = publish_period
+        self.buffers = {}  # component name -> RingBuffer
+        self.counter = 0
+
+    def record(self, name, elapsed_ns) -> None:
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            buffer = self.buffers[name] = RingBuffer(self.size)
+        buffer.samples[buffer.index] = elapsed_ns
+        buffer.index = (buffer.index + 1) % self.size
+        buffer.count += 1
+
+    def wrap(self, name, method):
+        """Return method with its run time recorded under name"""
+        perf_counter_ns, record = time.perf_counter_ns, self.record
+
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(name, perf_counter_ns() - start)
+        timed.profiled = True  # so we can tell it's already wrapped
+        return timed
+
+    def instrument_subsystem(self, subsystem, name=None) -> None:
+        # the scheduler looks periodic up on the instance, so shadowing it there is enough
+        name = subsystem.getName() if name is None else name
+        subsystem.periodic = self.wrap(f'{name}_periodic', subsystem.periodic)
+
+    def instrument_commands(self, scheduler) -> None:
+        scheduler.onCommandInitialize(self._instrument_command)
+
+    def _instrument_command(self, command) -> None:
+        # wrap each command object once - the same objects get rescheduled all match long.  the mark is on the
+        # wrapper itself, so it goes away with the command (an id could be reused by a new one)
+        if not getattr(command.execute, 'profiled', False):
+            command.execute = self.wrap(f'{command.getName()}_execute', command.execute)
+
+    def periodic(self) -> None:
+        """Call once per loop - publishes the stats every publish_period loops"""
+        self.counter += 1
+        if self.counter % self.publish_period != 0:
+            return
+        for name, buffer in self.buffers.items():
+            SmartDashboard.putNumberArray(f'_loop_{name}', self.stats(buffer))
+
+    def stats(self, buffer) -> list:
+        """[p50, p99, max] of the samples in the buffer, in ms"""
+        count = min(buffer.count, self.size)
+        if count == 0:
+            return [0, 0, 0]
+        samples = sorted(buffer.samples[:count])
+        return [samples[count // 2] / 1e6, samples[min(count - 1, int(0.99 * count))] / 1e6, samples[-1] / 1e6]
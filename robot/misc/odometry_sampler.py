@@ -0,0 +1,51 @@
+"""
+High-rate odometry sampling off the main loop
+A wpilib.Notifier reads the gyro angle and the four module positions (drive distance + absolute turn angle)
+at constants.k_odometry_rate - derived from the drive sparkmaxes' position frame period, since sampling faster than
+they report only repeats stale positions - and drops them, timestamped, into a lock-protected ring buffer.  Swerve.periodic
+drains whatever came in since last loop into the pose estimator with updateWithTime, so a slow loop just means
+a few more samples to catch up on instead of a coarser (and wronger) odometry step.
+"""
+
+import threading
+
+import wpilib
+
+import constants
+
+
+class OdometrySampler:
+
+    def __init__(self, drive, rate_hz=constants.k_odometry_rate, size=64) -> None:
+        self.drive = drive
+        self.period = 1 / rate_hz
+        self.size = size  # 64 samples is over a quarter second at 200Hz - plenty of slack for a slow loop
+        self.samples = [None] * size  # (FPGA seconds, gyro degrees, module positions)
+        self.written = 0  # total samples ever written - the ring index is this mod size
+        self.read = 0
+        self.dropped = 0  # samples overwritten before the main loop got to them
+        self.lock = threading.Lock()
+        self.notifier = wpilib.Notifier(self._sample)
+        self.notifier.setName('OdometrySampler')
+
+    def start(self) -> None:
+        self.notifier.startPeriodic(self.period)
+
+    def stop(self) -> None:
+        self.notifier.stop()
+
+    def _sample(self) -> None:
+        # read the hardware outside the lock - only the store is protected
+        sample = (wpilib.Timer.getFPGATimestamp(), self.drive.get_angle(), tuple(self.drive.get_module_positions()))
+        with self.lock:
+            self.samples[self.written % self.size] = sample
+            self.written += 1
+
+    def drain(self) -> list:
+        """Everything sampled since the last drain, oldest first"""
+        with self.lock:
+            first = max(self.read, self.written - self.size)
+            self.dropped += first - self.read
+            samples = [self.samples[index % self.size] for index in range(first, self.written)]
+            self.read = self.written
+        return samples
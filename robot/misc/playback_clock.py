@@ -0,0 +1,82 @@
+"""
+Shared timebase for PlaybackAuto / PlaybackSwerve
+Both commands used to keep their own frame counter (one counted loops, the other rounded enabled time * 50),
+so they drifted apart every time a loop overran.  Now PlaybackAuto owns one of these, updates it once per loop,
+and hands it to PlaybackSwerve so everything reads the same frame.
+
+The clock compares FPGA time since playback started against the recorded timestamps.  index is the last
+recorded frame at or before now and fraction is how far we are towards the next one - axes get linearly
+interpolated with those, buttons just use index.  The index only ever moves forward, so the scan is one or two
+compares per loop.
+"""
+
+import wpilib
+from wpilib import SmartDashboard
+
+from misc.input_log import FRAME_PERIOD
+
+
+class PlaybackClock:
+
+    def __init__(self, input_log, report=True) -> None:
+        self.input_log = input_log  # anything with a timestamps column - InputLog or DriveLog
+        self.timestamps = input_log.timestamps
+        self.report = report  # only one clock should put drift on the dashboard
+        self.start_time = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.time = 0  # seconds since playback started
+        self.index = 0
+        self.fraction = 0
+        self.loops = 0
+        self.missed_frames = 0  # recorded frames we jumped over because a loop ran long
+        self.drift = 0  # how far a loop counter would be off from the recording by now, in seconds
+
+    def start(self, start_time=None) -> None:
+        """Pass another clock's start_time to run a second log in step with it"""
+        self.reset()
+        self.start_time = wpilib.Timer.getFPGATimestamp() if start_time is None else start_time
+
+    def update(self) -> None:
+        """Call once per loop, before anything reads the clock"""
+        if self.start_time is None:
+            self.start()
+        self.time = wpilib.Timer.getFPGATimestamp() - self.start_time
+        self.loops += 1
+
+        timestamps, index = self.timestamps, self.index
+        last = len(timestamps) - 1
+        while index < last and timestamps[index + 1] <= self.time:
+            index += 1
+        if index - self.index > 1:
+            self.missed_frames += index - self.index - 1
+        self.index = index
+
+        if index < last:
+            span = timestamps[index + 1] - timestamps[index]
+            self.fraction = min(1, max(0, (self.time - timestamps[index]) / span)) if span > 0 else 0
+        else:
+            self.fraction = 0
+        self.drift = self.time - self.loops * FRAME_PERIOD
+
+        if self.report and self.loops % 10 == 0:
+            SmartDashboard.putNumber('_playback_drift', self.drift)
+            SmartDashboard.putNumber('_playback_missed', self.missed_frames)
+
+    def sample(self, column) -> float:
+        """Linearly interpolate a log column (use it on the axes) at the current playback time"""
+        index = self.index
+        if self.fraction == 0:
+            return column[index]
+        return column[index] + (column[index + 1] - column[index]) * self.fraction
+
+    def slope(self, column) -> float:
+        """Rate of change of a column between this frame and the next, per second - 0 at the end of the log"""
+        index, timestamps = self.index, self.timestamps
+        if index >= len(timestamps) - 1 or timestamps[index + 1] <= timestamps[index]:
+            return 0
+        return (column[index + 1] - column[index]) / (timestamps[index + 1] - timestamps[index])
+
+    def is_finished(self) -> bool:
+        return len(self.timestamps) == 0 or (self.index >= len(self.timestamps) - 1 and self.time >= self.timestamps[-1])
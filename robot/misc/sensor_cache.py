@@ -0,0 +1,87 @@
+"""
+Per-loop sensor cache - one read of each slow sensor per loop, shared by everyone who wants it
+The time of flight sensors and the absolute encoders were read wherever somebody needed them: the manipulator ToF
+by ManipulatorAutoGrab, ToggleGroundPickup and the dashboard, the elevator ToF and the two absolute encoders by
+telemetry and the calibration commands.  That is several reads of the same sensor in one loop, and each caller
+could see a slightly different value.  Now each sensor is registered once, robot.py calls sensors.periodic() at
+the start of every loop (before the scheduler), and everyone reads the cached SensorReading - same value, same
+timestamp, and whether the sensor said it was valid.
+
+    from misc.sensor_cache import sensors
+    sensors.register('manipulator_tof', self.tof.getRange, rate=1, valid=self.tof.isRangeValid)
+    distance = sensors.value('manipulator_tof')
+
+rate is loops between reads, so a sensor that only updates every 50ms doesn't need to be asked every 20ms.
+Sensors with the same rate are staggered so they don't all get read on the same loop.
+"""
+
+import wpilib
+
+
+class SensorReading:
+    __slots__ = ['value', 'timestamp', 'valid']
+
+    def __init__(self, value=0, timestamp=0, valid=False) -> None:
+        self.value = value
+        self.timestamp = timestamp  # FPGA seconds at the start of the loop it was read
+        self.valid = valid
+
+
+class Sensor:
+    __slots__ = ['name', 'read', 'valid', 'rate', 'phase', 'reading']
+
+    def __init__(self, name, read, valid, rate, phase) -> None:
+        self.name = name
+        self.read = read
+        self.valid = valid
+        self.rate = rate
+        self.phase = phase
+        self.reading = SensorReading()
+
+
+class SensorCache:
+
+    def __init__(self) -> None:
+        self.sensors = {}  # name -> Sensor
+        self.phases = {}  # rate -> next phase to hand out
+        self.counter = 0
+        self.reads = 0  # total sensor reads, for comparing with how many times they get asked for
+
+    def register(self, name, read, rate=1, valid=None) -> SensorReading:
+        """Read read() every rate loops - valid() (if given) says whether to trust it.  Reads once now so nobody sees a blank."""
+        phase = self.phases.get(rate, 0)
+        self.phases[rate] = (phase + 1) % rate
+        sensor = Sensor(name, read, valid, rate, phase)
+        self.sensors[name] = sensor  # re-registering (e.g. a second instance) just takes over
+        self.sample(sensor, wpilib.Timer.getFPGATimestamp())
+        return sensor.reading
+
+    def sample(self, sensor: Sensor, timestamp) -> None:
+        reading = sensor.reading
+        reading.value = sensor.read()
+        reading.valid = True if sensor.valid is None else sensor.valid()
+        reading.timestamp = timestamp
+        self.reads += 1
+
+    def periodic(self) -> None:
+        """Call once per loop before the scheduler - reads whatever is due this loop"""
+        self.counter += 1
+        timestamp = wpilib.Timer.getFPGATimestamp()
+        for sensor in self.sensors.values():
+            if self.counter % sensor.rate == sensor.phase:
+                self.sample(sensor, timestamp)
+
+    def get(self, name) -> SensorReading:
+        return self.sensors[name].reading
+
+    def value(self, name):
+        return self.sensors[name].reading.value
+
+    def refresh(self, name) -> SensorReading:
+        """Read a sensor right now, e.g. for a calibration that can't wait for its turn - everyone else sees it too"""
+        sensor = self.sensors[name]
+        self.sample(sensor, wpilib.Timer.getFPGATimestamp())
+        return sensor.reading
+
+
+sensors = SensorCache()
@@ -0,0 +1,85 @@
+"""
+Change-only setpoint writes for the SparkMaxes
+Every setReference / set is a CAN frame and a HAL call, and most loops we send exactly what we sent last loop.
+Wrap the PID controller (or the motor itself, for plain duty cycle) and the write only goes out when the value
+moves by more than epsilon, the control type / slot / arbFF changes, or keepalive seconds have passed since the
+last real write - the keepalive is there in case a controller browns out and comes back with no setpoint.
+Everything else (setP, setOutputRange, getAppliedOutput ...) passes straight through to the wrapped object.
+
+    self.pid_controller = CachedPIDController(self.turret_controller.getPIDController())
+
+Call invalidate() if you need the next write to go out no matter what (e.g. after reconfiguring the controller).
+"""
+
+import rev
+import wpilib
+
+import constants
+from misc.telemetry import telemetry, Rate
+
+
+class SetpointStats:
+    # totals across every wrapper, so the dash shows how much CAN we are saving
+    sent = 0
+    suppressed = 0
+
+
+telemetry.register('_setpoint_writes', lambda: [SetpointStats.sent, SetpointStats.suppressed], Rate.SLOW, kind='double_array')
+
+
+class CachedPIDController:
+
+    def __init__(self, pid_controller, epsilon=constants.k_setpoint_epsilon, keepalive=constants.k_setpoint_keepalive) -> None:
+        self.pid_controller = pid_controller
+        self.epsilon = epsilon
+        self.keepalive = keepalive
+        self.last_reference = None  # value of the last write that actually went out
+        self.last_mode = None  # (ctrl, pidSlot, arbFeedforward, arbFFUnits) of that write
+        self.last_time = 0
+        self.suppressed = 0
+
+    def __getattr__(self, name):
+        # only called for what we don't define ourselves - hand it to the real controller
+        return getattr(self.pid_controller, name)
+
+    def setReference(self, value, ctrl, pidSlot=0, arbFeedforward=0, arbFFUnits=rev.SparkMaxPIDController.ArbFFUnits.kVoltage):
+        now = wpilib.Timer.getFPGATimestamp()
+        mode = (ctrl, pidSlot, arbFeedforward, arbFFUnits)
+        if mode == self.last_mode and abs(value - self.last_reference) <= self.epsilon and now - self.last_time < self.keepalive:
+            self.suppressed += 1
+            SetpointStats.suppressed += 1
+            return rev.REVLibError.kOk
+        self.last_reference, self.last_mode, self.last_time = value, mode, now
+        SetpointStats.sent += 1
+        return self.pid_controller.setReference(value, ctrl, pidSlot=pidSlot, arbFeedforward=arbFeedforward, arbFFUnits=arbFFUnits)
+
+    def invalidate(self) -> None:
+        self.last_mode = None
+
+
+class CachedMotor:
+    """Same idea for CANSparkMax.set - duty cycle straight to the motor"""
+
+    def __init__(self, motor, epsilon=constants.k_setpoint_epsilon, keepalive=constants.k_setpoint_keepalive) -> None:
+        self.motor = motor
+        self.epsilon = epsilon
+        self.keepalive = keepalive
+        self.last_output = None
+        self.last_time = 0
+        self.suppressed = 0
+
+    def __getattr__(self, name):
+        return getattr(self.motor, name)
+
+    def set(self, speed) -> None:
+        now = wpilib.Timer.getFPGATimestamp()
+        if self.last_output is not None and abs(speed - self.last_output) <= self.epsilon and now - self.last_time < self.keepalive:
+            self.suppressed += 1
+            SetpointStats.suppressed += 1
+            return
+        self.last_output, self.last_time = speed, now
+        SetpointStats.sent += 1
+        self.motor.set(speed)
+
+    def invalidate(self) -> None:
+        self.last_output = None
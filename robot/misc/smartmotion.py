@@ -0,0 +1,87 @@
+"""
+SmartMotion profile math - how long a SparkMax trapezoid takes, and how fast to cruise to take a given time
+SmartMotion limits live in the pid dicts in constants (SM_MaxVel, SM_MaxAccel), in the encoder's velocity units.
+Our velocity conversion factors are the same as the position ones (e.g. mm per revolution), and the sparkmax
+reports velocity per minute, so SM_MaxVel is mm (or degrees) per minute and SM_MaxAccel is that per second.
+Everything here converts to per second first.
+
+A move of distance d with cruise v and acceleration a takes d / v + v / a if it reaches v (d >= v^2 / a), and
+2 * sqrt(d / a) if it doesn't.  Going the other way - the cruise speed that makes the move take exactly T with the
+same acceleration - is the smaller root of v^2 - a T v + a d = 0, which only exists if T is at least the
+no-cruise time.  CoordinatedMove uses both to slow the quick axes down so everything arrives together.
+
+Mid-move, time_to_arrival() takes where the profile is now (distance left and measured velocity) and works out how
+long the rest of the trapezoid takes, so the move commands can end a little before they arrive and let a group
+start its next step while the sparkmax finishes the move.
+"""
+
+import math
+
+import constants
+
+k_seconds_per_minute = 60
+
+# axis -> pid dict per slot, in the order the subsystems configure them
+SLOT_DICTS = {
+    'turret': [constants.k_PID_dict_vel_turret],
+    'elevator': [constants.k_PID_dict_vel_elevator],
+    'arm': [constants.k_PID_dict_vel_arm, constants.k_PID_dict_vel_arm_retract],  # slot 1 retracts - see ArmMove
+    'wrist': [constants.k_PID_dict_vel_wrist],
+}
+
+
+def limits(axis, slot=0) -> tuple:
+    """(max velocity per second, max acceleration per second^2) for an axis's smartmotion slot"""
+    pid_dict = SLOT_DICTS[axis][slot]
+    return pid_dict['SM_MaxVel'] / k_seconds_per_minute, pid_dict['SM_MaxAccel'] / k_seconds_per_minute
+
+
+def trapezoid_time(distance, max_velocity, max_acceleration) -> float:
+    """Seconds for a rest to rest move of distance"""
+    distance = abs(distance)
+    if distance * max_acceleration < max_velocity ** 2:  # triangle - never gets to cruise
+        return 2 * math.sqrt(distance / max_acceleration)
+    return distance / max_velocity + max_velocity / max_acceleration
+
+
+def cruise_velocity(distance, duration, max_velocity, max_acceleration) -> float:
+    """Cruise velocity (no more than max_velocity) for a rest to rest move of distance to take duration seconds"""
+    distance = abs(distance)
+    if distance == 0 or duration <= trapezoid_time(distance, max_velocity, max_acceleration):
+        return max_velocity  # can't do it any faster than flat out
+    discriminant = (max_acceleration * duration) ** 2 - 4 * max_acceleration * distance
+    return (max_acceleration * duration - math.sqrt(discriminant)) / 2
+
+
+def synchronize(moves: dict, stagger=None) -> dict:
+    """moves is axis -> (distance, max velocity, max acceleration), stagger is axis -> seconds after the others it
+    should arrive.  Returns axis -> (cruise velocity, duration) so that every axis arrives on schedule, with the
+    slowest one (after its stagger) going flat out."""
+    stagger = {} if stagger is None else stagger
+    times = {axis: trapezoid_time(*move) for axis, move in moves.items()}
+    finish = max([times[axis] - stagger.get(axis, 0) for axis in moves], default=0)
+    plan = {}
+    for axis, (distance, max_velocity, max_acceleration) in moves.items():
+        duration = max(times[axis], finish + stagger.get(axis, 0))
+        plan[axis] = (cruise_velocity(distance, duration, max_velocity, max_acceleration), duration)
+    return plan
+
+
+def time_to_arrival(remaining, velocity, max_velocity, max_acceleration) -> float:
+    """Seconds left in the profile - remaining is target minus position, velocity is per second (same sign = closing)"""
+    distance, speed = abs(remaining), velocity if remaining >= 0 else -velocity
+    if speed < 0:  # going the wrong way - stop first, then it's a move from rest from further away
+        return -speed / max_acceleration + trapezoid_time(distance + speed ** 2 / (2 * max_acceleration), max_velocity, max_acceleration)
+    if speed == 0:
+        return trapezoid_time(distance, max_velocity, max_acceleration)
+    if speed ** 2 >= 2 * max_acceleration * distance:  # already braking
+        return 2 * distance / speed
+    # speed up to the peak (capped at max_velocity), cruise if there's room, then brake
+    peak = min(max_velocity, math.sqrt(max_acceleration * distance + speed ** 2 / 2))
+    ramps = (peak ** 2 - speed ** 2) / (2 * max_acceleration) + peak ** 2 / (2 * max_acceleration)
+    return (peak - speed) / max_acceleration + peak / max_acceleration + max(0, distance - ramps) / max(peak, 1e-9)
+
+
+def predicted_arrival(axis, position, velocity, target, slot=0) -> float:
+    """time_to_arrival straight from a sparkmax encoder's position and (per minute) velocity"""
+    return time_to_arrival(target - position, velocity / k_seconds_per_minute, *limits(axis, slot))
@@ -0,0 +1,121 @@
+"""
+Superstructure move planner - turret, elevator, arm and wrist to a target configuration, in parallel where it's safe
+The scoring groups used to move one axis after another, with the safety rules scattered through the commands
+(e.g. TurretMove won't swing with the elevator low).  Instead the rules are declared once here as interlocks, and
+plan_moves() turns a start and target configuration into a list of legs per axis, each with the conditions it has
+to wait for.  SuperstructureMove (commands/superstructure_move.py) starts every leg the loop its conditions are met,
+so anything that isn't blocked by an interlock moves at the same time as everything else.
+
+An interlock is a forbidden box on two axes - a configuration strictly inside one of its ranges on both axes is not
+allowed.  misc/cspace.py builds its table from the same boxes, so the planner and the table can't disagree.
+Each box works both ways: when one axis (the mover) makes a move that enters its ranges, the other (the guard) has
+to be outside its own ranges while it does.  For each direction:
+    guard ok now and at its target:  nothing to wait for (the ok part of each axis is one piece, so it stays ok)
+    guard not ok now, ok at its target:  axis waits until guard gets there - e.g. turret waits for the elevator to rise
+    guard ok now, not ok at its target:  guard's last leg waits for axis to finish - e.g. elevator waits to come down
+    guard not ok either way:  guard goes to safe first, axis waits for it, then guard goes back when axis is done
+"""
+
+import math
+
+from subsystems.turret import Turret
+from subsystems.wrist import Wrist
+from subsystems.arm import Arm
+from subsystems.elevator import Elevator
+
+AXES = ['turret', 'elevator', 'arm', 'wrist']
+TOLERANCES = {'turret': 3, 'elevator': 10, 'arm': 10, 'wrist': 3}  # same as the individual move commands
+
+
+class Interlock:
+    __slots__ = ['name', 'box', 'safe']
+
+    def __init__(self, name, box, safe) -> None:
+        self.name = name
+        self.box = box  # axis -> [(low, high)] for two axes - forbidden if strictly inside a range on both
+        self.safe = safe  # axis -> where to send it if it has to get out of the way of the other one
+
+
+INTERLOCKS = [
+    Interlock('turret out of stow needs elevator up',
+              {'turret': [(-math.inf, -Turret.stow_band), (Turret.stow_band, math.inf)],
+               'elevator': [(-math.inf, Turret.elevator_safety_limit)]},
+              safe={'turret': 0, 'elevator': Turret.elevator_safety_limit + 20}),
+    Interlock('wrist low needs arm in',
+              {'wrist': [(-math.inf, Wrist.extended_min_angle)], 'arm': [(Wrist.arm_extended_limit, math.inf)]},
+              safe={'wrist': Wrist.positions['flat'], 'arm': Arm.positions['stow']}),
+    Interlock('wrist low needs elevator down',
+              {'wrist': [(-math.inf, Wrist.extended_min_angle)], 'elevator': [(Wrist.ground_elevator_limit, math.inf)]},
+              safe={'wrist': Wrist.positions['flat'], 'elevator': Elevator.positions['bottom']}),
+]
+
+
+def inside(ranges, value) -> bool:
+    return any(low < value < high for low, high in ranges)
+
+
+def enters(ranges, start, end) -> bool:
+    """Whether a move from start to end ends up in one of the ranges, or passes through one it didn't start in"""
+    low_end, high_end = min(start, end), max(start, end)
+    return any(low < end < high or (not low < start < high and low_end < high and high_end > low) for low, high in ranges)
+
+
+class Leg:
+    __slots__ = ['target', 'waits', 'started', 'deadline']
+
+    def __init__(self, target) -> None:
+        self.target = target
+        self.waits = []  # (description, predicate(positions, done axes)) - all have to be true before we start
+        self.started = False
+        self.deadline = None  # FPGA seconds by which a started leg should have arrived - see SuperstructureMove
+
+    def ready(self, positions, done) -> bool:
+        return all(predicate(positions, done) for _, predicate in self.waits)
+
+
+def guard_clear(guard, ranges):
+    return lambda positions, done: not inside(ranges, positions[guard])
+
+
+def axis_done(axis):
+    return lambda positions, done: axis in done
+
+
+def plan_moves(positions: dict, targets: dict, interlocks=INTERLOCKS, tolerances=TOLERANCES) -> dict:
+    """axis -> [Leg] to get from positions to targets (None or missing means leave that axis alone)"""
+    legs = {axis: [] for axis in AXES}
+    final = dict(positions)
+    for axis, target in targets.items():
+        if target is not None and abs(target - positions[axis]) > tolerances[axis]:
+            legs[axis].append(Leg(target))
+            final[axis] = target
+
+    for lock in interlocks:
+        first, second = lock.box
+        for axis, guard in [(first, second), (second, first)]:
+            if not legs[axis] or not enters(lock.box[axis], positions[axis], final[axis]):
+                continue
+            ranges = lock.box[guard]
+            ok_now, ok_end = not inside(ranges, positions[guard]), not inside(ranges, final[guard])
+            if ok_now and ok_end:
+                continue
+            if not ok_now and not ok_end:  # out of the way and back again
+                if not legs[guard]:
+                    legs[guard].append(Leg(positions[guard]))
+                legs[guard].insert(0, Leg(lock.safe[guard]))
+            if not ok_now:
+                legs[axis][0].waits.append((f'{guard} clear', guard_clear(guard, ranges)))
+            if not ok_end:
+                legs[guard][-1].waits.append((f'{axis} done', axis_done(axis)))
+    return legs
+
+
+def describe(legs: dict) -> str:
+    # one line per moving axis, e.g. turret: 182 (after elevator clear)
+    lines = []
+    for axis, axis_legs in legs.items():
+        if axis_legs:
+            steps = [f'{leg.target:.0f}' + (f" (after {', '.join(name for name, _ in leg.waits)})" if leg.waits else '')
+                     for leg in axis_legs]
+            lines.append(f'{axis}: {" -> ".join(steps)}')
+    return '; '.join(lines) if lines else 'nothing to move'
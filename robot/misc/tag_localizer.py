@@ -0,0 +1,49 @@
+"""
+Turns a BottomCam tag reading into a field pose for the swerve's pose estimator
+The camera doesn't tell us which tag it sees, just the range (distance), the sideways offset (strafe, + is left
+of the camera) and whether it has a target.  So we project the reading out from where we currently think we are,
+pick the nearest 2023 tag to that spot, and work backwards from that tag's field position to where the robot
+must be.  The camera rides on the turret, so it points along heading + turret angle.
+
+Heading comes from the gyro - the tags only correct x and y.
+"""
+
+import math
+
+from wpimath.geometry import Pose2d
+
+import constants
+
+
+class TagLocalizer:
+
+    def __init__(self, vision, turret) -> None:
+        self.vision = vision
+        self.turret = turret
+        self.last_timestamp = 0  # only use each camera frame once
+        self.accepted = 0
+        self.rejected = 0
+
+    def measure(self, estimate: Pose2d):
+        """Returns (robot pose, capture time in FPGA seconds) for a new tag frame, or None"""
+        reading = self.vision.get_reading('tags')
+        if reading.stale or reading.targets < 1 or reading.timestamp == self.last_timestamp:
+            return None
+        self.last_timestamp = reading.timestamp
+
+        # tag position relative to the robot, in field coordinates
+        forward = math.sqrt(max(reading.distance ** 2 - reading.strafe ** 2, 0))
+        camera_yaw = estimate.rotation().radians() + math.radians(self.turret.get_angle())
+        dx = forward * math.cos(camera_yaw) - reading.strafe * math.sin(camera_yaw)
+        dy = forward * math.sin(camera_yaw) + reading.strafe * math.cos(camera_yaw)
+
+        # which tag is it?  the one closest to where the reading says it should be
+        predicted_x, predicted_y = estimate.X() + dx, estimate.Y() + dy
+        tag_x, tag_y = min(constants.k_tag_positions.values(), key=lambda tag: (tag[0] - predicted_x) ** 2 + (tag[1] - predicted_y) ** 2)
+        if math.hypot(tag_x - predicted_x, tag_y - predicted_y) > constants.k_tag_match_distance:
+            self.rejected += 1  # too far from any tag - we are lost or the reading is junk
+            return None
+
+        self.accepted += 1
+        latency = reading.latency if reading.latency > 0 else constants.k_tag_latency  # measured by the camera if it can
+        return Pose2d(tag_x - dx, tag_y - dy, estimate.rotation()), reading.timestamp - latency
@@ -0,0 +1,91 @@
+"""
+Central telemetry service - subsystems register what they want on the dashboard instead of calling
+SmartDashboard.put* on their own counter % N schedules.
+
+Each channel is a typed NT4 publisher in the SmartDashboard table (so the dashboards see the same keys as before),
+a getter that returns the current value, and a rate class.  robot.py calls telemetry.periodic() once per loop
+after the scheduler.  Channels in the same rate class are staggered across the cycle so they don't all go out
+on the same loop, and a value that hasn't changed since we last sent it is skipped.
+
+    from misc.telemetry import telemetry, Rate
+    telemetry.register('turret_angle', lambda: self.angle, Rate.SLOW)
+
+Hot paths that need to post every call (e.g. in a command's execute) grab a publisher once at construction
+instead, so each post is a single set() - no f-strings or SmartDashboard key lookups:
+    self.target_vel_publisher = telemetry.publisher('_s_target_vel')
+    self.target_vel_publisher.set(target_vel)
+"""
+
+from ntcore import NetworkTableInstance
+
+
+class Rate:
+    # loops between updates - all have to divide k_cycle
+    FAST = 1  # 50 Hz
+    MEDIUM = 5  # 10 Hz
+    SLOW = 25  # 2 Hz
+
+
+k_cycle = 50  # one second of loops - every rate class repeats within it
+
+# kind -> the NetworkTable method that makes that kind of topic
+TOPIC_GETTERS = {'double': 'getDoubleTopic', 'double_array': 'getDoubleArrayTopic',
+                 'boolean': 'getBooleanTopic', 'string': 'getStringTopic'}
+
+
+class Channel:
+    __slots__ = ['name', 'publisher', 'getter', 'last']
+
+    def __init__(self, name, publisher, getter) -> None:
+        self.name = name
+        self.publisher = publisher
+        self.getter = getter
+        self.last = None
+
+
+class Telemetry:
+
+    def __init__(self, table='SmartDashboard') -> None:
+        self.table = NetworkTableInstance.getDefault().getTable(table)
+        self.channels = {}  # name -> Channel
+        self.publishers = {}  # name -> publisher, for the ones set directly
+        self.slots = [[] for _ in range(k_cycle)]  # the channels due on each loop of the cycle
+        self.phases = {}  # rate -> next phase to hand out, so each rate class spreads across its period
+        self.counter = 0
+        self.skipped = 0  # values we didn't send because they had not changed
+
+    def register(self, name, getter, rate=Rate.SLOW, kind='double') -> Channel:
+        """Publish getter() under name every rate loops - kind is one of TOPIC_GETTERS"""
+        if name in self.channels:  # re-registering (e.g. a second instance) just takes over the getter
+            self.channels[name].getter = getter
+            return self.channels[name]
+
+        publisher = getattr(self.table, TOPIC_GETTERS[kind])(name).publish()
+        channel = Channel(name, publisher, getter)
+        self.channels[name] = channel
+
+        phase = self.phases.get(rate, 0)
+        self.phases[rate] = (phase + 1) % rate
+        for slot in range(phase, k_cycle, rate):
+            self.slots[slot].append(channel)
+        return channel
+
+    def publisher(self, name, kind='double'):
+        """Typed publisher for name - made once and shared, so commands can ask for it in __init__"""
+        if name not in self.publishers:
+            self.publishers[name] = getattr(self.table, TOPIC_GETTERS[kind])(name).publish()
+        return self.publishers[name]
+
+    def periodic(self) -> None:
+        """Call once per loop - sends whatever is due this loop and has changed"""
+        self.counter += 1
+        for channel in self.slots[self.counter % k_cycle]:
+            value = channel.getter()
+            if value == channel.last:
+                self.skipped += 1
+                continue
+            channel.publisher.set(value)
+            channel.last = value
+
+
+telemetry = Telemetry()
@@ -0,0 +1,131 @@
+"""
+Precomputed trajectories for FollowTrajectory - built on the laptop, memory-mapped on the rio
+PathWeaver's "Build Paths" writes each path as a .wpilib.json trajectory (PathWeaver/output), and generating or
+even parsing those on the rio at the start of auto is exactly the kind of spike we don't want.  So we pack all of
+them into one binary file before deploying:
+    python misc/trajectory_cache.py PathWeaver/output deploy/trajectories.bin
+
+File layout (little endian):
+    header:  magic (4s), version (H), record size (H), trajectory count (I)
+    index:   per trajectory - name (32s, utf-8, zero padded), first record (I), record count (I)
+    records: one per trajectory state, all float32
+        time (s), x, y (m), heading (radians - the direction of travel), velocity (m/s), acceleration (m/s^2), curvature (rad/m)
+
+The container opens the cache in robotInit.  Opening only reads the header and index - each column of a trajectory
+is a strided memoryview straight into the mmap, so nothing gets unpacked until FollowTrajectory reads a state.
+Columns and the timestamps property look like InputLog / DriveLog, so misc/playback_clock.py can walk them.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'T429'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')  # magic, version, record size, trajectory count
+INDEX = struct.Struct('<32sII')  # name, first record, record count
+RECORD = struct.Struct('<7f')
+COLUMNS = ['timestamp', 'x', 'y', 'heading', 'velocity', 'acceleration', 'curvature']
+SUFFIX = '.wpilib.json'  # what PathWeaver calls its output
+
+
+def read_pathweaver_json(path) -> list:
+    """RECORD-ordered tuples from one PathWeaver / TrajectoryUtil json trajectory"""
+    with open(path, 'r') as f:
+        states = json.load(f)
+    return [(state['time'], state['pose']['translation']['x'], state['pose']['translation']['y'],
+             state['pose']['rotation']['radians'], state['velocity'], state['acceleration'], state['curvature']) for state in states]
+
+
+def write_trajectory_cache(path, trajectories: dict) -> None:
+    """Write {name: [RECORD-ordered tuples]} to path"""
+    index, records = [], []
+    for name, states in trajectories.items():
+        encoded = name.encode('utf-8')
+        if len(encoded) > INDEX.size - 8:
+            raise ValueError(f'trajectory name {name} is too long for the cache index')
+        index.append(INDEX.pack(encoded, len(records), len(states)))
+        records.extend(states)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(index)))
+        f.write(b''.join(index))
+        f.write(b''.join(RECORD.pack(*state) for state in records))
+
+
+def build_trajectory_cache(pathweaver_output, path) -> list:
+    """Pack every .wpilib.json in the PathWeaver output directory into one cache.  Returns the names."""
+    trajectories = {filename[:-len(SUFFIX)]: read_pathweaver_json(os.path.join(pathweaver_output, filename))
+                    for filename in sorted(os.listdir(pathweaver_output)) if filename.endswith(SUFFIX)}
+    write_trajectory_cache(path, trajectories)
+    return list(trajectories)
+
+
+class CachedTrajectory:
+    """One trajectory's states - each column is a memoryview of floats indexed by state number"""
+
+    def __init__(self, name, records: memoryview) -> None:
+        self.name = name
+        floats = records.cast('f')
+        self.columns = {column: floats[idx::len(COLUMNS)] for idx, column in enumerate(COLUMNS)}
+        self.state_count = len(self.columns['timestamp'])
+
+    def __len__(self) -> int:
+        return self.state_count
+
+    def __getitem__(self, column) -> memoryview:
+        return self.columns[column]
+
+    @property
+    def timestamps(self) -> memoryview:
+        return self.columns['timestamp']
+
+    @property
+    def total_time(self) -> float:
+        return self.timestamps[-1] if self.state_count > 0 else 0
+
+
+class TrajectoryCache:
+    """Memory-mapped trajectory cache - a missing file just means no trajectories, so the robot still boots"""
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.index = {}  # name -> (first record, record count)
+        self.loaded = {}  # name -> CachedTrajectory, made on first get
+        self.mm = None
+        if not os.path.exists(path):
+            print(f'No trajectory cache at {path} - build one with misc/trajectory_cache.py')
+            return
+
+        # the mmap stays open for the life of the robot program - the trajectories are views into it
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f'{path} is not a trajectory cache we can read (magic {magic}, version {version}, record size {record_size})')
+        for entry in range(count):
+            name, first, length = INDEX.unpack_from(self.mm, HEADER.size + entry * INDEX.size)
+            self.index[name.rstrip(b'\0').decode('utf-8')] = (first, length)
+        self.records_offset = HEADER.size + count * INDEX.size
+
+    def names(self) -> list:
+        return list(self.index)
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def get(self, name) -> CachedTrajectory:
+        if name not in self.loaded:
+            first, length = self.index[name]
+            start = self.records_offset + first * RECORD.size
+            self.loaded[name] = CachedTrajectory(name, memoryview(self.mm)[start:start + length * RECORD.size])
+        return self.loaded[name]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(f'usage: python {sys.argv[0]} PathWeaver/output deploy/trajectories.bin')
+        sys.exit(1)
+    names = build_trajectory_cache(sys.argv[1], sys.argv[2])
+    print(f'Cached {len(names)} trajectories in {sys.argv[2]}: {", ".join(names)}')
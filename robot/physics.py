@@ -59,16 +59,120 @@ import wpilib.simulation as simlib
 from pyfrc.physics.core import PhysicsEngine, Pose2d
 from pyfrc.physics.drivetrains import DeadzoneCallable, linear_deadzone
 from wpimath.kinematics import ChassisSpeeds
+from wpimath.system.plant import DCMotor
 import wpimath.geometry as geo
 import ntcore as nt
 
 import constants
+from misc.smartmotion import limits, k_seconds_per_minute
+
+
+def linear_inertia(mass, mm_per_rev) -> float:
+    # a carriage of mass kg on a drive that moves mm_per_rev per motor turn, as seen by the motor shaft
+    return mass * (mm_per_rev / 1000 / (2 * math.pi)) ** 2
+
+
+def rotary_inertia(moi, degrees_per_rev) -> float:
+    # a load of moi kg m^2 behind a reduction of 360 / degrees_per_rev, as seen by the motor shaft
+    return moi * (degrees_per_rev / 360) ** 2
+
+
+# axis -> (can id, motor, free speed rpm, position units per motor rev, reflected inertia kg m^2, limit attribute names)
+# masses and inertias are guesses - close enough that the profiles, not the motors, set the move times
+MECHANISMS = {
+    'turret': (constants.k_turret_motor_port, DCMotor.NEO550(1), 11000, constants.k_turret_encoder_conversion_factor,
+               rotary_inertia(1.5, constants.k_turret_encoder_conversion_factor), ('min_angle', 'max_angle')),
+    'elevator': (constants.k_elevator_motor_port, DCMotor.NEO(1), 5676, constants.k_elevator_encoder_conversion_factor,
+                 linear_inertia(8, constants.k_elevator_encoder_conversion_factor), ('min_height', 'max_height')),
+    'arm': (constants.k_arm_motor_port, DCMotor.NEO550(1), 11000, constants.k_arm_encoder_conversion_factor,
+            linear_inertia(3, constants.k_arm_encoder_conversion_factor), ('min_extension', 'max_extension')),
+    'wrist': (constants.k_wrist_motor_port, DCMotor.NEO(1), 5676, constants.k_wrist_encoder_conversion_factor,
+              rotary_inertia(0.2, constants.k_wrist_encoder_conversion_factor), ('min_angle', 'max_angle')),
+}
+k_sim_position_gain = 1.0  # volts per motor revolution behind the profile
+
+
+class MechanismSim:
+    """One sparkmax running SmartMotion into a motor plant
+    The sparkmax sim doesn't run its own closed loop, so we do it here: a trapezoid reference that walks toward the
+    subsystem's setpoint under the slot's SmartMotion limits (like the sparkmax's profile), feedforward plus P on
+    the reference into a DCMotorSim, and soft limits on the result.  Position and velocity go back into the
+    sparkmax sim device, which is what the subsystem's encoder reads.
+    """
+
+    def __init__(self, axis, can_id, motor, free_speed, units_per_rev, inertia, limit_names) -> None:
+        self.axis = axis
+        self.device = simlib.SimDeviceSim(f'SPARK MAX [{can_id}]')
+        self.position = self.device.getDouble('Position')
+        self.velocity = self.device.getDouble('Velocity')
+        self.output = self.device.getDouble('Applied Output')
+        self.plant = simlib.DCMotorSim(motor, 1, inertia)  # on the motor shaft - the gearing is in units_per_rev
+        self.free_speed = free_speed
+        self.units_per_rev = units_per_rev
+        self.limit_names = limit_names
+        self.offset = 0  # mechanism position when the plant was at zero
+        self.last_position = None  # what we wrote last time, so we notice the robot code resetting the encoder
+        self.reference = (0, 0)  # profile position and velocity
+
+    def sync(self, position) -> None:
+        # start over from wherever the robot code says we are
+        self.offset = position
+        self.plant.setState(0, 0)
+        self.reference = (position, 0)
+
+    def step_reference(self, target, max_velocity, max_acceleration, dt) -> tuple:
+        position, velocity = self.reference
+        remaining = target - position
+        direction = 1 if remaining >= 0 else -1
+        speed = velocity * direction  # positive when closing
+        if speed < 0:  # going the wrong way - brake
+            speed = speed + max_acceleration * dt
+        else:  # speed up, but never faster than we can still stop from
+            speed = min(max_velocity, speed + max_acceleration * dt, math.sqrt(2 * max_acceleration * abs(remaining)))
+        position += speed * direction * dt
+        if (target - position) * direction <= 0 and abs(speed) <= max_acceleration * dt:  # close enough to stop on it
+            return target, 0
+        return position, speed * direction
+
+    def update(self, subsystem, dt) -> None:
+        position = self.position.get()
+        if self.last_position is None or abs(position - self.last_position) > 1e-6:
+            self.sync(position)
+
+        # same slot choice as ArmMove - retracting has its own limits.  Use what the sparkmax was told if it knows.
+        slot = 1 if self.axis == 'arm' and subsystem.setpoint < position else 0
+        max_velocity, max_acceleration = limits(self.axis, slot)
+        configured = subsystem.pid_controller.getSmartMotionMaxVelocity(slot) / k_seconds_per_minute
+        max_velocity = configured if configured > 0 else max_velocity
+        self.reference = self.step_reference(subsystem.setpoint, max_velocity, max_acceleration, dt)
+
+        reference_position, reference_velocity = self.reference
+        motor_rpm = reference_velocity / self.units_per_rev * k_seconds_per_minute
+        volts = 12 * motor_rpm / self.free_speed + k_sim_position_gain * (reference_position - position) / self.units_per_rev
+        volts = max(-12, min(12, volts))
+        self.plant.setInputVoltage(volts)
+        self.plant.update(dt)
+
+        revs = self.plant.getAngularPosition() / (2 * math.pi)
+        new_position = self.offset + revs * self.units_per_rev
+        new_velocity = self.plant.getAngularVelocity() / (2 * math.pi) * self.units_per_rev  # per second
+        low, high = (getattr(subsystem, name) for name in self.limit_names)
+        if not low <= new_position <= high:  # soft limits - the sparkmax won't drive past them
+            new_position = max(low, min(high, new_position))
+            self.plant.setState((new_position - self.offset) / self.units_per_rev * 2 * math.pi, 0)
+            new_velocity = 0
+
+        self.position.set(new_position)
+        self.velocity.set(new_velocity * k_seconds_per_minute)  # the encoder reports per minute
+        self.output.set(volts / 12)
+        self.last_position = new_position
 
 
 class PhysicsEngine(PhysicsEngine):
 
-    def __init__(self, physics_controller):
+    def __init__(self, physics_controller, robot):
         self.physics_controller = physics_controller
+        self.robot = robot  # the mechanism sims follow the subsystems' setpoints
         self.field = wpilib.Field2d()
 
         offset = 16
@@ -119,6 +223,9 @@ class PhysicsEngine(PhysicsEngine):
                                                 'velocity': velocity, 'output': output}})
 
 
+        # turret, elevator, arm and wrist - see MechanismSim
+        self.mechanisms = {axis: MechanismSim(axis, *mechanism) for axis, mechanism in MECHANISMS.items()}
+
         # NavX (SPI interface) - no idea why the "4" is there, seems to be the default name generated by the navx code
         self.navx = simlib.SimDeviceSim("navX-Sensor[4]")
         self.navx_yaw = self.navx.getDouble("Yaw")
@@ -145,11 +252,14 @@ class PhysicsEngine(PhysicsEngine):
             self.camera_dict[key].update({'distance_entry': self.armcam_table.getDoubleTopic(f"{key}/distance").publish()})
             self.camera_dict[key].update({'rotation_entry': self.armcam_table.getDoubleTopic(f"{key}/rotation").publish()})
             self.camera_dict[key].update({'strafe_entry': self.armcam_table.getDoubleTopic(f"{key}/strafe").publish()})
+            self.camera_dict[key].update({'frames_entry': self.armcam_table.getDoubleTopic(f"{key}/frames").publish()})
         for key in ['tags']:
             self.camera_dict[key].update({'targets_entry': self.turretcam_table.getDoubleTopic(f"{key}/targets").publish()})
             self.camera_dict[key].update({'distance_entry': self.turretcam_table.getDoubleTopic(f"{key}/distance").publish()})
             self.camera_dict[key].update({'rotation_entry': self.turretcam_table.getDoubleTopic(f"{key}/rotation").publish()})
             self.camera_dict[key].update({'strafe_entry': self.turretcam_table.getDoubleTopic(f"{key}/strafe").publish()})
+            self.camera_dict[key].update({'frames_entry': self.turretcam_table.getDoubleTopic(f"{key}/frames").publish()})
+        self.camera_frames = 0  # like the real cameras' frame counters, so the robot can tell they are still running
 
     def update_sim(self, now, tm_diff):
         velocity_scale, angular_scale = 10, 10  # faking PWM signals in from -1 to 1, multiply by to x get velocities,
@@ -199,12 +309,23 @@ class PhysicsEngine(PhysicsEngine):
         # update the vision simulation with tags and greens
         self.update_vision()
 
+        if constants.k_sim_mechanisms:
+            self.update_mechanisms(tm_diff)
+
+    def update_mechanisms(self, tm_diff):
+        container = getattr(self.robot, 'container', None)
+        if container is None:  # robotInit hasn't built the subsystems yet
+            return
+        for axis, mechanism in self.mechanisms.items():
+            mechanism.update(getattr(container, axis), tm_diff)
+
     def update_vision(self):  # TODO: update these to poses and pose math, and add camera offset from robot center
         locations = {'tags': {'id': 7, 'x': units.inchesToMeters(40.45), 'y': units.inchesToMeters(108.19)},
                      'green': {'id': '7h+', 'x': 0.34, 'y': 3.294}}
         # tag_x, tag_y = units.inchesToMeters(40.45), units.inchesToMeters(108.19)  # 1.02, 2.74 tag 7 is the one in front of blue center
         # green_x, green_y = units.inchesToMeters(0.34), 3.294  # high on right of tag 7
 
+        self.camera_frames += 1
         for key in locations.keys():
             dx = self.x - locations[key]['x']
             dy = self.y - locations[key]['y']
@@ -216,6 +337,7 @@ class PhysicsEngine(PhysicsEngine):
             self.camera_dict[key]['distance_entry'].set(distance)
             self.camera_dict[key]['rotation_entry'].set(rotation)
             self.camera_dict[key]['strafe_entry'].set(strafe)
+            self.camera_dict[key]['frames_entry'].set(self.camera_frames)
 
 def four_motor_swerve_drivetrain(
     lr_motor: float,
@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 
+import time
 import typing
 import wpilib
 import commands2
 
+import constants
 import robotcontainer
 from robotcontainer import RobotContainer
 from subsystems.led import Led
+from misc.loop_profiler import LoopProfiler
+from misc.telemetry import telemetry
+from misc.sensor_cache import sensors
+from misc.configure_controllers import config_manager
+from misc.can_status import report_budget
 
 
 class MyRobot(commands2.TimedCommandRobot):
@@ -18,6 +25,7 @@ class MyRobot(commands2.TimedCommandRobot):
     """
 
     autonomousCommand: typing.Optional[commands2.Command] = None
+    profiler: typing.Optional[LoopProfiler] = None
 
     def robotInit(self) -> None:
         """
@@ -29,6 +37,35 @@ class MyRobot(commands2.TimedCommandRobot):
         # autonomous chooser on the dashboard.
         self.container = RobotContainer()
 
+        # every subsystem queued its sparkmax configuration - check and fix it all at once, concurrently
+        config_manager.on_complete(report_budget)  # what the status frame profiles should cost on the bus
+        config_manager.run()
+
+        if constants.k_profile_loop:  # find out where the 20ms goes
+            self.profiler = LoopProfiler()
+            for name in ['drive', 'turret', 'arm', 'wrist', 'elevator', 'pneumatics', 'vision', 'led']:
+                self.profiler.instrument_subsystem(getattr(self.container, name), name)
+            self.profiler.instrument_commands(commands2.CommandScheduler.getInstance())
+
+    def robotPeriodic(self) -> None:
+        """Reads the sensor cache, runs the scheduler like TimedCommandRobot's, then the dashboard telemetry - timed when we are profiling"""
+        if self.profiler is None:
+            sensors.periodic()  # before the scheduler so the commands all see this loop's readings
+            commands2.CommandScheduler.getInstance().run()
+            telemetry.periodic()  # after the scheduler so the dash sees this loop's values
+            return
+
+        start = time.perf_counter_ns()
+        sensors.periodic()
+        self.profiler.record('sensors', time.perf_counter_ns() - start)
+        start = time.perf_counter_ns()
+        commands2.CommandScheduler.getInstance().run()
+        self.profiler.record('scheduler', time.perf_counter_ns() - start)
+        start = time.perf_counter_ns()
+        telemetry.periodic()
+        self.profiler.record('telemetry', time.perf_counter_ns() - start)
+        self.profiler.periodic()
+
     def disabledInit(self) -> None:
         """This function is called once each time the robot enters Disabled mode."""
         self.container.led.set_indicator(Led.Indicator.RAINBOW)
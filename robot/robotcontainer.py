@@ -1,6 +1,6 @@
 #  Container for 2429's 2023 swerve robot with turret, elevator, arm, wrist, and manipulator
 
-import time, enum
+import os, time, enum
 import wpilib
 import commands2
 import commands2.cmd as cmd
@@ -19,6 +19,8 @@ from subsystems.wrist import Wrist
 from subsystems.pneumatics import Pneumatics
 
 from misc.axis_button import AxisButton
+from misc.trajectory_cache import TrajectoryCache
+from misc.cspace import ConfigurationSpace
 from commands.record_auto import RecordAuto
 from commands_unused.drive_velocity_stick import DriveByJoystickVelocity
 from commands.arm_move import ArmMove
@@ -42,6 +44,7 @@ from commands.turret_reset import TurretReset
 from commands.wrist_calibration import WristCalibration
 
 from autonomous.playback_auto import PlaybackAuto
+from autonomous.follow_trajectory import FollowTrajectory
 from autonomous.arm_calibration import ArmCalibration
 from autonomous.score_hi_cone_from_stow import ScoreHiConeFromStow
 from autonomous.score_low_cone_from_stow import ScoreLowConeFromStow
@@ -121,6 +124,13 @@ class RobotContainer:
         self.pneumatics = Pneumatics()  # can't enable unless there is a module there
         self.vision = Vision()
         self.led = Led()
+        if constants.k_use_swerve and constants.k_use_tag_fusion:
+            self.drive.use_tags(self.vision, self.turret)
+
+        # PathWeaver trajectories, packed on the laptop by misc/trajectory_cache.py - only the index is read here
+        self.trajectories = TrajectoryCache(os.path.join(wpilib.getDeployDirectory(), constants.k_trajectory_cache))
+        # which turret / elevator / arm / wrist combinations are safe, generated on the laptop and committed - see misc/cspace.py
+        self.cspace = ConfigurationSpace(os.path.join(wpilib.getDeployDirectory(), constants.k_cspace_table))
 
         self.game_piece_mode = 'cone'
 
@@ -217,10 +227,10 @@ class RobotContainer:
 
         if wpilib.RobotBase.isReal():
             # this log doesn't work with Windows machines
-            self.buttonRight.whenPressed(RecordAuto(container=self, input_log_path='/home/lvuser/input_log.json'))
+            self.buttonRight.whenPressed(RecordAuto(container=self, input_log_path='/home/lvuser/input_log.bin', drive_log_path='/home/lvuser/drive_log.bin'))
         else:
             # this log would get wiped with all new deploys
-            self.buttonRight.whenPressed(RecordAuto(container=self, input_log_path='input_log.json'))
+            self.buttonRight.whenPressed(RecordAuto(container=self, input_log_path='input_log.bin', drive_log_path='drive_log.bin'))
 
         # self.buttonLeftAxis.whenPressed(self.led.set_indicator_with_timeout(Led.Indicator.VISION_TARGET_SUCCESS, 2))
 
@@ -364,10 +374,18 @@ class RobotContainer:
 
         self.autonomous_chooser.addOption('score low cone froms stow', ScoreLowConeFromStow(container=self))
 
+        if constants.k_use_swerve:  # one option per cached path - these start odometry at the path's first pose
+            for name in self.trajectories.names():
+                self.autonomous_chooser.addOption(f'path {name}', FollowTrajectory(container=self, trajectory_name=name, reset_pose=True))
+
         if wpilib.RobotBase.isReal():
-            self.autonomous_chooser.addOption('playback auto', PlaybackAuto(container=self, input_log_path='/home/lvuser/input_log.json'))
+            self.autonomous_chooser.addOption('playback auto', PlaybackAuto(container=self, input_log_path='/home/lvuser/input_log.bin'))
+            self.autonomous_chooser.addOption('playback auto closed loop', PlaybackAuto(container=self, input_log_path='/home/lvuser/input_log.bin',
+                                                                                        drive_log_path='/home/lvuser/drive_log.bin'))
         else:
-            self.autonomous_chooser.addOption('playback auto', PlaybackAuto(container=self, input_log_path='input_log.json'))
+            self.autonomous_chooser.addOption('playback auto', PlaybackAuto(container=self, input_log_path='input_log.bin'))
+            # note the sim does not update odometry yet, so closed loop only really works on the robot
+            self.autonomous_chooser.addOption('playback auto closed loop', PlaybackAuto(container=self, input_log_path='input_log.bin', drive_log_path='drive_log.bin'))
 
         # self.autonomous_chooser.addOption('low cone from stow', ScoreLowConeFromStow(self))
         # self.autonomous_chooser.addOption('balance on station', ChargeStationBalance(container=self, drive=self.drive).withTimeout(10))
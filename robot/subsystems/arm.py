@@ -13,27 +13,32 @@ from commands2 import SubsystemBase
 from wpilib import SmartDashboard
 import rev
 import constants
-from misc.configure_controllers import configure_sparkmax
+from misc.configure_controllers import configure_sparkmax, config_manager
+from misc.can_status import apply_status_frames
+from misc.setpoint_cache import CachedPIDController
+from misc.telemetry import telemetry, Rate
 import math
 
 class Arm(SubsystemBase):
+    # arm should probably have positions that we need to map out
+    positions = {'full': 568, 'middle': 450, 'stow': 3}
+    # limits are on the class so physics.py can use them without the hardware
+    max_extension = 580  # need to see what is max legal amount
+    min_extension = 2  # mm for now
+
     def __init__(self):
         super().__init__()
         self.counter = 0
+        telemetry.register('arm_extension', lambda: self.extension, Rate.SLOW)  # see misc/telemetry.py
         self.motion_log_counter = 0
 
-        self.max_extension = 580  # need to see what is max legal amount
-        self.min_extension = 2  # mm for now
-        # arm should probably have positions that we need to map out
-        self.positions = {'full': 568, 'middle': 450, 'stow': 3}
-
         # initialize motors
         self.arm_controller = rev.CANSparkMax(constants.k_arm_motor_port, rev.CANSparkMax.MotorType.kBrushless)
         self.arm_controller.setInverted(True)  # todo: arm needs to be true
         self.sparkmax_encoder = self.arm_controller.getEncoder()
         self.sparkmax_encoder.setPositionConversionFactor(constants.k_arm_encoder_conversion_factor)  # mm per revolution
         self.sparkmax_encoder.setVelocityConversionFactor(constants.k_arm_encoder_conversion_factor)
-        self.pid_controller = self.arm_controller.getPIDController()
+        self.pid_controller = CachedPIDController(self.arm_controller.getPIDController())  # only sends changed setpoints
 
         # set soft limits - do not let spark max put out power above/below a certain value
         self.arm_controller.enableSoftLimit(rev.CANSparkMax.SoftLimitDirection.kForward, True)
@@ -43,10 +48,8 @@ class Arm(SubsystemBase):
         self.arm_controller.setSmartCurrentLimit(20)  # is 20 amps enough?
         self.pid_controller.setSmartMotionAllowedClosedLoopError(1)
 
-        configure_sparkmax(sparkmax=self.arm_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_arm_motor_port,
-                           pid_dict=constants.k_PID_dict_vel_arm, pid_only=True, burn_flash=constants.k_burn_flash)
-        configure_sparkmax(sparkmax=self.arm_controller, pid_controller=self.pid_controller, slot=1, can_id=constants.k_arm_motor_port,
-                           pid_dict=constants.k_PID_dict_vel_arm_retract, pid_only=True, burn_flash=constants.k_burn_flash)
+        # status frames and PID slots get checked (and only written if they differ) at the end of robotInit - see misc/configure_controllers.py
+        config_manager.add('arm', self.configure_controller)
         # where are we when we start?  how do we stay closed w/o power?  do we leave pin in at power on?
 
 
@@ -60,8 +63,15 @@ class Arm(SubsystemBase):
         self.motion_log = [False] * 5
         self.movement_commanded = False
 
+    def configure_controller(self) -> None:
+        apply_status_frames(self.arm_controller, 'mechanism', constants.k_arm_motor_port)
+        configure_sparkmax(sparkmax=self.arm_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_arm_motor_port,
+                           pid_dict=constants.k_PID_dict_vel_arm, pid_only=True, burn_flash=constants.k_burn_flash)
+        configure_sparkmax(sparkmax=self.arm_controller, pid_controller=self.pid_controller, slot=1, can_id=constants.k_arm_motor_port,
+                           pid_dict=constants.k_PID_dict_vel_arm_retract, pid_only=True, burn_flash=constants.k_burn_flash)
+
     def get_extension(self):  # getter for the relevant elevator parameter
-        if wpilib.RobotBase.isReal():
+        if wpilib.RobotBase.isReal() or constants.k_sim_mechanisms:  # physics.py moves the sim encoder
             return self.sparkmax_encoder.getPosition()
         else:
             return self.extension
@@ -78,7 +88,7 @@ class Arm(SubsystemBase):
         self.setpoint = distance
         SmartDashboard.putNumber('arm_setpoint', self.setpoint)
 
-        if wpilib.RobotBase.isSimulation():
+        if wpilib.RobotBase.isSimulation() and not constants.k_sim_mechanisms:  # otherwise physics.py gets us there
             self.extension = distance
             SmartDashboard.putNumber('arm_extension', self.extension)
 
@@ -96,7 +106,6 @@ class Arm(SubsystemBase):
         self.counter += 1
         if self.counter % 25 == 0:  # generic periodic updates twice a second
             self.extension = self.get_extension()
-            SmartDashboard.putNumber('arm_extension', self.extension)
             self.is_moving = abs(self.sparkmax_encoder.getVelocity()) > 100  # for skipping through arm setpoints
 
             # TODO - see if arm motor is oscillating while trying to maintain a setpoint and quiet it.
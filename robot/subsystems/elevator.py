@@ -18,7 +18,11 @@ from playingwithfusion import TimeOfFlight
 import wpilib
 
 import constants
-from misc.configure_controllers import configure_sparkmax
+from misc.configure_controllers import configure_sparkmax, config_manager
+from misc.can_status import apply_status_frames
+from misc.setpoint_cache import CachedPIDController
+from misc.telemetry import telemetry, Rate
+from misc.sensor_cache import sensors
 #from misc.sparksim import CANSparkMax  # takes care of switching to PWM for sim
 
 
@@ -27,13 +31,15 @@ class Elevator(SubsystemBase):
     positions = {'top': 950, 'upper_pickup': 850, 'low': 650, 'lower_pickup': 300, 'bottom': 50}
     positions_close = {'top': 950, 'low': 650}  # top and middle scoring positions
     positions_open = {'upper_pickup': 850, 'bottom': 50}  # only go to pickup from station or ground
+    # limits are on the class so physics.py can use them without the hardware
+    max_height = 981  # the bottom of the carriage is 39in (991mm)  above the bottom at max height
+    min_height = 49  # mm for now
 
     def __init__(self):
         super().__init__()
         self.counter = 5  # offset the periodics
-
-        self.max_height = 981  # the bottom of the carriage is 39in (991mm)  above the bottom at max height
-        self.min_height = 49  # mm for now
+        telemetry.register('elevator_height', lambda: self.height, Rate.SLOW)  # see misc/telemetry.py
+        telemetry.register('elevator_tof', lambda: sensors.value('elevator_tof'), Rate.SLOW)
 
         # initialize motors
         self.elevator_controller = rev.CANSparkMax(constants.k_elevator_motor_port, rev.CANSparkMax.MotorType.kBrushless)
@@ -41,11 +47,14 @@ class Elevator(SubsystemBase):
         self.sparkmax_encoder = self.elevator_controller.getEncoder()
         self.sparkmax_encoder.setPositionConversionFactor(constants.k_elevator_encoder_conversion_factor)  # mm per revolution
         self.sparkmax_encoder.setVelocityConversionFactor(constants.k_elevator_encoder_conversion_factor)  # necessary for smartmotion to behave
-        self.pid_controller = self.elevator_controller.getPIDController()
+        self.pid_controller = CachedPIDController(self.elevator_controller.getPIDController())  # only sends changed setpoints
 
         # set up distance sensor
         self.elevator_height_sensor = TimeOfFlight(constants.k_elevator_timeoflight)
         self.elevator_height_sensor.setRangingMode(TimeOfFlight.RangingMode.kShort, 50)
+        # only the dash watches it after boot - see misc/sensor_cache.py
+        sensors.register('elevator_tof', self.elevator_height_sensor.getRange, rate=25,
+                         valid=self.elevator_height_sensor.isRangeValid)
 
         # set soft limits - do not let spark max put out power above/below a certain value
         self.elevator_controller.enableSoftLimit(rev.CANSparkMax.SoftLimitDirection.kForward, constants.k_enable_soft_limits)
@@ -54,11 +63,11 @@ class Elevator(SubsystemBase):
         self.elevator_controller.setSoftLimit(rev.CANSparkMax.SoftLimitDirection.kReverse, self.min_height)
         self.pid_controller.setSmartMotionAllowedClosedLoopError(1)
 
-        configure_sparkmax(sparkmax=self.elevator_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_elevator_motor_port,
-                           pid_dict=constants.k_PID_dict_vel_elevator, pid_only=True, burn_flash=constants.k_burn_flash)
+        # status frames and PID slots get checked (and only written if they differ) at the end of robotInit - see misc/configure_controllers.py
+        config_manager.add('elevator', self.configure_controller)
 
         # initialize the height of the elevator  - sensor is in mm, so stick with that
-        initial_height = self.elevator_height_sensor.getRange()
+        initial_height = sensors.get('elevator_tof').value  # registering it took a reading
         self.sparkmax_encoder.setPosition(initial_height)
         self.height = initial_height
         self.setpoint = self.height  # initial setting should be ?
@@ -67,8 +76,13 @@ class Elevator(SubsystemBase):
 
         self.is_moving = False
 
+    def configure_controller(self) -> None:
+        apply_status_frames(self.elevator_controller, 'mechanism', constants.k_elevator_motor_port)
+        configure_sparkmax(sparkmax=self.elevator_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_elevator_motor_port,
+                           pid_dict=constants.k_PID_dict_vel_elevator, pid_only=True, burn_flash=constants.k_burn_flash)
+
     def get_height(self):  # getter for the relevant elevator parameter
-        if wpilib.RobotBase.isReal():
+        if wpilib.RobotBase.isReal() or constants.k_sim_mechanisms:  # physics.py moves the sim encoder
             return self.sparkmax_encoder.getPosition()
         else:
             return self.height
@@ -95,7 +109,7 @@ class Elevator(SubsystemBase):
         self.setpoint = height
         SmartDashboard.putNumber('elevator_setpoint', self.setpoint)
 
-        if wpilib.RobotBase.isSimulation():
+        if wpilib.RobotBase.isSimulation() and not constants.k_sim_mechanisms:  # otherwise physics.py gets us there
             self.height = height
             SmartDashboard.putNumber('elevator_height', self.height)
 
@@ -104,7 +118,4 @@ class Elevator(SubsystemBase):
         if self.counter % 25 == 0:
             self.height = self.get_height()
 
-            self.is_moving = abs(self.sparkmax_encoder.getVelocity()) > 1000  #
-
-            SmartDashboard.putNumber('elevator_height', self.height)
-            SmartDashboard.putNumber('elevator_tof', self.elevator_height_sensor.getRange())
\ No newline at end of file
+            self.is_moving = abs(self.sparkmax_encoder.getVelocity()) > 1000  #
\ No newline at end of file
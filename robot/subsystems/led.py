@@ -6,6 +6,7 @@ from wpilib import AddressableLED
 from wpilib import Color, SmartDashboard
 
 import constants
+from misc.telemetry import telemetry, Rate
 
 
 class Led(commands2.SubsystemBase):
@@ -27,6 +28,10 @@ class Led(commands2.SubsystemBase):
         super().__init__()
         self.setName('Led')
         self.counter = 0
+        # advertise our state to the dash - see misc/telemetry.py
+        telemetry.register('led_mode', lambda: self.mode.value, Rate.MEDIUM, kind='string')
+        telemetry.register('led_indicator', lambda: self.indicator.value, Rate.MEDIUM, kind='string')
+        telemetry.register('cone_selected', lambda: self.mode == self.Mode.CONE, Rate.MEDIUM, kind='boolean')
         self.animation_counter = 0
 
         self.led_count = constants.k_led_count
@@ -61,12 +66,6 @@ class Led(commands2.SubsystemBase):
     def periodic(self) -> None:
         # update LEDs
         if self.counter % 5 == 0:
-            SmartDashboard.putString('led_mode', self.mode.value)
-            SmartDashboard.putString('led_indicator', self.indicator.value)
-
-            # advertise our state to the dash
-            SmartDashboard.putBoolean('cone_selected', self.mode == self.Mode.CONE)
-
             self.animation_counter += 1
 
             for i in range(constants.k_led_count):
@@ -8,6 +8,8 @@ from commands2 import SubsystemBase
 from wpilib import SmartDashboard, Solenoid, Compressor, AnalogInput, DoubleSolenoid
 from playingwithfusion import TimeOfFlight
 import constants
+from misc.telemetry import telemetry, Rate
+from misc.sensor_cache import sensors
 
 
 class Pneumatics(SubsystemBase):
@@ -15,6 +17,9 @@ class Pneumatics(SubsystemBase):
         super().__init__()
         self.setName('Pneumatics')
         self.counter = 10  # offset the periodics
+        # the compressor turns itself off and on, so we have to ask it its state - see misc/telemetry.py
+        telemetry.register('compressor_state', lambda: self.compressor.enabled(), Rate.SLOW, kind='boolean')
+        telemetry.register('target distance', lambda: sensors.value('manipulator_tof'), Rate.SLOW)
 
         # rev version
         self.hub_type = 'rev'
@@ -45,6 +50,9 @@ class Pneumatics(SubsystemBase):
         # time of flight sensor
         self.target_distance_sensor = TimeOfFlight(constants.k_manipulator_timeofflight)
         self.target_distance_sensor.setRangingMode(TimeOfFlight.RangingMode.kShort, sampleTime=50)
+        # every loop - the auto grab and ground pickup commands watch it - see misc/sensor_cache.py
+        sensors.register('manipulator_tof', self.target_distance_sensor.getRange, rate=1,
+                         valid=self.target_distance_sensor.isRangeValid)
 
         SmartDashboard.putBoolean('manipulator_closed', self.manipulator_closed)
         SmartDashboard.putBoolean('compressor_close_loop', self.close_loop_enable)
@@ -86,17 +94,17 @@ class Pneumatics(SubsystemBase):
             self.start_compressor()
 
     def get_target_distance(self):
-        return self.target_distance_sensor.getRange()
+        return sensors.value('manipulator_tof')
+
+    def get_target_reading(self):
+        # value, timestamp and validity from this loop's read
+        return sensors.get('manipulator_tof')
 
     def periodic(self) -> None:
         
         self.counter += 1
-        if self.counter % 25 == 1:
-            # the compressor turns itself off and on, so we have to ask it its state
-            SmartDashboard.putBoolean('compressor_state', self.compressor.enabled())
-            SmartDashboard.putNumber('target distance', self.target_distance_sensor.getRange())
-            # SmartDashboard.putNumber('pressure', self.get_analog_pressure())
-            # todo: integrate pressure sensor into compressor class
+        # compressor state and target distance go out through misc/telemetry.py, the distance is read by misc/sensor_cache.py
+        # todo: integrate pressure sensor into compressor class
 
 
 
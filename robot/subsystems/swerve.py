@@ -5,14 +5,32 @@ import wpilib
 from commands2 import SubsystemBase
 from wpimath.filter import SlewRateLimiter
 from wpimath.geometry import Pose2d, Rotation2d
-from wpimath.kinematics import (ChassisSpeeds, SwerveModuleState, SwerveDrive4Kinematics, SwerveDrive4Odometry,)
+from wpimath.kinematics import (ChassisSpeeds, SwerveModuleState, SwerveDrive4Kinematics,)
+from wpimath.estimator import SwerveDrive4PoseEstimator
 from wpimath.controller import PIDController
 import navx
 import rev
 
 import constants
 from .swervemodule_2429 import SwerveModule
-from .swerve_constants import DriveConstants as dc
+from .swerve_constants import DriveConstants as dc, ModuleConstants
+from .swerve_setpoint import SwerveSetpointGenerator
+from misc.telemetry import telemetry, Rate
+from misc.tag_localizer import TagLocalizer
+from misc.odometry_sampler import OdometrySampler
+from misc.configure_controllers import config_manager
+
+
+class SwerveSnapshot:
+    # gyro values for this loop, read once at the top of Swerve.periodic - module values live in each module's reading
+    __slots__ = ['raw_angle', 'angle', 'yaw', 'pitch', 'positions']
+
+    def __init__(self) -> None:
+        self.raw_angle = 0  # degrees, never reversed - what get_raw_angle returns
+        self.angle = 0  # degrees, reversed if dc.kGyroReversed - what get_angle returns
+        self.yaw = 0
+        self.pitch = 0
+        self.positions = ()  # SwerveModulePositions, lf rf lb rb - what the pose estimator wants
 
 
 class Swerve (SubsystemBase):
@@ -41,7 +59,8 @@ class Swerve (SubsystemBase):
 
         # The gyro sensor
         #self.gyro = wpilib.ADIS16470_IMU()
-        self.gyro = navx.AHRS.create_spi(update_rate_hz=50)
+        # no point sampling odometry faster than the gyro updates
+        self.gyro = navx.AHRS.create_spi(update_rate_hz=min(200, constants.k_odometry_rate) if constants.k_use_odometry_thread else 50)
         self.navx = self.gyro
         if self.navx.isCalibrating():
             # schedule a command to reset the navx
@@ -53,6 +72,10 @@ class Swerve (SubsystemBase):
         self.navx.zeroYaw()  # we boot up at zero degrees  - note - you can't reset this while calibrating
         self.gyro_calibrated = False
 
+        # one read of every drive sensor per loop - drive(), keep angle, the dashboard and the drive commands use it
+        self.snapshot = SwerveSnapshot()
+        self.refresh_snapshot()
+
         # timer and variables for checking if we should be using pid on rotation
         self.keep_angle = 0  # the heading we try to maintain when not rotating
         self.keep_angle_timer = wpilib.Timer()
@@ -73,53 +96,106 @@ class Swerve (SubsystemBase):
         self.rotLimiter = SlewRateLimiter(dc.kRotationalSlewRate)
         self.prevTime = wpilib.Timer.getFPGATimestamp()
 
-        # Odometry class for tracking robot pose
-        self.odometry = SwerveDrive4Odometry(
-            dc.kDriveKinematics, Rotation2d.fromDegrees(self.get_angle()), self.get_module_positions(),
-        initialPose=Pose2d(constants.k_start_x, constants.k_start_y, Rotation2d.fromDegrees(self.get_angle())))
+        # turns the chassis speeds from drive() into module states without scrubbing - see swerve_setpoint.py
+        self.setpoint_generator = SwerveSetpointGenerator(self.get_module_angles())
+
+        # Pose estimator for tracking robot pose - odometry, plus tag corrections once we have a tag_localizer
+        # it keeps its own timestamped pose history, so a tag frame gets applied at the time it was taken
+        self.pose_estimator = SwerveDrive4PoseEstimator(
+            dc.kDriveKinematics, Rotation2d.fromDegrees(self.get_angle()), tuple(self.get_module_positions()),
+            Pose2d(constants.k_start_x, constants.k_start_y, Rotation2d.fromDegrees(self.get_angle())),
+            constants.k_state_std_devs, constants.k_vision_std_devs)
+        self.tag_localizer = None  # see use_tags
+
+        # the sampler reads the encoders and gyro at k_odometry_rate in its own thread - periodic feeds the estimator
+        self.odometry_sampler = None
+        if wpilib.RobotBase.isReal() and constants.k_use_odometry_thread:
+            self.odometry_sampler = OdometrySampler(self)
+            self.odometry_sampler.start()
+
+        # the modules' encoders get their conversion factors and zeroes when the sparkmaxes are configured at the
+        # end of robotInit, so start odometry over once that has happened
+        config_manager.on_complete(self.reset_after_configure)
+
+        self.xyr_publisher = telemetry.publisher('_xyr', kind='double_array')  # drive() posts every call when debugging
+
+        # dashboard values - sent by misc/telemetry.py.  the ones from this loop's snapshot are cheap enough to leave on
+        if wpilib.RobotBase.isReal():
+            telemetry.register('drive_pose', self.get_pose_array, Rate.MEDIUM, kind='double_array')
+        telemetry.register('_navx', lambda: self.snapshot.angle, Rate.MEDIUM)
+        telemetry.register('_navx_yaw', lambda: self.snapshot.yaw, Rate.MEDIUM)
+        telemetry.register('_analog_radians', lambda: [m.reading.turn_angle for m in self.swerve_modules], Rate.SLOW, kind='double_array')
+        if constants.k_debugging_messages:  # these go back to the hardware, so only when debugging
+            telemetry.register('_angles', lambda: [m.turningEncoder.getPosition() for m in self.swerve_modules], Rate.SLOW, kind='double_array')
+            telemetry.register('_navx_YPR', lambda: [self.snapshot.yaw, self.snapshot.pitch, self.navx.getRoll(), self.navx.getRotation2d().degrees()],
+                               Rate.SLOW, kind='double_array')
+
+    def refresh_snapshot(self) -> None:
+        """Read the gyro and every module once - the scheduler runs us before any command's execute"""
+        for module in self.swerve_modules:
+            module.refresh()
+        snapshot = self.snapshot
+        snapshot.raw_angle = self.gyro.getAngle()
+        snapshot.angle = -snapshot.raw_angle if dc.kGyroReversed else snapshot.raw_angle
+        snapshot.yaw = self.gyro.getYaw()
+        snapshot.pitch = self.gyro.getPitch() - 4.75  # same calibration as get_pitch
+        snapshot.positions = tuple(m.get_cached_position() for m in self.swerve_modules)
 
     def periodic(self) -> None:
 
         self.counter += 1
+        self.refresh_snapshot()
+        if constants.k_swerve_onboard_turning and self.counter % ModuleConstants.k_turning_resync_period == 0:
+            for module in self.swerve_modules:
+                module.resync_turning_encoder()
         # Update the odometry in the periodic block -
         # TODO - figure out if the odometry and the swerve use the same angle conventions - seems backwards
         # or I faked it incorrectly in the sim
         if wpilib.RobotBase.isReal():
-            self.odometry.update(Rotation2d.fromDegrees(self.get_angle()), *self.get_module_positions(),)
+            if self.odometry_sampler is not None:
+                for timestamp, angle, positions in self.odometry_sampler.drain():
+                    self.pose_estimator.updateWithTime(timestamp, Rotation2d.fromDegrees(angle), positions)
+            else:
+                self.pose_estimator.update(Rotation2d.fromDegrees(self.snapshot.angle), self.snapshot.positions)
+            if self.tag_localizer is not None:
+                measurement = self.tag_localizer.measure(self.pose_estimator.getEstimatedPosition())
+                if measurement is not None:
+                    self.pose_estimator.addVisionMeasurement(*measurement)
         else:
             pass
             # get pose from simulation's post to NT
             # pose = wpilib.SmartDashboard.getNumberArray('drive_pose', [0,0,0])
             # self.odometry.resetPosition(Rotation2d.fromDegrees(self.get_angle()), Pose2d(pose[0], pose[1], pose[2]))
 
-        if self.counter % 10 == 0:
-            pose = self.get_pose()  # self.odometry.getPose()
-            if wpilib.RobotBase.isReal():
-                wpilib.SmartDashboard.putNumberArray('drive_pose', [pose.X(), pose.Y(), pose.rotation().degrees()])
-            wpilib.SmartDashboard.putNumber('_navx', self.get_angle())
-            wpilib.SmartDashboard.putNumber('_navx_yaw', self.navx.getYaw())
-
-            if constants.k_debugging_messages:  # this is just a bit much, so
-                angles = [m.turningEncoder.getPosition() for m in self.swerve_modules]
-                absolutes = [m.get_turn_encoder() for m in self.swerve_modules]
-                wpilib.SmartDashboard.putNumberArray(f'_angles', angles)
-                wpilib.SmartDashboard.putNumberArray(f'_analog_radians', absolutes)
-                ypr = [self.navx.getYaw(), self.get_pitch(), self.navx.getRoll(), self.navx.getRotation2d().degrees()]
-                wpilib.SmartDashboard.putNumberArray('_navx_YPR', ypr)
+        # pose, gyro and module angles go to the dash through misc/telemetry.py
+
+    def reset_after_configure(self) -> None:
+        if self.odometry_sampler is not None:
+            self.odometry_sampler.drain()  # throw away samples in the old units
+        self.refresh_snapshot()
+        self.resetOdometry(self.get_pose())
 
     def get_pose(self, report=False) -> Pose2d:
         # return the pose of the robot  TODO: update the dashboard here?
         if report:
             pass
-            # print(f'attempting to get pose: {self.odometry.getPose()}')
-        return self.odometry.getPose()
+            # print(f'attempting to get pose: {self.pose_estimator.getEstimatedPosition()}')
+        return self.pose_estimator.getEstimatedPosition()
+
+    def use_tags(self, vision, turret) -> None:
+        """Start fusing BottomCam tag readings into the pose - the container calls this once vision exists"""
+        self.tag_localizer = TagLocalizer(vision, turret)
+
+    def get_pose_array(self) -> list:  # x, y, degrees - what the dashboard wants
+        pose = self.get_pose()
+        return [pose.X(), pose.Y(), pose.rotation().degrees()]
 
     def resetOdometry(self, pose: Pose2d) -> None:
         """Resets the odometry to the specified pose.
         :param pose: The pose to which to set the odometry.
         """
-        self.odometry.resetPosition(
-            Rotation2d.fromDegrees(self.get_angle()), pose, *self.get_module_positions())
+        self.pose_estimator.resetPosition(
+            Rotation2d.fromDegrees(self.get_angle()), tuple(self.get_module_positions()), pose)
 
     def drive(self, xSpeed: float, ySpeed: float, rot: float, fieldRelative: bool, rate_limited: bool, keep_angle:bool=True) -> None:
         """Method to drive the robot using joystick info.
@@ -149,15 +225,18 @@ class Swerve (SubsystemBase):
 
         # probably can stop doing this now
         if constants.k_debugging_messages:
-            wpilib.SmartDashboard.putNumberArray('_xyr', [xSpeedDelivered, ySpeedDelivered, rotDelivered])
+            self.xyr_publisher.set([xSpeedDelivered, ySpeedDelivered, rotDelivered])
 
         # create the swerve state array depending on if we are field relative or not
-        swerveModuleStates = dc.kDriveKinematics.toSwerveModuleStates(
-            ChassisSpeeds.fromFieldRelativeSpeeds(xSpeedDelivered, ySpeedDelivered, rotDelivered, Rotation2d.fromDegrees(self.get_angle()),)
-            if fieldRelative else ChassisSpeeds(xSpeedDelivered, ySpeedDelivered, rotDelivered))
+        chassis_speeds = ChassisSpeeds.fromFieldRelativeSpeeds(xSpeedDelivered, ySpeedDelivered, rotDelivered, Rotation2d.fromDegrees(self.snapshot.angle),) \
+            if fieldRelative else ChassisSpeeds(xSpeedDelivered, ySpeedDelivered, rotDelivered)
 
-        # normalize wheel speeds so we do not exceed our speed limit
-        swerveModuleStates = SwerveDrive4Kinematics.desaturateWheelSpeeds(swerveModuleStates, dc.kMaxTotalSpeed)
+        if constants.k_use_setpoint_generator:  # limits acceleration and steering, and desaturates for us
+            swerveModuleStates = self.setpoint_generator.generate(chassis_speeds.vx, chassis_speeds.vy, chassis_speeds.omega, self.get_module_angles())
+        else:
+            swerveModuleStates = dc.kDriveKinematics.toSwerveModuleStates(chassis_speeds)
+            # normalize wheel speeds so we do not exceed our speed limit
+            swerveModuleStates = SwerveDrive4Kinematics.desaturateWheelSpeeds(swerveModuleStates, dc.kMaxTotalSpeed)
         for state, module in zip(swerveModuleStates, self.swerve_modules):
             module.setDesiredState(state)
 
@@ -175,9 +254,9 @@ class Swerve (SubsystemBase):
         self.time_since_drive = self.keep_angle_timer.get() - self.last_drive_time
 
         if self.time_since_rotation < 0.5:  # (update keep_angle until 0.5s after rotate command stops to allow rotate to finish)
-            self.keep_angle = self.get_yaw()  # todo: double check SIGN (and units are in degrees)
+            self.keep_angle = self.snapshot.yaw  # todo: double check SIGN (and units are in degrees)
         elif math.fabs(rot) < dc.k_inner_deadband and self.time_since_drive < 0.25:  # stop keep_angle .25s after you stop driving
-            output = self.keep_angle_pid.calculate(-self.get_angle(), self.keep_angle)
+            output = self.keep_angle_pid.calculate(-self.snapshot.angle, self.keep_angle)
             output = output if math.fabs(output) < 0.2 else 0.2 * math.copysign(1, output)  # clamp at 0.2
 
         return output
@@ -199,6 +278,7 @@ class Swerve (SubsystemBase):
 
         for angle, swerve_module in zip(angles, self.swerve_modules):
             swerve_module.setDesiredState(SwerveModuleState(0, Rotation2d.fromDegrees(angle)))
+        self.setpoint_generator.reset([math.radians(angle) for angle in angles])  # drive() picks up from the X
 
     def setModuleStates(self, desiredStates: typing.Tuple[SwerveModuleState]) -> None:
         """Sets the swerve ModuleStates.
@@ -207,6 +287,10 @@ class Swerve (SubsystemBase):
         desiredStates = SwerveDrive4Kinematics.desaturateWheelSpeeds(desiredStates, dc.kMaxTotalSpeed)
         for idx, m in enumerate(self.swerve_modules):
             m.setDesiredState(desiredStates[idx])
+        # these skip the setpoint generator, so tell it where we left the modules
+        chassis_speeds = dc.kDriveKinematics.toChassisSpeeds(desiredStates)
+        self.setpoint_generator.reset([state.angle.radians() for state in desiredStates],
+                                      (chassis_speeds.vx, chassis_speeds.vy, chassis_speeds.omega))
 
     def resetEncoders(self) -> None:
         """Resets the drive encoders to currently read a position of 0."""
@@ -228,6 +312,10 @@ class Swerve (SubsystemBase):
         """
         return self.gyro.getRate() * (-1.0 if dc.kGyroReversed else 1.0)
 
+    def get_module_angles(self) -> list:
+        """Absolute turn angles in radians from this loop's snapshot"""
+        return [m.reading.turn_angle for m in self.swerve_modules]
+
     def get_module_positions(self):
         """ CJH-added helper function to clean up some calls above"""
         # note lots of the calls want tuples, so _could_ convert if we really want to
@@ -17,6 +17,12 @@ class DriveConstants:
     k_outer_deadband = 0.95
     k_minimum_rotation = kMaxAngularSpeed * k_inner_deadband
 
+    # setpoint generator limits - see swerve_setpoint.py
+    kMaxModuleAcceleration = 6  # m/s^2 change in any one module's velocity - 0.25s to full speed
+    kMaxSteerRate = 2 * math.tau  # radians per second a module is allowed to steer
+    kSteerHoldSpeed = 0.02  # m/s - below this a module keeps its last angle instead of steering
+    kSetpointMaxDt = 0.1  # s - a longer gap than this since the last drive() and we start over from the measured angles
+
     # Chassis configuration - not sure it even matters if we're square
     kTrackWidth = units.inchesToMeters(24.0)  # Distance between centers of right and left wheels on robot
     kWheelBase = units.inchesToMeters(24.0)   # Distance between front and back wheels on robot
@@ -133,6 +139,18 @@ class ModuleConstants:
     kTurningMinOutput = -1
     kTurningMaxOutput = 1
 
+    # same loop run on the turning sparkmax at 1kHz instead of on the rio (constants.k_swerve_onboard_turning)
+    # the relative encoder is in radians, so the units match the rio's - still worth retuning, the loop is 20x faster
+    kTurningSparkP = kTurningP
+    kTurningSparkI = 0.0
+    kTurningSparkD = 0.0
+    k_turning_resync_period = 50  # loops between checks of the relative encoder against the absolute - 1s
+    k_turning_resync_tolerance = 0.02  # radians of disagreement before we re-seed the relative encoder
+    k_turning_resync_max_velocity = 0.1  # radians per second - only re-seed while the module is holding still
+
+    # slot 0 - what setDesiredState's velocity control uses
+    k_PID_dict_driving = {'kP': kDrivingP, 'kI': kDrivingI, 'kD': kDrivingD, 'kFF': kDrivingFF,
+                          'kMinOutput': kDrivingMinOutput, 'kMaxOutput': kDrivingMaxOutput}
     k_PID_dict_vel = {'kP': 0.0, 'kI': 0.000, 'kD': 0.00, 'kIz': 0.001, 'kFF': kDrivingFF, 'kArbFF':0, 'kMaxOutput': 0.95,
                 'kMinOutput': -0.95, 'SM_MaxVel':3, 'SM_MaxAccel':2}  # 180 is 3 m/s and 3m/s/s
 
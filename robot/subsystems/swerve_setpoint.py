@@ -0,0 +1,77 @@
+"""
+Swerve setpoint generator - what Swerve.drive asks the modules for, one loop at a time
+Going straight from ChassisSpeeds to module states asks a module to point somewhere new instantly, so it scrubs
+while it steers and the stick slew limiters are the only thing keeping acceleration sane.  Instead, each loop:
+1) desaturate the requested chassis speeds the same way desaturateWheelSpeeds would (scale everything together)
+2) move from last loop's chassis speeds toward them, but only as far as keeps every module's velocity change
+   under kMaxModuleAcceleration * dt - one common fraction, so the modules stay consistent with each other
+3) per module: take the short way round (optimize), steer no faster than kMaxSteerRate, leave the steering alone
+   if the module is barely moving, and scale the drive speed by cos(steering error) so a module that's still
+   turning doesn't push the robot sideways
+"""
+
+import math
+
+import wpilib
+from wpimath.geometry import Rotation2d
+from wpimath.kinematics import SwerveModuleState
+
+from .swerve_constants import DriveConstants as dc
+from .swerveutils import stepTowardsCircular, angleDifference, wrapAngle
+
+
+class SwerveSetpointGenerator:
+
+    def __init__(self, module_angles) -> None:
+        self.offsets = [(p.X(), p.Y()) for p in dc.kModulePositions]  # module locations, same order as swerve_modules
+        self.last_time = 0
+        self.reset(module_angles)
+
+    def reset(self, module_angles, chassis=(0, 0, 0)) -> None:
+        """Start over from these module angles (radians) - call when something else commanded the modules"""
+        self.angles = list(module_angles)
+        self.chassis = chassis  # vx, vy (m/s), omega (rad/s) we asked for last loop
+        self.last_time = wpilib.Timer.getFPGATimestamp()
+
+    def module_velocities(self, vx, vy, omega) -> list:
+        # rigid body: each module moves at the chassis velocity plus omega cross its offset
+        return [(vx - omega * y, vy + omega * x) for x, y in self.offsets]
+
+    def generate(self, vx, vy, omega, module_angles) -> list:
+        """Module states for this loop given the requested chassis speeds and where the modules are actually pointing"""
+        now = wpilib.Timer.getFPGATimestamp()
+        dt = now - self.last_time
+        self.last_time = now
+        if dt > dc.kSetpointMaxDt:  # haven't been called in a while (disabled, another command) - start from where we are
+            self.reset(module_angles)
+            dt = 0.02
+
+        # 1) same as desaturateWheelSpeeds, but on the chassis speeds so we can interpolate them
+        fastest = max(math.hypot(mx, my) for mx, my in self.module_velocities(vx, vy, omega))
+        if fastest > dc.kMaxTotalSpeed:
+            scale = dc.kMaxTotalSpeed / fastest
+            vx, vy, omega = vx * scale, vy * scale, omega * scale
+
+        # 2) acceleration - the change in each module's velocity vector is linear in the change in chassis speeds
+        last_vx, last_vy, last_omega = self.chassis
+        dvx, dvy, domega = vx - last_vx, vy - last_vy, omega - last_omega
+        biggest_change = max(math.hypot(mx, my) for mx, my in self.module_velocities(dvx, dvy, domega))
+        fraction = 1 if biggest_change < 1e-9 else min(1, dc.kMaxModuleAcceleration * dt / biggest_change)
+        self.chassis = (last_vx + fraction * dvx, last_vy + fraction * dvy, last_omega + fraction * domega)
+
+        # 3) steering
+        states = []
+        max_steer = dc.kMaxSteerRate * dt
+        for idx, (mx, my) in enumerate(self.module_velocities(*self.chassis)):
+            speed, last_angle = math.hypot(mx, my), wrapAngle(self.angles[idx])  # swerveutils wants 0 to 2pi
+            if speed < dc.kSteerHoldSpeed:  # too slow to care which way it points - don't wiggle the module
+                angle, speed = last_angle, 0
+            else:
+                target = wrapAngle(math.atan2(my, mx))
+                if angleDifference(target, last_angle) > math.pi / 2:  # quicker to reverse the wheel than to turn it around
+                    target, speed = wrapAngle(target + math.pi), -speed
+                angle = stepTowardsCircular(last_angle, target, max_steer)
+                speed *= max(0, math.cos(angleDifference(target, angle)))
+            self.angles[idx] = angle
+            states.append(SwerveModuleState(speed, Rotation2d(angle)))
+        return states
@@ -4,7 +4,10 @@ from wpimath.geometry import Rotation2d
 from wpimath.kinematics import SwerveModuleState, SwerveModulePosition
 from wpilib import AnalogEncoder, AnalogPotentiometer
 from wpimath.controller import PIDController
-from misc.configure_controllers import configure_sparkmax
+from misc.configure_controllers import configure_sparkmax, configure_settings, config_manager, written
+from misc.can_status import apply_status_frames
+from misc.setpoint_cache import CachedPIDController, CachedMotor
+from misc.telemetry import telemetry, Rate
 import math
 
 import constants
@@ -12,6 +15,16 @@ from .swerve_constants import ModuleConstants
 from .swerve_constants import DriveConstants as dc
 
 
+class ModuleReading:
+    # this loop's sensor values for one module - see SwerveModule.refresh
+    __slots__ = ['drive_position', 'drive_velocity', 'turn_angle']
+
+    def __init__(self) -> None:
+        self.drive_position = 0  # meters
+        self.drive_velocity = 0  # m/s
+        self.turn_angle = 0  # radians, from the absolute encoder
+
+
 class SwerveModule:
     def __init__(self, drivingCANId: int, turningCANId: int, encoder_analog_port: int, turning_encoder_offset: float,
                  driving_inverted=False, turning_inverted=False, label='') -> None:
@@ -19,6 +32,16 @@ class SwerveModule:
         self.label = label
         self.desiredState = SwerveModuleState(0.0, Rotation2d())  # initialize desired state
         self.turning_output = 0
+        self.target_vel_angle = [0, 0]  # last optimized speed and angle we asked for
+        self.reading = ModuleReading()  # refreshed once a loop by Swerve.periodic - read this instead of the hardware
+
+        # tuning values - sent by misc/telemetry.py at 10Hz instead of three puts per module per loop
+        telemetry.register(f'{label}_target_vel_angle', lambda: self.target_vel_angle, Rate.MEDIUM, kind='double_array')
+        if constants.k_debugging_messages:  # these go to the sparkmaxes over CAN, so only when debugging
+            telemetry.register(f'{label}_volts', lambda: [self.drivingSparkMax.getAppliedOutput(), self.turningSparkMax.getAppliedOutput()],
+                               Rate.MEDIUM, kind='double_array')
+            telemetry.register(f'{label}_actual_vel_angle', lambda: [self.reading.drive_velocity, self.turningEncoder.getPosition()],
+                               Rate.MEDIUM, kind='double_array')
 
         # get our two motor controllers and a simulation dummy
         self.drivingSparkMax = CANSparkMax(drivingCANId, CANSparkMax.MotorType.kBrushless)
@@ -27,47 +50,17 @@ class SwerveModule:
             self.dummy_motor_driving = wpilib.PWMSparkMax(drivingCANId-16)
             self.dummy_motor_turning = wpilib.PWMSparkMax(turningCANId-16)
 
-        #  ---------------- DRIVING  SPARKMAX  ------------------
-        # Factory reset, so we get the SPARKS MAX to a known state before configuring them
-        self.drivingSparkMax.restoreFactoryDefaults()
-        self.drivingSparkMax.setIdleMode(ModuleConstants.kDrivingMotorIdleMode)
-        self.drivingSparkMax.setSmartCurrentLimit(ModuleConstants.kDrivingMotorCurrentLimit)
-        self.drivingSparkMax.setInverted(driving_inverted)
-        self.drivingSparkMax.enableVoltageCompensation(constants.k_volt_compensation)
-
-
-        # Get driving encoder from the sparkmax
+        self.drivingCANId, self.turningCANId = drivingCANId, turningCANId
+        self.driving_inverted, self.turning_inverted = driving_inverted, turning_inverted
         self.drivingEncoder = self.drivingSparkMax.getEncoder()
-        self.drivingEncoder.setPositionConversionFactor(ModuleConstants.kDrivingEncoderPositionFactor)
-        self.drivingEncoder.setVelocityConversionFactor(ModuleConstants.kDrivingEncoderVelocityFactor)
-        # Configure driving PID gains for the driving motor.
         self.drivingPIDController = self.drivingSparkMax.getPIDController()
-        self.drivingPIDController.setFeedbackDevice(self.drivingEncoder)
-        self.drivingPIDController.setP(ModuleConstants.kDrivingP)
-        self.drivingPIDController.setI(ModuleConstants.kDrivingI)
-        self.drivingPIDController.setD(ModuleConstants.kDrivingD)
-        self.drivingPIDController.setFF(ModuleConstants.kDrivingFF)
-        self.drivingPIDController.setOutputRange(ModuleConstants.kDrivingMinOutput, ModuleConstants.kDrivingMaxOutput)
-
-        #  ---------------- TURNING SPARKMAX  ------------------
-        self.turningSparkMax.restoreFactoryDefaults()
-        self.turningSparkMax.setIdleMode(ModuleConstants.kTurningMotorIdleMode)
-        self.turningSparkMax.setSmartCurrentLimit(ModuleConstants.kTurningMotorCurrentLimit)
-        self.turningSparkMax.setInverted(turning_inverted)
-        self.turningSparkMax.enableVoltageCompensation(constants.k_volt_compensation)
-
-        # Setup encoders for the turning SPARKMAX - just to watch it if we need to for velocities, etc.
         self.turningEncoder = self.turningSparkMax.getEncoder()
-        self.turningEncoder.setPositionConversionFactor(ModuleConstants.kTurningEncoderPositionFactor)
-        self.turningEncoder.setVelocityConversionFactor(ModuleConstants.kTurningEncoderVelocityFactor)
-
-        configure_sparkmax(sparkmax=self.drivingSparkMax, pid_controller=self.drivingPIDController, can_id=drivingCANId, slot=1,
-                               burn_flash=constants.k_burn_flash, pid_dict=ModuleConstants.k_PID_dict_vel, pid_only=False)
-        # Save the SPARK MAX configurations. If a SPARK MAX browns out during
-        # operation, it will maintain the above configurations.
-        if constants.k_burn_flash:
-            self.drivingSparkMax.burnFlash()
-            self.turningSparkMax.burnFlash()
+
+        # from here on only send setpoints that changed - see misc/setpoint_cache.py
+        self.drivingPIDController = CachedPIDController(self.drivingPIDController)
+        self.turningSparkMax = CachedMotor(self.turningSparkMax)
+        self.turningPIDController = None  # only used with constants.k_swerve_onboard_turning
+        self.resyncs = 0  # times we had to re-seed the turning encoder from the absolute encoder
 
         #  ---------------- ABSOLUTE ENCODER AND PID FOR TURNING  ------------------
         # create the AnalogPotentiometer with the offset.  TODO: this probably has to be 5V hardware but need to check
@@ -77,21 +70,98 @@ class SwerveModule:
         self.turning_PID_controller = PIDController(Kp=ModuleConstants.kTurningP, Ki=ModuleConstants.kTurningI, Kd=ModuleConstants.kTurningD)
         self.turning_PID_controller.enableContinuousInput(minimumInput=-math.pi, maximumInput=math.pi)
 
+        # the CAN configuration happens at the end of robotInit, both sparkmaxes at once - see misc/configure_controllers.py
+        config_manager.add(f'{label}_driving', self.configure_driving)
+        config_manager.add(f'{label}_turning', self.configure_turning)
+
+        # self.chassisAngularOffset = chassisAngularOffset  # not yet
+        self.desiredState.angle = Rotation2d(self.get_turn_encoder())
+        self.refresh()
+
+    def configure_driving(self) -> None:
+        if constants.k_restore_factory_defaults:  # otherwise we trust it and only fix what is wrong
+            self.drivingSparkMax.restoreFactoryDefaults()
+        results = configure_settings(self.drivingSparkMax, {'idle_mode': ModuleConstants.kDrivingMotorIdleMode,
+                                                            'current_limit': ModuleConstants.kDrivingMotorCurrentLimit,
+                                                            'inverted': self.driving_inverted,
+                                                            'voltage_compensation': constants.k_volt_compensation,
+                                                            'position_factor': ModuleConstants.kDrivingEncoderPositionFactor,
+                                                            'velocity_factor': ModuleConstants.kDrivingEncoderVelocityFactor},
+                                     can_id=self.drivingCANId, encoder=self.drivingEncoder)
+        apply_status_frames(self.drivingSparkMax, 'swerve_drive', self.drivingCANId)
+        # driving PID gains in slot 0 for the velocity control in setDesiredState, and the tuning set in slot 1
+        self.drivingPIDController.setFeedbackDevice(self.drivingEncoder)
+        results.update(configure_sparkmax(sparkmax=self.drivingSparkMax, pid_controller=self.drivingPIDController, can_id=self.drivingCANId,
+                                          slot=0, pid_dict=ModuleConstants.k_PID_dict_driving, pid_only=True))
+        results.update(configure_sparkmax(sparkmax=self.drivingSparkMax, pid_controller=self.drivingPIDController, can_id=self.drivingCANId,
+                                          slot=1, pid_dict=ModuleConstants.k_PID_dict_vel, pid_only=True))
+        # Save the SPARK MAX configuration - only worth the flash wear if something changed
+        if constants.k_burn_flash and written(results):
+            self.drivingSparkMax.burnFlash()
         # TODO: use the absolute encoder to set this - need to check the math carefully
         self.drivingEncoder.setPosition(0)
 
+    def configure_turning(self) -> None:
+        if constants.k_restore_factory_defaults:
+            self.turningSparkMax.restoreFactoryDefaults()
+        # encoder on the turning SPARKMAX - just to watch it, unless we run the turning PID onboard
+        results = configure_settings(self.turningSparkMax, {'idle_mode': ModuleConstants.kTurningMotorIdleMode,
+                                                            'current_limit': ModuleConstants.kTurningMotorCurrentLimit,
+                                                            'inverted': self.turning_inverted,
+                                                            'voltage_compensation': constants.k_volt_compensation,
+                                                            'position_factor': ModuleConstants.kTurningEncoderPositionFactor,
+                                                            'velocity_factor': ModuleConstants.kTurningEncoderVelocityFactor},
+                                     can_id=self.turningCANId, encoder=self.turningEncoder)
+        apply_status_frames(self.turningSparkMax, 'swerve_turn', self.turningCANId)
+        if constants.k_burn_flash and written(results):
+            self.turningSparkMax.burnFlash()
+
         # if constants.k_use_abs_encoder_on_swerve:
         #     self.update_turning_encoder(self.absolute_encoder.get() )
         # else:
         self.turningEncoder.setPosition(self.get_turn_encoder())
-
-        # self.chassisAngularOffset = chassisAngularOffset  # not yet
-        self.desiredState.angle = Rotation2d(self.get_turn_encoder())
+        if constants.k_swerve_onboard_turning:
+            self.configure_onboard_turning()
+
+    def configure_onboard_turning(self) -> None:
+        """Position PID on the turning sparkmax against its own encoder, wrapping at +/- pi like the rio PID did
+        The relative encoder was just seeded from the absolute one - resync_turning_encoder keeps them agreeing"""
+        controller = self.turningSparkMax.getPIDController()
+        controller.setFeedbackDevice(self.turningEncoder)
+        controller.setPositionPIDWrappingEnabled(True)
+        controller.setPositionPIDWrappingMinInput(-math.pi)
+        controller.setPositionPIDWrappingMaxInput(math.pi)
+        controller.setP(ModuleConstants.kTurningSparkP)
+        controller.setI(ModuleConstants.kTurningSparkI)
+        controller.setD(ModuleConstants.kTurningSparkD)
+        controller.setFF(ModuleConstants.kTurningFF)
+        controller.setOutputRange(ModuleConstants.kTurningMinOutput, ModuleConstants.kTurningMaxOutput)
+        self.turningPIDController = CachedPIDController(controller)
+
+    def resync_turning_encoder(self) -> None:
+        """Re-seed the turning motor's encoder from the absolute encoder if they have drifted apart
+        Only while the module is holding still - the analog encoder lags a little when it is moving"""
+        if abs(self.turningEncoder.getVelocity()) > ModuleConstants.k_turning_resync_max_velocity:
+            return
+        error = math.remainder(self.reading.turn_angle - self.turningEncoder.getPosition(), math.tau)
+        if abs(error) > ModuleConstants.k_turning_resync_tolerance:
+            self.turningEncoder.setPosition(self.reading.turn_angle)
+            self.resyncs += 1
 
     def get_turn_encoder(self):
         # how we invert the absolute encoder
         return -1 * self.absolute_encoder.get()
 
+    def refresh(self) -> None:
+        """Read the drive encoder and the absolute encoder once - everything else this loop uses self.reading"""
+        self.reading.drive_position = self.drivingEncoder.getPosition()
+        self.reading.drive_velocity = self.drivingEncoder.getVelocity()
+        self.reading.turn_angle = self.get_turn_encoder()
+
+    def get_cached_position(self) -> SwerveModulePosition:
+        """Same as getPosition but from this loop's reading - getPosition still goes to the hardware for the odometry thread"""
+        return SwerveModulePosition(self.reading.drive_position, Rotation2d(self.reading.turn_angle))
+
     def getState(self) -> SwerveModuleState:
         """Returns the current state of the module.
         :returns: The current state of the module.
@@ -121,28 +191,24 @@ class SwerveModule:
         correctedDesiredState.angle = desiredState.angle
 
         # Optimize the reference state to avoid spinning further than 90 degrees.
-        optimizedDesiredState = SwerveModuleState.optimize(correctedDesiredState, Rotation2d(self.get_turn_encoder()))
+        turn_angle = self.reading.turn_angle
+        optimizedDesiredState = SwerveModuleState.optimize(correctedDesiredState, Rotation2d(turn_angle))
 
         # Command driving and turning SPARKS MAX towards their respective setpoints.
         self.drivingPIDController.setReference(optimizedDesiredState.speed, CANSparkMax.ControlType.kVelocity)
 
-        # calculate the PID value for the turning motor  - use the roborio instead of the sparkmax
-        # self.turningPIDController.setReference(optimizedDesiredState.angle.radians(), CANSparkMax.ControlType.kPosition)
-        self.turning_output = self.turning_PID_controller.calculate(self.get_turn_encoder(), optimizedDesiredState.angle.radians())
-        self.turningSparkMax.set(self.turning_output)
+        if self.turningPIDController is not None:  # the sparkmax runs the turning PID at 1kHz
+            self.turningPIDController.setReference(optimizedDesiredState.angle.radians(), CANSparkMax.ControlType.kPosition)
+        else:  # calculate the PID value for the turning motor on the roborio
+            self.turning_output = self.turning_PID_controller.calculate(turn_angle, optimizedDesiredState.angle.radians())
+            self.turningSparkMax.set(self.turning_output)
 
         # CJH added for debugging and tuning
         if wpilib.RobotBase.isSimulation():
             self.dummy_motor_driving.set(optimizedDesiredState.speed / 10)
             self.dummy_motor_turning.set(optimizedDesiredState.angle.radians()/10)
 
-        if constants.k_debugging_messages:  # only do this when debugging - it's pretty intensive
-            wpilib.SmartDashboard.putNumberArray(f'{self.label}_target_vel_angle',
-                                [optimizedDesiredState.speed, optimizedDesiredState.angle.radians()])
-            wpilib.SmartDashboard.putNumberArray(f'{self.label}_volts',
-                                [self.drivingSparkMax.getAppliedOutput(), self.turningSparkMax.getAppliedOutput()])
-            wpilib.SmartDashboard.putNumberArray(f'{self.label}_actual_vel_angle',
-                                [self.drivingEncoder.getVelocity(), self.turningEncoder.getPosition()])
+        self.target_vel_angle = [optimizedDesiredState.speed, optimizedDesiredState.angle.radians()]
 
 
 
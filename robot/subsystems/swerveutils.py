@@ -34,7 +34,7 @@ def stepTowardsCircular(current: float, target: float, stepsize: float) -> float
     current = wrapAngle(current)
     target = wrapAngle(target)
 
-    stepDirection = math.copysign(target - current, 1)
+    stepDirection = math.copysign(1, target - current)  # sign of the step, like Math.signum in the REV original
     difference = abs(current - target)
 
     if difference <= stepsize:
@@ -16,17 +16,26 @@ import wpilib
 from wpilib import SmartDashboard
 
 import constants
-from misc.configure_controllers import configure_sparkmax
+from misc.configure_controllers import configure_sparkmax, config_manager
+from misc.can_status import apply_status_frames
+from misc.setpoint_cache import CachedPIDController
+from misc.telemetry import telemetry, Rate
+from misc.sensor_cache import sensors
 #from misc.sparksim import CANSparkMax  # takes care of switching to PWM for sim
 
 
 class Turret(SubsystemBase):
+    elevator_safety_limit = 280  # don't swing if the elevator is lower than this - see misc/superstructure.py
+    stow_band = 10  # degrees either side of stow where the elevator height doesn't matter - see misc/superstructure.py
+    # limits are on the class so physics.py can use them without the hardware
+    max_angle = 251
+    min_angle = -45
+
     def __init__(self):
         super().__init__()
-
-        self.max_angle = 251
-        self.min_angle = -45
         self.counter = 15  # offset the periodics
+        telemetry.register('turret_angle', lambda: self.angle, Rate.SLOW)  # see misc/telemetry.py
+        telemetry.register('turret_abs_encoder', lambda: sensors.value('turret_abs_encoder'), Rate.SLOW)
         self.angle = 0  # just to initialize
         # turret should probably have positions that we need to map out
         # self.positions = {'full2': 250, 'full': 225, 'score': 180, 'middle': 90, 'stow': 0}
@@ -39,7 +48,7 @@ class Turret(SubsystemBase):
         self.sparkmax_encoder.setPositionConversionFactor(constants.k_turret_encoder_conversion_factor)
         self.sparkmax_encoder.setVelocityConversionFactor(constants.k_turret_encoder_conversion_factor)  # needed for smartmotion
         self.sparkmax_encoder.setPosition(0)
-        self.pid_controller = self.turret_controller.getPIDController()
+        self.pid_controller = CachedPIDController(self.turret_controller.getPIDController())  # only sends changed setpoints
 
         # set soft limits - do not let spark max put out power above/below a certain value
         self.turret_controller.enableSoftLimit(rev.CANSparkMax.SoftLimitDirection.kForward, constants.k_enable_soft_limits)
@@ -48,14 +57,16 @@ class Turret(SubsystemBase):
         self.turret_controller.setSoftLimit(rev.CANSparkMax.SoftLimitDirection.kReverse, self.min_angle)
         self.pid_controller.setSmartMotionAllowedClosedLoopError(1)
 
-        configure_sparkmax(sparkmax=self.turret_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_turret_motor_port,
-                           pid_dict=constants.k_PID_dict_vel_turret, pid_only=True, burn_flash=constants.k_burn_flash)
+        # status frames and PID slots get checked (and only written if they differ) at the end of robotInit - see misc/configure_controllers.py
+        config_manager.add('turret', self.configure_controller)
 
         # same here, and need the turret encoder to be set to analog (jumper change)
         self.analog_abs_encoder = wpilib.AnalogEncoder(constants.k_turret_abs_encoder_port)  # plug the analog encoder into channel 1
         # self.analog_abs_encoder = wpilib.DutyCycleEncoder(9)
         self.analog_conversion_factor = 360.0  # 5V is 360 degrees
         self.analog_abs_encoder.setDistancePerRotation(self.analog_conversion_factor)
+        # every loop so TurretInitialize can average it - see misc/sensor_cache.py
+        sensors.register('turret_abs_encoder', self.analog_abs_encoder.getDistance, rate=1)
 
         # set the offset on the absolute analog encoder
         self.absolute_position_offset = 0 #  0.842  # this is what the absolute encoder reports when in stow position
@@ -66,8 +77,13 @@ class Turret(SubsystemBase):
         SmartDashboard.putNumber('turret_angle', self.angle)
         SmartDashboard.putNumber('turret_setpoint', self.setpoint)
 
+    def configure_controller(self) -> None:
+        apply_status_frames(self.turret_controller, 'mechanism', constants.k_turret_motor_port)
+        configure_sparkmax(sparkmax=self.turret_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_turret_motor_port,
+                           pid_dict=constants.k_PID_dict_vel_turret, pid_only=True, burn_flash=constants.k_burn_flash)
+
     def get_angle(self):  # getter for the relevant turret parameter
-        if wpilib.RobotBase.isReal():
+        if wpilib.RobotBase.isReal() or constants.k_sim_mechanisms:  # physics.py moves the sim encoder
             return self.sparkmax_encoder.getPosition()
         else:
             return self.angle
@@ -109,6 +125,4 @@ class Turret(SubsystemBase):
     def periodic(self) -> None:
         self.counter += 1
         if self.counter % 25 == 0:
-            self.angle = self.get_angle()
-            SmartDashboard.putNumber('turret_abs_encoder', self.analog_abs_encoder.getDistance())
-            SmartDashboard.putNumber('turret_angle', self.angle)
\ No newline at end of file
+            self.angle = self.get_angle()
\ No newline at end of file
@@ -4,6 +4,20 @@ from wpilib import SmartDashboard, DriverStation
 from ntcore import NetworkTableInstance
 
 import constants
+from misc.telemetry import telemetry, Rate
+
+
+class CameraReading:
+    # one camera / color's values from the last loop - see Vision.update_readings
+    __slots__ = ['targets', 'distance', 'rotation', 'strafe', 'frame', 'latency', 'timestamp', 'age', 'stale']
+
+    def __init__(self) -> None:
+        self.targets, self.distance, self.rotation, self.strafe = 0, 0, 0, 0
+        self.frame = 0  # the camera's frame counter - goes up by one for every frame it processes, 0 if it doesn't send one
+        self.latency = 0  # seconds from the camera grabbing the frame to publishing it, 0 if it doesn't send one
+        self.timestamp = 0  # FPGA seconds when that frame came in
+        self.age = 0  # seconds since then
+        self.stale = True
 
 
 class Vision(SubsystemBase):
@@ -27,6 +41,7 @@ class Vision(SubsystemBase):
 
         self.camera_dict = {'green': {}, 'tags': {}, 'yellow': {}, 'purple': {}}
         self.camera_values = {}
+        self.readings = {key: CameraReading() for key in self.camera_dict.keys()}  # refreshed every loop in periodic
 
         self.armcam_table = NetworkTableInstance.getDefault().getTable('ArmCam')
         self.turretcam_table = NetworkTableInstance.getDefault().getTable('BottomCam')
@@ -50,6 +65,8 @@ class Vision(SubsystemBase):
             self.camera_dict[key].update({'distance_entry': self.armcam_table.getDoubleTopic(f"{key}/distance").subscribe(0)})
             self.camera_dict[key].update({'strafe_entry': self.armcam_table.getDoubleTopic(f"{key}/strafe").subscribe(0)})
             self.camera_dict[key].update({'rotation_entry': self.armcam_table.getDoubleTopic(f"{key}/rotation").subscribe(0)})
+            self.camera_dict[key].update({'frames_entry': self.armcam_table.getDoubleTopic(f"{key}/frames").subscribe(0)})
+            self.camera_dict[key].update({'latency_entry': self.armcam_table.getDoubleTopic(f"{key}/latency").subscribe(0)})
             self.camera_values[key] = {}
             self.camera_values[key].update({'targets': 0})
             self.camera_values[key].update({'distance': 0})
@@ -61,6 +78,8 @@ class Vision(SubsystemBase):
             self.camera_dict[key].update({'distance_entry': self.turretcam_table.getDoubleTopic(f"{key}/distance").subscribe(0)})
             self.camera_dict[key].update({'strafe_entry': self.turretcam_table.getDoubleTopic(f"{key}/strafe").subscribe(0)})
             self.camera_dict[key].update({'rotation_entry': self.turretcam_table.getDoubleTopic(f"{key}/rotation").subscribe(0)})
+            self.camera_dict[key].update({'frames_entry': self.turretcam_table.getDoubleTopic(f"{key}/frames").subscribe(0)})
+            self.camera_dict[key].update({'latency_entry': self.turretcam_table.getDoubleTopic(f"{key}/latency").subscribe(0)})
 
             self.camera_values[key] = {}
             self.camera_values[key].update({'targets': 0})
@@ -71,6 +90,18 @@ class Vision(SubsystemBase):
         # print(self.camera_dict)
         # print(self.camera_values)
 
+        # sent by misc/telemetry.py
+        if wpilib.RobotBase.isSimulation():
+            telemetry.register('match_time', wpilib.Timer.getFPGATimestamp, Rate.SLOW)
+        else:
+            telemetry.register('match_time', DriverStation.getMatchTime, Rate.SLOW)
+        telemetry.register('green_targets_exist', lambda: self.target_available('green'), Rate.SLOW, kind='boolean')
+        telemetry.register('tag_targets_exist', lambda: self.target_available('tags'), Rate.SLOW, kind='boolean')
+        telemetry.register('tag_strafe', lambda: self.readings['tags'].strafe, Rate.SLOW)
+        telemetry.register('tag_age', lambda: self.readings['tags'].age, Rate.SLOW)
+        telemetry.register('tag_frame', lambda: self.readings['tags'].frame, Rate.SLOW)  # see k_tag_latency
+        telemetry.register('tag_latency', lambda: self.readings['tags'].latency, Rate.SLOW)
+
     def set_relay(self, state):
         if state:
             self.relay.set(wpilib.Relay.Value.kForward)
@@ -80,60 +111,58 @@ class Vision(SubsystemBase):
             self.relay_state = False
         SmartDashboard.putBoolean('relay_state', self.relay_state)
 
+    def get_reading(self, target) -> CameraReading:
+        # this loop's snapshot - check stale before acting on it
+        return self.readings[target]
+
     def target_available(self, target):
-        if target == 'tags':
-            return self.camera_dict['tags']['targets_entry'].get() > 0
-        elif target == 'green':
-            self.camera_dict['green']['targets_entry'].get() > 0
+        reading = self.readings[target]
+        return reading.targets > 0 and not reading.stale
 
     def get_tag_strafe(self):
-        tag_available = self.camera_dict['tags']['targets_entry'].get() > 0
-        if tag_available > 0:
-            return self.camera_dict['tags']['strafe_entry'].get()
-        else:
-            return 0  # it would do this anyway because it defaults to zero
+        return self.readings['tags'].strafe if self.target_available('tags') else 0
 
     def get_green_strafe(self):
-        green_available = self.camera_dict['green']['targets_entry'].get() > 0
-        if green_available > 0:
-            return self.camera_dict['green']['strafe_entry'].get()
-        else:
-            return 0  # it would do this anyway because it defaults to zero
-        
+        return self.readings['green'].strafe if self.target_available('green') else 0
+
     def get_tag_dist(self):
-        tag_available = self.camera_dict['tags']['targets_entry'].get() > 0
-        if tag_available > 0:
-            return self.camera_dict['tags']['distance_entry'].get()
-        else:
-            return 0
-        
-    def get_green_dist(self):
-        green_available = self.camera_dict['green']['targets_entry'].get > 0
-        if green_available > 0:
-            return self.camera_dict['tags']['distance_entry'].get()
-        else:
-            return 0
+        return self.readings['tags'].distance if self.target_available('tags') else 0
 
+    def get_green_dist(self):
+        return self.readings['green'].distance if self.target_available('green') else 0
+
+    def update_readings(self) -> None:
+        # one getAtomic per value per loop - everyone else reads self.readings
+        # NT only sends a value when it changes, so a target that sits still stops updating its values.  The cameras
+        # also publish a frame counter that changes every frame, so its timestamp is when we last heard from them.
+        # A camera that doesn't publish the counter yet falls back to the newest of its values, which is right
+        # as long as the target moves (and goes stale after k_vision_stale_time if it doesn't)
+        now = wpilib.RobotController.getFPGATime()  # microseconds, same clock as the NT timestamps on the rio
+        for key, entries in self.camera_dict.items():
+            reading = self.readings[key]
+            frames = entries['frames_entry'].getAtomic()
+            targets = entries['targets_entry'].getAtomic()
+            distance = entries['distance_entry'].getAtomic()
+            rotation = entries['rotation_entry'].getAtomic()
+            strafe = entries['strafe_entry'].getAtomic()
+            reading.targets, reading.distance, reading.rotation, reading.strafe = targets.value, distance.value, rotation.value, strafe.value
+            reading.frame, reading.latency = frames.value, entries['latency_entry'].getAtomic().value
+            heard = frames.time if frames.time != 0 else max(targets.time, distance.time, rotation.time, strafe.time)
+            reading.timestamp = heard / 1e6
+            reading.age = (now - heard) / 1e6
+            reading.stale = heard == 0 or reading.age > constants.k_vision_stale_time
 
     def periodic(self) -> None:
         self.counter += 1
+        self.update_readings()
 
         # update x times a second
         if self.counter % 20 == 0:
-            if wpilib.RobotBase.isSimulation():
-                SmartDashboard.putNumber('match_time', wpilib.Timer.getFPGATimestamp())
-            else:
-                SmartDashboard.putNumber('match_time', DriverStation.getMatchTime())
-
-            for key in self.camera_dict.keys():
-                self.camera_values[key]['targets'] = self.camera_dict[key]['targets_entry'].get()
-                self.camera_values[key]['distance'] = self.camera_dict[key]['distance_entry'].get()
-                self.camera_values[key]['rotation'] = self.camera_dict[key]['rotation_entry'].get()
-                self.camera_values[key]['strafe'] = self.camera_dict[key]['strafe_entry'].get()
-
-            wpilib.SmartDashboard.putBoolean('green_targets_exist', self.camera_dict['green']['targets_entry'].get() > 0)
-            wpilib.SmartDashboard.putBoolean('tag_targets_exist', self.camera_dict['tags']['targets_entry'].get() > 0)
-            wpilib.SmartDashboard.putNumber('tag_strafe', self.camera_dict['tags']['strafe_entry'].get())
+            for key, reading in self.readings.items():
+                self.camera_values[key]['targets'] = reading.targets
+                self.camera_values[key]['distance'] = reading.distance
+                self.camera_values[key]['rotation'] = reading.rotation
+                self.camera_values[key]['strafe'] = reading.strafe
 
             # update pole values separately
             #self.pole_targets = self.camera_dict['green']['targets_entry'].getDouble(0)
@@ -8,20 +8,30 @@ import rev
 import wpilib
 from wpilib import SmartDashboard
 import constants
-from misc.configure_controllers import configure_sparkmax
+from misc.configure_controllers import configure_sparkmax, config_manager
+from misc.can_status import apply_status_frames
+from misc.setpoint_cache import CachedPIDController
+from misc.telemetry import telemetry, Rate
+from misc.sensor_cache import sensors
 #from misc.sparksim import CANSparkMax  # takes care of switching to PWM for sim
 
 
 class Wrist(SubsystemBase):
     # wrist should probably have four positions that we need to map out
     positions = {'stow': 93, 'score': 55, 'op_score': 10, 'flat': 0, 'floor': -25}
+    # interlocks - see misc/superstructure.py
+    extended_min_angle = -5  # lowest we go with the arm out or the elevator up - below this is for the floor
+    arm_extended_limit = 100  # mm - past this the arm counts as out
+    ground_elevator_limit = 200  # mm - the floor position is only allowed below this
+    # defining angles so 0 is horizontal - on the class so physics.py can use them without the hardware
+    max_angle = 94  # call all the way up 125 degrees  todo: remeasure
+    min_angle = -26
 
     def __init__(self):
         super().__init__()
         self. counter = 20  # offset the periodics
-        # defining angles so 0 is horizontal
-        self.max_angle = 94  # call all the way up 125 degrees  todo: remeasure
-        self.min_angle = -26
+        telemetry.register('wrist_angle', lambda: self.angle, Rate.SLOW)  # see misc/telemetry.py
+        telemetry.register('wrist_abs_encoder', lambda: sensors.value('wrist_abs_encoder'), Rate.SLOW)
 
         self.in_use_by_driver = False
 
@@ -36,7 +46,7 @@ class Wrist(SubsystemBase):
         # update sparkmax with appropriate system gains and constraints
         self.sparkmax_encoder.setPositionConversionFactor(constants.k_wrist_encoder_conversion_factor)  # mm per revolution
         self.sparkmax_encoder.setVelocityConversionFactor(constants.k_wrist_encoder_conversion_factor)  # necessary for smartmotion to behave
-        self.pid_controller = self.wrist_controller.getPIDController()
+        self.pid_controller = CachedPIDController(self.wrist_controller.getPIDController())  # only sends changed setpoints
 
         # no longer necessary after adding the absolute encoder
         # self.forward_limit_switch = self.wrist_controller.getForwardLimitSwitch(switchType=rev.SparkMaxLimitSwitch.Type.kNormallyOpen)
@@ -51,13 +61,15 @@ class Wrist(SubsystemBase):
         self.wrist_controller.setSmartCurrentLimit(20)
         self.pid_controller.setSmartMotionAllowedClosedLoopError(1)
 
-        configure_sparkmax(sparkmax=self.wrist_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_wrist_motor_port,
-                           pid_dict=constants.k_PID_dict_vel_wrist, pid_only=True, burn_flash=constants.k_burn_flash)
+        # status frames and PID slots get checked (and only written if they differ) at the end of robotInit - see misc/configure_controllers.py
+        config_manager.add('wrist', self.configure_controller)
 
         self.abs_encoder = self.wrist_controller.getAbsoluteEncoder(encoderType=rev.SparkMaxAbsoluteEncoder.Type.kDutyCycle)
         self.abs_encoder.setInverted(True)
         self.abs_encoder.setPositionConversionFactor(360)
         self.abs_encoder.setZeroOffset(360 * 0.38)
+        # status 5 only comes every 200ms anyway - see misc/can_status.py and misc/sensor_cache.py
+        sensors.register('wrist_abs_encoder', self.abs_encoder.getPosition, rate=5)
 
         # self.pid_controller.setFeedbackDevice(sensor=self.abs_encoder)
 
@@ -77,8 +89,13 @@ class Wrist(SubsystemBase):
         SmartDashboard.putNumber('wrist_setpoint', self.setpoint)
         self.is_moving = False  # use for determining if we are jumping setpoints
 
+    def configure_controller(self) -> None:
+        apply_status_frames(self.wrist_controller, 'mechanism', constants.k_wrist_motor_port)
+        configure_sparkmax(sparkmax=self.wrist_controller, pid_controller=self.pid_controller, slot=0, can_id=constants.k_wrist_motor_port,
+                           pid_dict=constants.k_PID_dict_vel_wrist, pid_only=True, burn_flash=constants.k_burn_flash)
+
     def get_angle(self):  # getter for the relevant elevator parameter
-        if wpilib.RobotBase.isReal():
+        if wpilib.RobotBase.isReal() or constants.k_sim_mechanisms:  # physics.py moves the sim encoder
             return self.sparkmax_encoder.getPosition()
         else:
             return self.angle
@@ -93,7 +110,7 @@ class Wrist(SubsystemBase):
 
         self.setpoint = angle
         SmartDashboard.putNumber('wrist_setpoint', angle)
-        if wpilib.RobotBase.isSimulation():
+        if wpilib.RobotBase.isSimulation() and not constants.k_sim_mechanisms:  # otherwise physics.py gets us there
             self.angle = angle
             SmartDashboard.putNumber('wrist_angle', self.angle)
 
@@ -114,7 +131,5 @@ class Wrist(SubsystemBase):
 
         if self.counter % 25 == 0:
             self.angle = self.get_angle()
-            SmartDashboard.putNumber('wrist_angle', self.angle)
-            SmartDashboard.putNumber('wrist_abs_encoder', self.abs_encoder.getPosition())
 
             self.is_moving = abs(self.sparkmax_encoder.getVelocity()) > 100  #
@@ -0,0 +1,102 @@
+"""
+misc/input_transform.py - teleop (drive_sticks per loop) and playback (pretransform_log over a whole log) have to
+shape the sticks the same way, slow mode and its debounce included, or a recorded auto won't drive like the driver did.
+"""
+
+import math
+
+import pytest
+
+import constants
+from misc.input_log import BUTTONS, InputLog, pack_frame, write_input_log
+from misc.input_transform import (DRIVE_COLUMNS, apply_deadband, debounce, drive_sticks, input_transform,
+                                  k_cubic_a, k_cubic_b, k_slowmode_debounce, pretransform_log, slowmode_multiplier)
+from subsystems.swerve_constants import DriveConstants as dc
+
+LB = 1 << (BUTTONS['LB'] - 1)
+
+
+def test_deadband_zeroes_small_values():
+    assert apply_deadband(dc.k_inner_deadband / 2) == 0
+    assert apply_deadband(-dc.k_inner_deadband / 2) == 0
+
+
+def test_deadband_saturates_past_outer():
+    assert apply_deadband(min(1.0, dc.k_outer_deadband + 0.01)) == 1
+    assert apply_deadband(-min(1.0, dc.k_outer_deadband + 0.01)) == -1
+
+
+def test_deadband_passes_the_middle():
+    value = (dc.k_inner_deadband + dc.k_outer_deadband) / 2
+    assert apply_deadband(value) == value
+    assert apply_deadband(-value) == -value
+
+
+def test_input_transform_is_the_cubic():
+    value = (dc.k_inner_deadband + dc.k_outer_deadband) / 2
+    assert input_transform(value) == pytest.approx(k_cubic_a * value ** 3 + k_cubic_b * value)
+    assert input_transform(-value) == pytest.approx(-input_transform(value))
+    assert input_transform(0) == 0
+    assert input_transform(1) == pytest.approx(k_cubic_a + k_cubic_b)
+
+
+def test_slowmode_multiplier():
+    assert slowmode_multiplier(False, 0) == 1.0
+    assert slowmode_multiplier(True, 0) == constants.k_slowmode_multiplier
+    assert slowmode_multiplier(False, 0.9) == pytest.approx(1.5 * constants.k_slowmode_multiplier)
+    assert slowmode_multiplier(True, 0.9) == constants.k_slowmode_multiplier  # the bumper wins
+
+
+def test_debounce_ignores_a_tap_and_follows_a_hold():
+    timestamps = [frame * 0.02 for frame in range(40)]
+    tap = int(k_slowmode_debounce / 0.02) - 2  # released before the debounce time
+    values = [False] * 5 + [True] * tap + [False] * 5 + [True] * (40 - 10 - tap)
+    out = debounce(values, timestamps)
+    assert not any(out[:10 + tap])
+    assert out[-1]
+    # like the Debouncer, the time counts from the last loop it saw the button up
+    first_on = out.index(True)
+    assert timestamps[first_on] - timestamps[10 + tap - 1] == pytest.approx(k_slowmode_debounce)
+
+
+def test_debounce_empty():
+    assert debounce([], []) == []
+
+
+def make_log(path):
+    """Two seconds of sticks sweeping through the deadbands, with LB tapped and then held, and the trigger pulled"""
+    frames = []
+    for frame in range(100):
+        timestamp = frame * 0.02
+        strafe = math.sin(frame / 7)
+        thrust = math.cos(frame / 5)
+        trigger = 0.9 if 20 <= frame < 30 else 0
+        twist = (frame % 21) / 10 - 1
+        buttons = LB if frame in (40, 41) or frame >= 60 else 0
+        frames.append(pack_frame(timestamp, ([strafe, thrust, trigger, 0, twist, 0], buttons, -1), ([0] * 6, 0, -1)))
+    write_input_log(path, frames)
+    return InputLog(path)
+
+
+def test_pretransform_matches_teleop_every_frame(tmp_path):
+    log = make_log(tmp_path / 'input_log.bin')
+    pretransform_log(log)
+
+    # what DriveByJoystickSwerve would have done with the same sticks, one loop at a time
+    slow = debounce([buttons & LB for buttons in log['driver_buttons']], log.timestamps)
+    for frame in range(len(log)):
+        multiplier = slowmode_multiplier(slow[frame], log.axis('driver', 2)[frame])
+        expected = drive_sticks(log.axis('driver', 1)[frame], log.axis('driver', 0)[frame], log.axis('driver', 4)[frame], multiplier)
+        actual = tuple(log[column][frame] for column in DRIVE_COLUMNS)
+        assert actual == pytest.approx(expected, abs=1e-6), f'frame {frame}'
+
+    assert not any(slow[40:60])  # the two frame tap never turned slow mode on
+    assert log['drive_fwd'][80] == pytest.approx(-input_transform(log.axis('driver', 1)[80]) * constants.k_slowmode_multiplier, abs=1e-6)
+
+
+def test_pretransform_only_runs_once(tmp_path):
+    log = make_log(tmp_path / 'input_log.bin')
+    pretransform_log(log)
+    columns = [log[column] for column in DRIVE_COLUMNS]
+    pretransform_log(log)
+    assert all(log[column] is before for column, before in zip(DRIVE_COLUMNS, columns))